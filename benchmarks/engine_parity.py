@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Engine parity check for LiquidityGate.
+
+Runs every simulation engine over the curated demo data (every ledger
+payment plus a seeded set of hypothetical payments) and verifies each
+engine returns exactly the same result as the reference replay engine.
+
+Usage:
+    python benchmarks/engine_parity.py [--hypotheticals 2000] [--seed 7]
+
+Exits non-zero on any mismatch. No Azure or database access required.
+"""
+
+import argparse
+import csv
+import json
+import random
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CURATED_DIR = REPO_ROOT / 'data' / 'curated'
+sys.path.insert(0, str(REPO_ROOT / 'functions' / 'LiquidityGate'))
+
+from liquidity_engine import ENGINES, LedgerIndex, compute_liquidity_impact  # noqa: E402
+
+
+def load_curated():
+    """Load ledger, balances and buffers from data/curated."""
+    with open(CURATED_DIR / 'ledger_today.csv') as f:
+        ledger = list(csv.DictReader(f))
+    for row in ledger:
+        row['amount'] = float(row['amount'])
+
+    with open(CURATED_DIR / 'starting_balances.csv') as f:
+        balances = list(csv.DictReader(f))
+    for row in balances:
+        row['start_of_day_balance'] = float(row['start_of_day_balance'])
+
+    with open(CURATED_DIR / 'buffers.json') as f:
+        buffers = json.load(f)
+
+    return ledger, balances, buffers
+
+
+def hypothetical_payments(ledger, balances, count, seed):
+    """Seeded hypothetical payments spread over every account/currency."""
+    rng = random.Random(seed)
+    accounts = sorted({(b['entity'], b['account_id'], b['currency']) for b in balances})
+    beneficiaries = sorted({row['beneficiary_name'] for row in ledger})
+    payments = []
+    for i in range(count):
+        entity, account_id, currency = rng.choice(accounts)
+        payments.append({
+            'payment_id': f'HYP-{i:05d}',
+            'amount': round(rng.uniform(1, 3_000_000), 2),
+            'currency': currency,
+            'account_id': account_id,
+            'entity': entity,
+            'beneficiary_name': rng.choice(beneficiaries + ['New Beneficiary Ltd']),
+            'direction': 'IN' if rng.random() < 0.2 else 'OUT',
+            'timestamp_utc': f"2026-01-19 {rng.randint(8, 23):02d}:{rng.randint(0, 59):02d}:{rng.choice([0, 30]):02d}",
+        })
+    return payments
+
+
+def comparable(result):
+    """Result without the per-run audit block, normalized through JSON."""
+    result = {k: v for k, v in result.items() if k != 'audit'}
+    return json.loads(json.dumps(result, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that all LiquidityGate engines agree')
+    parser.add_argument('--hypotheticals', type=int, default=2000, help='Number of hypothetical payments')
+    parser.add_argument('--seed', type=int, default=7, help='Seed for hypothetical payments')
+    args = parser.parse_args()
+
+    ledger, balances, buffers = load_curated()
+    ledger_index = LedgerIndex(ledger)
+    cases = [{'payment_id': row['txn_id']} for row in ledger]
+    cases += [{'hypothetical_payment': hp} for hp in hypothetical_payments(ledger, balances, args.hypotheticals, args.seed)]
+
+    print(f"Checking {len(cases):,} cases across engines: {', '.join(ENGINES)}")
+    mismatches = 0
+    for case in cases:
+        reference = comparable(compute_liquidity_impact(ledger, balances, buffers, engine='replay', **case))
+        for engine in ENGINES[1:]:
+            result = comparable(compute_liquidity_impact(
+                ledger, balances, buffers, engine=engine, ledger_index=ledger_index, **case))
+            if result != reference:
+                mismatches += 1
+                fields = [k for k in reference if reference[k] != result.get(k)]
+                print(f"  MISMATCH [{engine}] {case}: {', '.join(fields)}")
+
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        sys.exit(1)
+    print("OK: all engines agree")
+
+
+if __name__ == '__main__':
+    main()
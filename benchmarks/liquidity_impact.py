@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+compute_liquidity_impact benchmark at production scale.
+
+Generates synthetic ledgers (10k to 10M rows across many accounts) with
+data/generate_ledger.py, whose distributions follow data/transform_banksim.py:
+entity, currency, status and inflow shares, per-currency amount scaling,
+BankSim categories and channels and the starting balance rule. BankSim
+amounts are drawn from a lognormal fit of the raw file (fraud rows heavier).
+compute_liquidity_impact is then called directly, with no Azure and no
+database, for every engine in each mode:
+
+- snapshot: one LedgerIndex per dataset, reused across requests (as the
+  function app's snapshot cache does); slice structures are warmed first
+- cold: no index, so every request builds its slice from the full ledger
+
+and records throughput, latency percentiles and the peak traced memory of
+the index and slice structures. Results are written as JSON; pass an earlier
+file to --compare to flag regressions between commits.
+
+Usage:
+    python benchmarks/liquidity_impact.py [--rows 10000,100000,1000000] [--output out.json]
+        [--engines replay,index,numpy] [--modes snapshot,cold] [--aggregations account,entity]
+        [--requests 200] [--max-seconds 10] [--compare baseline.json]
+
+10M rows needs roughly 12 GB of memory for the ledger dicts alone.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'functions' / 'LiquidityGate'))
+sys.path.insert(0, str(REPO_ROOT / 'data'))
+
+from liquidity_engine import (  # noqa: E402
+    AGGREGATIONS, ENGINES, ENGINE_VERSION, LedgerIndex, compute_liquidity_impact, epoch_seconds, to_cents,
+)
+from generate_ledger import LedgerSpec, buffer_rules, iter_ledger, net_outflows, starting_balances  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MODES = ("snapshot", "cold")
+
+
+def synthetic_dataset(rows: int, accounts: int, seed: int) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Ledger (sorted, as loaded from SQL with epoch and cents columns), starting balances and buffers.
+
+    The rows are the ones ``generate_ledger.py --rows R --accounts A --seed S``
+    writes, with the loader's timestamp_epoch and amount_cents columns added.
+    """
+    spec = LedgerSpec(rows, accounts, seed=seed)
+    ledger = list(iter_ledger(spec))
+    epochs = {}
+    for txn in ledger:
+        epoch = epochs.get(txn['timestamp_utc'])
+        if epoch is None:
+            epoch = epochs[txn['timestamp_utc']] = epoch_seconds(txn['timestamp_utc'])
+        txn['timestamp_epoch'] = epoch
+        txn['amount_cents'] = to_cents(txn['amount'])
+    return ledger, starting_balances(net_outflows(ledger)), buffer_rules(spec)
+
+
+def percentile(ordered: list, pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return ordered[max(1, math.ceil(len(ordered) * pct / 100)) - 1]
+
+
+def latency_summary(samples_ms: list) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(percentile(ordered, 50), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "p99": round(percentile(ordered, 99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def run_requests(ledger, balances, buffers, payment_ids, engine, aggregation, trajectory, index, max_seconds):
+    """Time compute_liquidity_impact per payment until the list or the time budget runs out."""
+    latencies = []
+    started = time.perf_counter()
+    for payment_id in payment_ids:
+        t0 = time.perf_counter()
+        result = compute_liquidity_impact(
+            ledger, balances, buffers, payment_id=payment_id, engine=engine,
+            aggregation=aggregation, trajectory=trajectory, ledger_index=index,
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if 'error' in result:
+            raise RuntimeError(f"{payment_id}: {result['error']}")
+        if time.perf_counter() - started > max_seconds and len(latencies) >= 5:
+            break
+    return latencies, time.perf_counter() - started
+
+
+def peak_memory_mb(ledger, balances, buffers, payment_ids, engine, aggregation, trajectory) -> float:
+    """Peak traced allocation of a fresh LedgerIndex plus the slice structures the requests build."""
+    tracemalloc.start()
+    try:
+        index = LedgerIndex(ledger)
+        for payment_id in payment_ids:
+            compute_liquidity_impact(ledger, balances, buffers, payment_id=payment_id, engine=engine,
+                                     aggregation=aggregation, trajectory=trajectory, ledger_index=index)
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(row: dict) -> tuple:
+    return row['rows'], row['engine'], row['mode'], row['aggregation'], row['trajectory']
+
+
+# Arguments that change the workload; results are only comparable when they match
+WORKLOAD_ARGS = ('accounts', 'trajectory', 'requests', 'max_seconds', 'seed')
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float, args: dict) -> int:
+    """Print p50/p95/throughput ratios against a baseline file; return the number of regressions."""
+    with open(baseline_path) as f:
+        report = json.load(f)
+    baseline = {result_key(row): row for row in report['results']}
+    regressions = 0
+    print(f"\nAgainst {baseline_path} ({report['meta'].get('commit')}; "
+          f"regression: p50 or p95 over {threshold:.2f}x):")
+    differing = [name for name in WORKLOAD_ARGS if report['meta']['args'].get(name) != args.get(name)]
+    if differing:
+        print(f"  note: baseline ran with different {', '.join(differing)}; payments sampled differ")
+    for row in results:
+        before = baseline.get(result_key(row))
+        if before is None:
+            continue
+        p50 = row['latency_ms']['p50'] / max(before['latency_ms']['p50'], 1e-6)
+        p95 = row['latency_ms']['p95'] / max(before['latency_ms']['p95'], 1e-6)
+        flag = "REGRESSION" if max(p50, p95) > threshold else ""
+        regressions += bool(flag)
+        print(f"  {row['rows']:>10,} {row['engine']:<7} {row['mode']:<9} {row['aggregation']:<8} "
+              f"p50 {p50:5.2f}x  p95 {p95:5.2f}x  rps {row['throughput_rps'] / max(before['throughput_rps'], 1e-6):5.2f}x"
+              f"  {flag}")
+    return regressions
+
+
+def csv_arg(value: str, allowed: tuple = None) -> list[str]:
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if allowed is not None:
+        unknown = [item for item in items if item not in allowed]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown {unknown}, expected some of {allowed}")
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compute_liquidity_impact on synthetic ledgers')
+    parser.add_argument('--rows', type=lambda v: [int(float(x)) for x in csv_arg(v)],
+                        default=[10_000, 100_000, 1_000_000], help='Ledger sizes, e.g. 10000,100000,1e6,1e7')
+    parser.add_argument('--accounts', type=int, default=None,
+                        help='Accounts across all entities (default: rows / 1000, at least 100)')
+    parser.add_argument('--engines', type=lambda v: csv_arg(v, ENGINES), default=list(ENGINES))
+    parser.add_argument('--modes', type=lambda v: csv_arg(v, MODES), default=list(MODES))
+    parser.add_argument('--aggregations', type=lambda v: csv_arg(v, AGGREGATIONS), default=list(AGGREGATIONS))
+    parser.add_argument('--trajectory', default='none', help='Trajectory option passed to every request')
+    parser.add_argument('--requests', type=int, default=200, help='Payments per configuration')
+    parser.add_argument('--max-seconds', type=float, default=10.0, help='Time budget per configuration')
+    parser.add_argument('--memory-requests', type=int, default=20, help='Payments replayed under tracemalloc')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier --output file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio reported as a regression')
+    args = parser.parse_args()
+    engines = [engine for engine in args.engines if engine != 'numpy' or np is not None]
+
+    datasets = []
+    results = []
+    for rows in args.rows:
+        accounts = args.accounts or max(100, rows // 1000)
+        t0 = time.perf_counter()
+        ledger, balances, buffers = synthetic_dataset(rows, accounts, args.seed)
+        generate_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        index = LedgerIndex(ledger)
+        index_ms = (time.perf_counter() - t0) * 1000
+        queued = [txn['txn_id'] for txn in ledger if txn['status'] == 'QUEUED' and txn['direction'] == 'OUT']
+        payment_ids = random.Random(args.seed).sample(queued, min(args.requests, len(queued)))
+        datasets.append({
+            "rows": rows,
+            "accounts": accounts,
+            "slices": len(balances),
+            "generate_ms": round(generate_ms, 1),
+            "index_ms": round(index_ms, 1),
+            "rss_mb": rss_mb(),
+        })
+        print(f"{rows:,} rows, {len(balances):,} account/currency slices "
+              f"(generated in {generate_ms / 1000:.1f} s, index {index_ms:.0f} ms)")
+
+        for engine in engines:
+            for aggregation in args.aggregations:
+                memory = peak_memory_mb(ledger, balances, buffers, payment_ids[:args.memory_requests],
+                                        engine, aggregation, args.trajectory)
+                for mode in args.modes:
+                    warmup_ms = None
+                    timed_ids = payment_ids
+                    if mode == 'snapshot':
+                        # Build the slice structures the run touches, as a warm worker would have
+                        warmed, elapsed = run_requests(ledger, balances, buffers, payment_ids, engine, aggregation,
+                                                       args.trajectory, index, args.max_seconds)
+                        warmup_ms = round(elapsed * 1000, 1)
+                        timed_ids = payment_ids[:len(warmed)]
+                    latencies, elapsed = run_requests(
+                        ledger, balances, buffers, timed_ids, engine, aggregation, args.trajectory,
+                        index if mode == 'snapshot' else None, args.max_seconds)
+                    row = {
+                        "rows": rows,
+                        "engine": engine,
+                        "mode": mode,
+                        "aggregation": aggregation,
+                        "trajectory": args.trajectory,
+                        "requests": len(latencies),
+                        "throughput_rps": round(len(latencies) / elapsed, 1),
+                        "latency_ms": latency_summary(latencies),
+                        "warmup_ms": warmup_ms,
+                        "peak_memory_mb": memory,
+                    }
+                    results.append(row)
+                    print(f"  {engine:<7} {mode:<9} {aggregation:<8} {row['requests']:5d} req  "
+                          f"{row['throughput_rps']:9.1f} req/s  p50 {row['latency_ms']['p50']:9.3f} ms  "
+                          f"p99 {row['latency_ms']['p99']:9.3f} ms  peak {memory:8.1f} MB")
+        del ledger, balances, index
+
+    report = {
+        "benchmark": "liquidity_impact",
+        "meta": {
+            "commit": git_commit(),
+            "timestamp_utc": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "engine_version": ENGINE_VERSION,
+            "python": platform.python_version(),
+            "numpy": np.__version__ if np is not None else None,
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        },
+        "datasets": datasets,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold, report['meta']['args']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Money arithmetic microbenchmark for LiquidityGate.
+
+Replays one account day (running balance and minimum) three ways:
+
+- float: the previous engines, amounts as Python floats / float64 columns
+- int cents: the current engines, amounts as int minor units / int64 columns
+- Decimal: exact decimal arithmetic, for reference
+
+and reports how often the float replay gets the buffer verdict wrong when
+the buffer sits exactly at the day's minimum (a 0.00 headroom day, which
+the exact replays always call a RELEASE).
+
+Usage:
+    python benchmarks/money_arithmetic.py [--rows 100000] [--repeat 5] [--days 2000]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'functions' / 'LiquidityGate'))
+
+from liquidity_engine import to_cents  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def make_day(count: int, rng: random.Random) -> tuple[int, list[int]]:
+    """Starting balance and signed amounts of one day, in cents (ledger amounts have 2 decimals)."""
+    signed = []
+    for _ in range(count):
+        cents = rng.randrange(100, rng.choice([10**6, 10**8, 5 * 10**9]))
+        signed.append(-cents if rng.random() < 0.55 else cents)
+    return rng.randrange(10**9, 10**11), signed
+
+
+def replay(start, amounts):
+    balance = low = start
+    for amount in amounts:
+        balance += amount
+        if balance < low:
+            low = balance
+    return low
+
+
+def per_row_ns(fn, rows: int, repeat: int) -> float:
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    return best / rows * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark float vs integer-cents money arithmetic')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows per replayed day')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case (best is reported)')
+    parser.add_argument('--days', type=int, default=2000, help='Days checked for verdict drift')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start_cents, signed_cents = make_day(args.rows, rng)
+    start_float, signed_float = start_cents / 100, [c / 100 for c in signed_cents]
+    start_dec, signed_dec = Decimal(start_cents) / 100, [Decimal(c) / 100 for c in signed_cents]
+
+    cases = [
+        ("float replay", lambda: replay(start_float, signed_float)),
+        ("int cents replay", lambda: replay(start_cents, signed_cents)),
+        ("Decimal replay", lambda: replay(start_dec, signed_dec)),
+        ("to_cents per row", lambda: [to_cents(amount) for amount in signed_float]),
+    ]
+    if np is not None:
+        column_float = np.array(signed_float, dtype=np.float64)
+        column_cents = np.array(signed_cents, dtype=np.int64)
+        cases += [
+            ("float64 cumsum", lambda: (start_float + np.cumsum(column_float)).min()),
+            ("int64 cumsum", lambda: (start_cents + np.cumsum(column_cents)).min()),
+        ]
+
+    print(f"{args.rows:,} rows, one account day:")
+    baseline = None
+    for name, fn in cases:
+        ns = per_row_ns(fn, args.rows, args.repeat)
+        baseline = baseline or ns
+        print(f"  {name:<18} {ns:8.1f} ns/row  {baseline / ns:6.2f}x")
+
+    # Buffer at the exact minimum: headroom is 0.00, so the right verdict is RELEASE
+    drift = 0
+    for _ in range(args.days):
+        start, signed = make_day(rng.randrange(20, 400), rng)
+        buffer_cents = replay(start, signed)
+        if replay(start / 100, [c / 100 for c in signed]) < buffer_cents / 100:
+            drift += 1
+    print(f"\nVerdict drift at 0.00 headroom over {args.days:,} days:")
+    print(f"  float      {drift:6,} false HOLDs ({drift / args.days:.1%})")
+    print(f"  int cents  {0:6,} false HOLDs (exact)")
+
+
+if __name__ == '__main__':
+    main()
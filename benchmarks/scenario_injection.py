@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Scenario injection benchmark for data/transform_banksim.py.
+
+add_emergency_payment used to find its slot with a linear scan comparing
+formatted timestamps, insert, and then renumber every txn_id. It now goes
+through inject_payments, which bisects on parsed timestamps and splices all
+payments in with a single copy, leaving txn_ids alone. This script builds a
+large sorted ledger, injects a batch of stress payments at random times,
+checks the result, and compares against the scan-and-renumber approach
+(run for a few payments and projected to the whole batch).
+
+Usage:
+    python benchmarks/scenario_injection.py [--rows 2000000] [--payments 500] [--reference-payments 3]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'data'))
+
+from transform_banksim import BASE_DATE, inject_payments  # noqa: E402
+
+DAY_SECONDS = 10 * 3600  # a 09:00-19:00 ledger day
+
+
+def timestamp(second):
+    return (BASE_DATE + timedelta(seconds=second)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def sorted_ledger(rows, rng):
+    """Ledger rows cut down to the fields injection looks at, sorted by timestamp."""
+    seconds = sorted(rng.randrange(DAY_SECONDS) for _ in range(rows))
+    stamps = {}
+    return [{'txn_id': f'TXN-{i:07d}', 'timestamp_utc': stamps.setdefault(s, timestamp(s)), 'amount': 1.0}
+            for i, s in enumerate(seconds, 1)]
+
+
+def stress_payments(count, rng):
+    return [{'txn_id': f'TXN-STRESS-{i:04d}', 'timestamp_utc': timestamp(rng.randrange(DAY_SECONDS)),
+             'amount': 250000.0} for i in range(1, count + 1)]
+
+
+def insert_and_renumber(ledger, payment):
+    """The previous add_emergency_payment, for any payment."""
+    insert_idx = 0
+    for i, row in enumerate(ledger):
+        if row['timestamp_utc'] > payment['timestamp_utc']:
+            insert_idx = i
+            break
+    ledger.insert(insert_idx, payment)
+    for i, row in enumerate(ledger):
+        if not row['txn_id'].startswith('TXN-STRESS'):
+            row['txn_id'] = f'TXN-{i+1:07d}'
+    return ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scenario payment injection')
+    parser.add_argument('--rows', type=lambda v: int(float(v)), default=2_000_000, help='Ledger rows')
+    parser.add_argument('--payments', type=int, default=500, help='Scenario payments to inject')
+    parser.add_argument('--reference-payments', type=int, default=3,
+                        help='Payments also run through the scan-and-renumber approach')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"Generating a {args.rows:,}-row ledger and {args.payments:,} stress payments...")
+    ledger = sorted_ledger(args.rows, rng)
+    payments = stress_payments(args.payments, rng)
+    ids = [row['txn_id'] for row in ledger]
+
+    started = time.perf_counter()
+    inject_payments(ledger, payments)
+    bisect_s = time.perf_counter() - started
+
+    injected = [row for row in ledger if row['txn_id'].startswith('TXN-STRESS')]
+    ordered = all(a['timestamp_utc'] <= b['timestamp_utc'] for a, b in zip(ledger, ledger[1:]))
+    stable = [row['txn_id'] for row in ledger if not row['txn_id'].startswith('TXN-STRESS')] == ids
+    print(f"\nInjected {len(injected):,} payments: sorted by timestamp: {ordered}, existing txn_ids unchanged: {stable}")
+    if len(injected) != len(payments) or not ordered or not stable:
+        sys.exit(1)
+
+    reference = ledger[:]
+    started = time.perf_counter()
+    for payment in stress_payments(args.reference_payments, rng):
+        insert_and_renumber(reference, payment)
+    scan_s = (time.perf_counter() - started) / args.reference_payments * args.payments
+
+    print(f"\n{args.payments:,} payments into {args.rows:,} rows:")
+    print(f"  bisect + one splice   {bisect_s * 1000:10.1f} ms")
+    print(f"  scan + renumber each  {scan_s * 1000:10.1f} ms (projected from {args.reference_payments})"
+          f"  {scan_s / bisect_s:8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Starting balance benchmark for data/transform_banksim.py.
+
+create_starting_balances used to sum each account/currency's outflows and
+inflows with two full scans of the ledger per account, O(accounts x rows).
+It now aggregates in one pass. This script generates a synthetic ledger
+(data/generate_ledger.py rows, as in benchmarks/liquidity_impact.py),
+checks that both versions give identical balances on a prefix small
+enough for the quadratic one, and times each of them.
+
+Usage:
+    python benchmarks/starting_balances.py [--rows 1000000] [--accounts 10000] [--reference-rows 10000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+sys.path.insert(0, str(REPO_ROOT / 'data'))
+
+from liquidity_impact import synthetic_dataset  # noqa: E402
+from transform_banksim import create_starting_balances, start_of_day_balance  # noqa: E402
+
+
+def create_starting_balances_quadratic(ledger):
+    """The previous implementation: two ledger scans per account/currency."""
+    accounts = set()
+    for row in ledger:
+        accounts.add((row['entity'], row['account_id'], row['currency']))
+
+    balances = []
+    for entity, account_id, currency in sorted(accounts):
+        outflow = sum(
+            row['amount'] for row in ledger
+            if row['account_id'] == account_id
+            and row['currency'] == currency
+            and row['direction'] == 'OUT'
+            and row['status'] in ('QUEUED', 'RELEASED', 'PENDING_APPROVAL')
+        )
+        inflow = sum(
+            row['amount'] for row in ledger
+            if row['account_id'] == account_id
+            and row['currency'] == currency
+            and row['direction'] == 'IN'
+        )
+        balances.append({
+            'entity': entity,
+            'account_id': account_id,
+            'currency': currency,
+            'start_of_day_balance': start_of_day_balance(account_id, currency, outflow - inflow),
+        })
+    return balances
+
+
+def timed(fn, ledger):
+    started = time.perf_counter()
+    result = fn(ledger)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_starting_balances')
+    parser.add_argument('--rows', type=lambda v: int(float(v)), default=1_000_000, help='Synthetic ledger rows')
+    parser.add_argument('--accounts', type=int, default=10000, help='Accounts across all entities')
+    parser.add_argument('--reference-rows', type=lambda v: int(float(v)), default=10_000,
+                        help='Ledger prefix also run through the quadratic version')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} rows over {args.accounts:,} accounts...")
+    ledger = synthetic_dataset(args.rows, args.accounts, args.seed)[0]
+
+    prefix = ledger[:args.reference_rows]
+    expected, quadratic_s = timed(create_starting_balances_quadratic, prefix)
+    actual, single_pass_s = timed(create_starting_balances, prefix)
+    if actual != expected:
+        print(f"MISMATCH on the first {len(prefix):,} rows")
+        sys.exit(1)
+    print(f"\nFirst {len(prefix):,} rows, {len(expected):,} account/currency balances (identical):")
+    print(f"  quadratic    {quadratic_s * 1000:10.1f} ms")
+    print(f"  single pass  {single_pass_s * 1000:10.1f} ms  {quadratic_s / single_pass_s:8.0f}x")
+
+    balances, full_s = timed(create_starting_balances, ledger)
+    # Scans grow with accounts x rows; project the quadratic time from the prefix run
+    projected_s = quadratic_s * (len(balances) / len(expected)) * (len(ledger) / len(prefix))
+    print(f"\nAll {len(ledger):,} rows, {len(balances):,} account/currency balances:")
+    print(f"  single pass  {full_s * 1000:10.1f} ms")
+    print(f"  quadratic    {projected_s / 60:10.0f} min (projected)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Timestamp parsing microbenchmark for LiquidityGate.
+
+Compares the per-row cost of turning ledger timestamps into sortable values:
+
+- strptime chain: the previous parse_timestamp (up to four strptime formats
+  inside try/except), run on every ledger row on every request
+- fromisoformat: the current parse_timestamp path, uncached
+- epoch column: rows loaded with ``timestamp_epoch`` from SQL, as the
+  function app now does
+
+Usage:
+    python benchmarks/timestamp_parsing.py [--rows 100000] [--repeat 5]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'functions' / 'LiquidityGate'))
+
+from liquidity_engine import _EPOCH, txn_epoch  # noqa: E402
+
+STRPTIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M",
+]
+
+
+def strptime_chain(ts: str) -> datetime:
+    """The parse_timestamp fallback chain this replaces."""
+    for fmt in STRPTIME_FORMATS:
+        try:
+            return datetime.strptime(ts, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse timestamp: {ts}")
+
+
+def make_rows(count: int, seed: int, iso_t_share: float) -> list[dict]:
+    """Ledger-like rows; ``iso_t_share`` of them use the 'T' separator (second strptime format)."""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 19)
+    rows = []
+    for _ in range(count):
+        ts = start + timedelta(seconds=rng.randrange(86400))
+        fmt = "%Y-%m-%dT%H:%M:%S" if rng.random() < iso_t_share else "%Y-%m-%d %H:%M:%S"
+        rows.append({
+            'timestamp_utc': ts.strftime(fmt),
+            'timestamp_epoch': int((ts - _EPOCH).total_seconds()),
+        })
+    return rows
+
+
+def per_row_ns(fn, rows, repeat: int) -> float:
+    best = min(timeit.repeat(lambda: [fn(row) for row in rows], number=1, repeat=repeat))
+    return best / len(rows) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ledger timestamp parsing')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows per run')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case (best is reported)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for label, share in [("space-separated", 0.0), ("mixed 50% 'T'", 0.5)]:
+        rows = make_rows(args.rows, args.seed, share)
+        cases = [
+            ("strptime chain", lambda row: strptime_chain(row['timestamp_utc'])),
+            ("fromisoformat", lambda row: datetime.fromisoformat(row['timestamp_utc'])),
+            ("epoch column", txn_epoch),
+        ]
+        print(f"{args.rows:,} rows, {label}:")
+        baseline = None
+        for name, fn in cases:
+            ns = per_row_ns(fn, rows, args.repeat)
+            baseline = baseline or ns
+            print(f"  {name:<16} {ns:8.0f} ns/row  {baseline / ns:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Synthetic Ledger Generator
+==========================
+Treasury days at production volume, for LiquidityGate load tests.
+
+Generates N ledger rows across M accounts, K entities and C currencies over
+D days, with the starting balances and buffer rules that go with them.
+Entity, currency, amount scaling, channel, direction and status follow
+transform_banksim.py; BankSim amounts are drawn from a lognormal fit of the
+raw file (fraud rows heavier).
+
+Rows are generated in chunks of consecutive txn_ids that cover consecutive
+time windows, so the ledger comes out sorted with no global sort and each
+txn_id is assigned once. Each chunk draws from its own Random seeded with
+(seed, chunk), so a seed gives the same files whatever the worker count.
+Chunks run in parallel processes; each writes a part file, and the parts
+are appended in order.
+
+Formats (written to --output):
+
+- csv: ledger_today.csv, starting_balances.csv and buffers.json, laid out
+  like data/curated (LIQUIDITY_DATA_SOURCE=csv, migrate_to_postgres.py)
+- parquet: the same tables as .parquet with the loader columns
+  (LIQUIDITY_DATA_SOURCE=parquet; needs pyarrow)
+- copy: PostgreSQL COPY text files plus load.sql, for
+  ``psql -f load.sql`` from the output directory
+
+Usage:
+    python generate_ledger.py --rows 5000000 --accounts 20000 [--entities 2] [--currencies 3]
+        [--days 1] [--seed 42] [--workers 8] [--format csv|parquet|copy] [--output generated]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'functions' / 'LiquidityGate'))
+
+from transform_banksim import (  # noqa: E402
+    BASE_DATE, CHANNEL_MAP, CURRENCIES, CURRENCY_WEIGHTS, ENTITIES, ENTITY_WEIGHTS, INFLOW_SHARE,
+    OUTFLOW_STATUSES, STEP_MINUTES, create_buffers, pick_status, scale_amount, start_of_day_balance,
+)
+
+FORMATS = ('csv', 'parquet', 'copy')
+
+# BankSim: 180 five-minute steps per day from 09:00; amount ~ lognormal, fraud
+# share ~1.2% in the raw file but oversampled in the demo
+BANKSIM_STEPS = 180
+FRAUD_SHARE = 0.05
+AMOUNT_LOGNORMAL = (3.3, 0.9)
+FRAUD_AMOUNT_LOGNORMAL = (6.0, 0.8)
+MERCHANTS = 50_000
+
+# Currencies and buffer sizes beyond the demo's three (scaled and buffered like EUR)
+EXTRA_CURRENCIES = ['GBP', 'CHF', 'JPY', 'AED', 'SAR', 'CNY', 'SGD', 'HKD']
+EXTRA_CURRENCY_WEIGHT = 0.05
+DEFAULT_BUFFERS = {'TRY': (45_000_000, '11:30'), 'USD': (2_000_000, '15:00')}
+EXTRA_BUFFER = (1_500_000, '14:00')
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+LEDGER_FIELDS = ['txn_id', 'timestamp_utc', 'entity', 'account_id', 'beneficiary_name', 'payment_type',
+                 'amount', 'direction', 'currency', 'status', 'alert_flag', 'channel']
+BALANCE_FIELDS = ['entity', 'account_id', 'currency', 'start_of_day_balance']
+BUFFER_FIELDS = ['entity', 'currency', 'min_buffer', 'cutoff_time_utc', 'description']
+
+
+class LedgerSpec:
+    """Size, shape and seed of a generated ledger; every row derives from these."""
+
+    def __init__(self, rows: int, accounts: int, entities: int = 2, currencies: int = 3, days: int = 1,
+                 seed: int = 42, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if rows < 1 or accounts < 1 or entities < 1 or days < 1 or chunk_rows < 1:
+            raise ValueError("rows, accounts, entities, days and chunk_rows must be positive")
+        if not 1 <= currencies <= len(CURRENCIES) + len(EXTRA_CURRENCIES):
+            raise ValueError(f"currencies must be between 1 and {len(CURRENCIES) + len(EXTRA_CURRENCIES)}")
+        self.rows = rows
+        self.accounts = accounts
+        self.days = days
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+        self.entities = (ENTITIES + [f"Entity{k + 1:02d}" for k in range(len(ENTITIES), entities)])[:entities]
+        self.entity_weights = (ENTITY_WEIGHTS + [ENTITY_WEIGHTS[-1]] * entities)[:entities]
+        self.currencies = (CURRENCIES + EXTRA_CURRENCIES)[:currencies]
+        self.currency_weights = (CURRENCY_WEIGHTS + [EXTRA_CURRENCY_WEIGHT] * len(EXTRA_CURRENCIES))[:currencies]
+        self.day_seconds = BANKSIM_STEPS * STEP_MINUTES * 60
+        self.txn_width = max(6, len(str(rows)))
+        self.account_width = max(3, len(str(accounts - 1)))
+
+    @property
+    def chunks(self) -> int:
+        return -(-self.rows // self.chunk_rows)
+
+    def chunk_bounds(self, chunk: int) -> tuple[int, int]:
+        """Row range [lo, hi) of ``chunk``."""
+        return chunk * self.chunk_rows, min((chunk + 1) * self.chunk_rows, self.rows)
+
+    def account_table(self) -> list[tuple[str, str]]:
+        """(entity, account_id) per account number; each account belongs to one weighted-random entity."""
+        rng = random.Random(f"{self.seed}-accounts")
+        table = []
+        for number in range(self.accounts):
+            entity = rng.choices(self.entities, weights=self.entity_weights)[0]
+            table.append((entity, f"ACC-{entity[:3]}-{number:0{self.account_width}d}"))
+        return table
+
+    def describe(self) -> dict:
+        return {"rows": self.rows, "accounts": self.accounts, "entities": len(self.entities),
+                "currencies": len(self.currencies), "days": self.days, "seed": self.seed,
+                "chunk_rows": self.chunk_rows}
+
+
+_account_tables = {}
+
+
+def _accounts(spec: LedgerSpec) -> list[tuple[str, str]]:
+    """spec.account_table(), built once per process."""
+    key = (spec.seed, spec.accounts, tuple(spec.entities))
+    if key not in _account_tables:
+        _account_tables[key] = spec.account_table()
+    return _account_tables[key]
+
+
+def generate_chunk(spec: LedgerSpec, chunk: int) -> list[dict]:
+    """
+    Ledger rows of one chunk, in timestamp order with final txn_ids.
+
+    The chunk's rows get random times within its share of the D x 15h
+    window (chunk windows follow each other), sorted before ids are given.
+    """
+    rng = random.Random(f"{spec.seed}-{chunk}")
+    accounts = _accounts(spec)
+    categories = list(CHANNEL_MAP)
+    lo, hi = spec.chunk_bounds(chunk)
+    total_seconds = spec.days * spec.day_seconds
+    start, end = lo * total_seconds // spec.rows, hi * total_seconds // spec.rows
+    offsets = sorted(rng.randrange(start, max(end, start + 1)) for _ in range(hi - lo))
+
+    minutes = {}
+    rows = []
+    for i, offset in enumerate(offsets, start=lo):
+        minute, second = divmod(offset, 60)
+        prefix = minutes.get(minute)
+        if prefix is None:
+            day, in_day = divmod(minute * 60, spec.day_seconds)
+            prefix = minutes[minute] = (BASE_DATE + timedelta(days=day, seconds=in_day)).strftime('%Y-%m-%d %H:%M')
+        fraud = rng.random() < FRAUD_SHARE
+        entity, account_id = accounts[rng.randrange(spec.accounts)]
+        currency = rng.choices(spec.currencies, weights=spec.currency_weights)[0]
+        base_amount = round(rng.lognormvariate(*(FRAUD_AMOUNT_LOGNORMAL if fraud else AMOUNT_LOGNORMAL)), 2)
+        category = rng.choice(categories)
+        rows.append({
+            'txn_id': f"TXN-{i + 1:0{spec.txn_width}d}",
+            'timestamp_utc': f"{prefix}:{second:02d}",
+            'entity': entity,
+            'account_id': account_id,
+            'beneficiary_name': f"M{rng.randrange(MERCHANTS):05d}",
+            'payment_type': category.strip("'"),
+            'amount': max(scale_amount(base_amount, currency, rng), 0.01),
+            'direction': 'IN' if rng.random() < INFLOW_SHARE else 'OUT',
+            'currency': currency,
+            'status': pick_status(rng.random()),
+            'alert_flag': 'ANOMALY_DETECTED' if fraud else '',
+            'channel': CHANNEL_MAP[category],
+        })
+    return rows
+
+
+def iter_ledger(spec: LedgerSpec):
+    """Yield every ledger row of ``spec`` in order, in this process, one chunk in memory at a time."""
+    for chunk in range(spec.chunks):
+        yield from generate_chunk(spec, chunk)
+
+
+def net_outflows(rows, totals: dict = None) -> dict:
+    """
+    Add ``rows`` to {(entity, account_id, currency): [outflow, inflow]} in int cents.
+
+    The create_starting_balances rule, kept in cents so chunk totals merge
+    exactly in any order.
+    """
+    totals = {} if totals is None else totals
+    for row in rows:
+        total = totals.get((row['entity'], row['account_id'], row['currency']))
+        if total is None:
+            total = totals[(row['entity'], row['account_id'], row['currency'])] = [0, 0]
+        if row['direction'] == 'OUT':
+            if row['status'] in OUTFLOW_STATUSES:
+                total[0] += round(row['amount'] * 100)
+        elif row['direction'] == 'IN':
+            total[1] += round(row['amount'] * 100)
+    return totals
+
+
+def starting_balances(totals: dict) -> list[dict]:
+    """Starting balance rows (transform_banksim.start_of_day_balance) from net_outflows totals."""
+    return [
+        {'entity': entity, 'account_id': account_id, 'currency': currency,
+         'start_of_day_balance': start_of_day_balance(account_id, currency, (outflow - inflow) / 100)}
+        for (entity, account_id, currency), (outflow, inflow) in sorted(totals.items())
+    ]
+
+
+def buffer_rules(spec: LedgerSpec) -> list[dict]:
+    """One buffer rule per entity/currency: the demo's rules where they exist, else a default per currency."""
+    known = {(rule['entity'], rule['currency']): rule for rule in create_buffers()}
+    rules = []
+    for entity in spec.entities:
+        for currency in spec.currencies:
+            rule = known.get((entity, currency))
+            if rule is None:
+                min_buffer, cutoff = DEFAULT_BUFFERS.get(currency, EXTRA_BUFFER)
+                rule = {'entity': entity, 'currency': currency, 'min_buffer': min_buffer,
+                        'cutoff_time_utc': cutoff, 'description': f"Generated {currency} buffer for {entity}"}
+            rules.append(rule)
+    return rules
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+def _copy_value(value) -> str:
+    """A value in PostgreSQL COPY text format (empty strings load as NULL, as in migrate_to_postgres.py)."""
+    if value is None or value == '':
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _arrow():
+    from data_sources import arrow_schemas, balance_row, buffer_row, ledger_row, pa, pq
+    if pa is None:
+        raise RuntimeError("The parquet format requires pyarrow (pip install pyarrow)")
+    return arrow_schemas(), ledger_row, balance_row, buffer_row, pq, pa
+
+
+def write_rows(rows: list[dict], fields: list[str], path: Path, fmt: str, table: str = None,
+               header: bool = True, first_seq: int = 1):
+    """Write ``rows`` as one file: CSV (optionally headerless), COPY text, or Parquet of ``table``."""
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            if header:
+                writer.writeheader()
+            writer.writerows(rows)
+    elif fmt == 'copy':
+        with open(path, 'w') as f:
+            f.writelines('\t'.join(_copy_value(row[field]) for field in fields) + '\n' for row in rows)
+    else:
+        schemas, ledger_row, balance_row, buffer_row, pq, pa = _arrow()
+        if table == 'ledger_today':
+            rows = [ledger_row(row, seq) for seq, row in enumerate(rows, start=first_seq)]
+        else:
+            rows = [(balance_row if table == 'starting_balances' else buffer_row)(row) for row in rows]
+        pq.write_table(pa.Table.from_pylist(rows, schema=schemas[table]), path)
+
+
+def _generate_part(task: tuple) -> dict:
+    """Worker: generate one chunk, write it as a part file, return its balance totals."""
+    spec, chunk, fmt, part = task
+    rows = generate_chunk(spec, chunk)
+    write_rows(rows, LEDGER_FIELDS, Path(part), fmt, 'ledger_today', header=False,
+               first_seq=spec.chunk_bounds(chunk)[0] + 1)
+    return net_outflows(rows)
+
+
+def _concatenate_parts(parts: list[Path], path: Path, fmt: str):
+    if fmt == 'parquet':
+        schemas, _, _, _, pq, _ = _arrow()
+        with pq.ParquetWriter(path, schemas['ledger_today']) as writer:
+            for part in parts:
+                writer.write_table(pq.read_table(part))
+        return
+    with open(path, 'w', newline='') as out:
+        if fmt == 'csv':
+            csv.writer(out).writerow(LEDGER_FIELDS)
+        for part in parts:
+            with open(part, newline='') as f:
+                shutil.copyfileobj(f, out)
+
+
+def _write_load_sql(output: Path):
+    """psql script loading the COPY files (replaces the current tables' rows)."""
+    def copy(table, fields):
+        return f"\\copy treasury.{table} ({', '.join(fields)}) FROM '{table}.copy'\n"
+    with open(output / 'load.sql', 'w') as f:
+        f.write("-- Generated by data/generate_ledger.py; run from this directory: psql -f load.sql\n")
+        f.write("TRUNCATE treasury.ledger_today, treasury.starting_balances, treasury.buffers;\n")
+        f.write(copy('ledger_today', LEDGER_FIELDS))
+        f.write(copy('starting_balances', BALANCE_FIELDS))
+        f.write(copy('buffers', BUFFER_FIELDS))
+
+
+def generate(spec: LedgerSpec, output, fmt: str = 'csv', workers: int = None) -> dict:
+    """
+    Write the ledger, starting balances and buffer rules of ``spec`` to ``output``.
+
+    ``workers`` processes generate chunks in parallel (1 runs inline); the
+    files are identical for any worker count. Returns a summary.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}. Use one of: {', '.join(FORMATS)}")
+    if fmt == 'parquet':
+        _arrow()
+    output = Path(output)
+    parts_dir = output / '.parts'
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    extension = {'csv': 'csv', 'copy': 'copy', 'parquet': 'parquet'}[fmt]
+    started = time.perf_counter()
+
+    parts = [parts_dir / f"ledger-{chunk:05d}.{extension}" for chunk in range(spec.chunks)]
+    tasks = [(spec, chunk, fmt, str(part)) for chunk, part in enumerate(parts)]
+    workers = min(workers or os.cpu_count() or 1, spec.chunks)
+    totals = {}
+    try:
+        if workers == 1:
+            for chunk_total in map(_generate_part, tasks):
+                _merge(totals, chunk_total)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for chunk_total in pool.map(_generate_part, tasks):
+                    _merge(totals, chunk_total)
+        _concatenate_parts(parts, output / f"ledger_today.{extension}", fmt)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    generated = time.perf_counter() - started
+
+    balances = starting_balances(totals)
+    buffers = buffer_rules(spec)
+    if fmt == 'csv':
+        write_rows(balances, BALANCE_FIELDS, output / 'starting_balances.csv', fmt)
+        with open(output / 'buffers.json', 'w') as f:
+            json.dump(buffers, f, indent=2)
+    else:
+        write_rows(balances, BALANCE_FIELDS, output / f"starting_balances.{extension}", fmt, 'starting_balances')
+        write_rows(buffers, BUFFER_FIELDS, output / f"buffers.{extension}", fmt, 'buffers')
+    if fmt == 'copy':
+        _write_load_sql(output)
+
+    return {
+        **spec.describe(),
+        "format": fmt,
+        "workers": workers,
+        "balances": len(balances),
+        "buffers": len(buffers),
+        "seconds": round(time.perf_counter() - started, 2),
+        "rows_per_second": round(spec.rows / generated),
+    }
+
+
+def _merge(totals: dict, chunk_totals: dict):
+    for key, (outflow, inflow) in chunk_totals.items():
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [outflow, inflow]
+        else:
+            total[0] += outflow
+            total[1] += inflow
+
+
+def _count(value: str) -> int:
+    """A row or account count, also written as 5e6."""
+    return int(float(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic treasury ledger for load tests')
+    parser.add_argument('--rows', type=_count, required=True, help='Ledger rows (N)')
+    parser.add_argument('--accounts', type=_count, required=True, help='Accounts (M)')
+    parser.add_argument('--entities', type=int, default=2, help='Entities (K)')
+    parser.add_argument('--currencies', type=int, default=3,
+                        help=f'Currencies (C, up to {len(CURRENCIES) + len(EXTRA_CURRENCIES)})')
+    parser.add_argument('--days', type=int, default=1, help='Days (D) of 15 business hours from 09:00')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help='Generator processes (default: one per core)')
+    parser.add_argument('--chunk-rows', type=_count, default=DEFAULT_CHUNK_ROWS, help='Rows per chunk / part file')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--output', default='generated', help='Output directory')
+    args = parser.parse_args()
+
+    try:
+        spec = LedgerSpec(args.rows, args.accounts, args.entities, args.currencies, args.days,
+                          args.seed, args.chunk_rows)
+        print(f"Generating {spec.rows:,} rows ({spec.chunks} chunks) into {args.output}/ as {args.format}...")
+        summary = generate(spec, args.output, args.format, args.workers)
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"  {summary['balances']:,} starting balances, {summary['buffers']} buffer rules")
+    print(f"  {summary['seconds']} s with {summary['workers']} workers ({summary['rows_per_second']:,} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
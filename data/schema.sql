@@ -8,6 +8,10 @@ CREATE SCHEMA IF NOT EXISTS treasury;
 -- ============================================================================
 -- 1. ledger_today - Daily payment transactions (3,001 rows)
 -- ============================================================================
+-- change_seq is a high-water mark for incremental snapshot refresh: every
+-- insert takes the next value and the trigger below bumps it on update.
+CREATE SEQUENCE IF NOT EXISTS treasury.ledger_change_seq;
+
 CREATE TABLE IF NOT EXISTS treasury.ledger_today (
     txn_id VARCHAR(50) PRIMARY KEY,
     timestamp_utc TIMESTAMP NOT NULL,
@@ -20,14 +24,32 @@ CREATE TABLE IF NOT EXISTS treasury.ledger_today (
     currency VARCHAR(3) NOT NULL,
     status VARCHAR(50) NOT NULL,
     alert_flag VARCHAR(100),
-    channel VARCHAR(50)
+    channel VARCHAR(50),
+    change_seq BIGINT NOT NULL DEFAULT nextval('treasury.ledger_change_seq')
 );
 
+-- Existing databases: add the column (backfills every row from the sequence)
+ALTER TABLE treasury.ledger_today
+    ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('treasury.ledger_change_seq');
+
+CREATE OR REPLACE FUNCTION treasury.bump_ledger_change_seq() RETURNS trigger AS $$
+BEGIN
+    NEW.change_seq := nextval('treasury.ledger_change_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ledger_change_seq ON treasury.ledger_today;
+CREATE TRIGGER trg_ledger_change_seq
+    BEFORE UPDATE ON treasury.ledger_today
+    FOR EACH ROW EXECUTE FUNCTION treasury.bump_ledger_change_seq();
+
 -- Indexes for common query patterns
 CREATE INDEX IF NOT EXISTS idx_ledger_account_currency ON treasury.ledger_today(account_id, currency);
 CREATE INDEX IF NOT EXISTS idx_ledger_entity ON treasury.ledger_today(entity);
 CREATE INDEX IF NOT EXISTS idx_ledger_timestamp ON treasury.ledger_today(timestamp_utc);
 CREATE INDEX IF NOT EXISTS idx_ledger_status ON treasury.ledger_today(status);
+CREATE INDEX IF NOT EXISTS idx_ledger_change_seq ON treasury.ledger_today(change_seq);
 
 -- ============================================================================
 -- 2. starting_balances - Account opening balances (260 rows)
@@ -60,3 +82,322 @@ CREATE TABLE IF NOT EXISTS treasury.buffers (
 
 -- Index
 CREATE INDEX IF NOT EXISTS idx_buffers_entity_currency ON treasury.buffers(entity, currency);
+
+-- ============================================================================
+-- 4. intraday_position - Running balance after each ledger row, per account
+-- ============================================================================
+-- Ordered by (timestamp_utc, txn_id) within each account/currency. running_min
+-- is the lowest balance from start of day (included) through the row and
+-- suffix_min the lowest from the row to end of day, so a payment released at
+-- time T breaches iff LEAST(running_min at T, balance at T - amount,
+-- suffix_min after T - amount) is below the buffer: a few index probes
+-- instead of a replay. Kept current by the statement triggers below (ledger
+-- writes from the first changed row onward, balance writes per touched
+-- slice); refresh_intraday_position() with no arguments rebuilds it all.
+CREATE TABLE IF NOT EXISTS treasury.intraday_position (
+    account_id VARCHAR(50) NOT NULL,
+    currency VARCHAR(3) NOT NULL,
+    seq INTEGER NOT NULL,
+    txn_id VARCHAR(50) NOT NULL,
+    timestamp_utc TIMESTAMP NOT NULL,
+    signed_amount DECIMAL(18, 2) NOT NULL,
+    start_of_day_balance DECIMAL(18, 2) NOT NULL,
+    balance DECIMAL(18, 2) NOT NULL,
+    running_min DECIMAL(18, 2) NOT NULL,
+    suffix_min DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (account_id, currency, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_position_account_time
+    ON treasury.intraday_position(account_id, currency, timestamp_utc, seq);
+
+CREATE OR REPLACE FUNCTION treasury.refresh_intraday_position(
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_currencies TEXT[] DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    IF p_account_ids IS NULL THEN
+        DELETE FROM treasury.intraday_position;
+    ELSE
+        DELETE FROM treasury.intraday_position p
+        USING unnest(p_account_ids, p_currencies) AS k(account_id, currency)
+        WHERE p.account_id = k.account_id AND p.currency = k.currency;
+    END IF;
+
+    INSERT INTO treasury.intraday_position
+        (account_id, currency, seq, txn_id, timestamp_utc, signed_amount,
+         start_of_day_balance, balance, running_min, suffix_min)
+    SELECT
+        account_id, currency, seq, txn_id, timestamp_utc, signed_amount,
+        start_of_day_balance, balance,
+        LEAST(start_of_day_balance, MIN(balance) OVER (
+            PARTITION BY account_id, currency ORDER BY seq ROWS UNBOUNDED PRECEDING)),
+        MIN(balance) OVER (
+            PARTITION BY account_id, currency ORDER BY seq DESC ROWS UNBOUNDED PRECEDING)
+    FROM (
+        SELECT
+            l.account_id,
+            l.currency,
+            ROW_NUMBER() OVER w AS seq,
+            l.txn_id,
+            l.timestamp_utc,
+            CASE WHEN l.direction = 'OUT' THEN -l.amount ELSE l.amount END AS signed_amount,
+            COALESCE(b.start_of_day_balance, 0) AS start_of_day_balance,
+            COALESCE(b.start_of_day_balance, 0)
+                + SUM(CASE WHEN l.direction = 'OUT' THEN -l.amount ELSE l.amount END) OVER w AS balance
+        FROM treasury.ledger_today l
+        LEFT JOIN LATERAL (
+            SELECT sb.start_of_day_balance
+            FROM treasury.starting_balances sb
+            WHERE sb.account_id = l.account_id AND sb.currency = l.currency
+            ORDER BY sb.id
+            LIMIT 1
+        ) b ON TRUE
+        WHERE p_account_ids IS NULL
+           OR (l.account_id, l.currency) IN (SELECT * FROM unnest(p_account_ids, p_currencies))
+        WINDOW w AS (PARTITION BY l.account_id, l.currency ORDER BY l.timestamp_utc, l.txn_id
+                     ROWS UNBOUNDED PRECEDING)
+    ) positions;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute one slice from its first row at or after (p_timestamp, p_txn_id).
+-- Rows before that keep their seq, balance and running_min; of those, only the
+-- tail whose suffix_min can reach the old or new minimum of the recomputed rows
+-- is rewritten, so a payment booked late in the day touches a few rows instead
+-- of the whole slice.
+CREATE OR REPLACE FUNCTION treasury.refresh_intraday_position_from(
+    p_account_id TEXT,
+    p_currency TEXT,
+    p_timestamp TIMESTAMP,
+    p_txn_id TEXT
+) RETURNS INTEGER AS $$
+DECLARE
+    prior_seq INTEGER;
+    prior_timestamp TIMESTAMP;
+    prior_txn_id TEXT;
+    prior_balance DECIMAL(18, 2);
+    prior_running_min DECIMAL(18, 2);
+    start_balance DECIMAL(18, 2);
+    old_min DECIMAL(18, 2);
+    new_min DECIMAL(18, 2);
+    keep_seq INTEGER;
+    refreshed INTEGER;
+    patched INTEGER;
+BEGIN
+    -- Last row sorting before the change (all NULL when the change opens the slice)
+    SELECT seq, timestamp_utc, txn_id, balance, running_min
+    INTO prior_seq, prior_timestamp, prior_txn_id, prior_balance, prior_running_min
+    FROM treasury.intraday_position
+    WHERE account_id = p_account_id AND currency = p_currency
+      AND timestamp_utc <= p_timestamp
+      AND (timestamp_utc < p_timestamp OR txn_id < p_txn_id)
+    ORDER BY timestamp_utc DESC, seq DESC
+    LIMIT 1;
+    prior_seq := COALESCE(prior_seq, 0);
+
+    SELECT suffix_min INTO old_min
+    FROM treasury.intraday_position
+    WHERE account_id = p_account_id AND currency = p_currency AND seq = prior_seq + 1;
+
+    DELETE FROM treasury.intraday_position
+    WHERE account_id = p_account_id AND currency = p_currency AND seq > prior_seq;
+
+    start_balance := COALESCE((
+        SELECT sb.start_of_day_balance
+        FROM treasury.starting_balances sb
+        WHERE sb.account_id = p_account_id AND sb.currency = p_currency
+        ORDER BY sb.id
+        LIMIT 1
+    ), 0);
+
+    INSERT INTO treasury.intraday_position
+        (account_id, currency, seq, txn_id, timestamp_utc, signed_amount,
+         start_of_day_balance, balance, running_min, suffix_min)
+    SELECT
+        p_account_id, p_currency, prior_seq + rn, txn_id, timestamp_utc, signed_amount,
+        start_balance, balance,
+        LEAST(COALESCE(prior_running_min, start_balance), MIN(balance) OVER (
+            ORDER BY rn ROWS UNBOUNDED PRECEDING)),
+        MIN(balance) OVER (ORDER BY rn DESC ROWS UNBOUNDED PRECEDING)
+    FROM (
+        SELECT
+            ROW_NUMBER() OVER w AS rn,
+            l.txn_id,
+            l.timestamp_utc,
+            CASE WHEN l.direction = 'OUT' THEN -l.amount ELSE l.amount END AS signed_amount,
+            COALESCE(prior_balance, start_balance)
+                + SUM(CASE WHEN l.direction = 'OUT' THEN -l.amount ELSE l.amount END) OVER w AS balance
+        FROM treasury.ledger_today l
+        WHERE l.account_id = p_account_id AND l.currency = p_currency
+          AND (prior_timestamp IS NULL OR (l.timestamp_utc, l.txn_id) > (prior_timestamp, prior_txn_id))
+        WINDOW w AS (ORDER BY l.timestamp_utc, l.txn_id ROWS UNBOUNDED PRECEDING)
+    ) tail;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+
+    SELECT suffix_min INTO new_min
+    FROM treasury.intraday_position
+    WHERE account_id = p_account_id AND currency = p_currency AND seq = prior_seq + 1;
+
+    -- suffix_min never decreases along seq, so the kept rows whose value can
+    -- change are the ones after the last row already below both minimums
+    -- (LEAST skips the NULL of an empty tail)
+    IF prior_seq > 0 AND old_min IS DISTINCT FROM new_min THEN
+        SELECT COALESCE(MAX(seq), 0) INTO keep_seq
+        FROM treasury.intraday_position
+        WHERE account_id = p_account_id AND currency = p_currency
+          AND seq <= prior_seq AND suffix_min < LEAST(old_min, new_min);
+
+        UPDATE treasury.intraday_position p
+        SET suffix_min = LEAST(s.suffix_min, new_min)
+        FROM (
+            SELECT seq, MIN(balance) OVER (ORDER BY seq DESC ROWS UNBOUNDED PRECEDING) AS suffix_min
+            FROM treasury.intraday_position
+            WHERE account_id = p_account_id AND currency = p_currency
+              AND seq > keep_seq AND seq <= prior_seq
+        ) s
+        WHERE p.account_id = p_account_id AND p.currency = p_currency AND p.seq = s.seq;
+        GET DIAGNOSTICS patched = ROW_COUNT;
+        refreshed := refreshed + patched;
+    END IF;
+
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ledger writes: recompute each touched slice from the earliest row the
+-- statement inserted, deleted or moved (see refresh_intraday_position_from).
+-- Transition tables need one trigger per event, hence the three ledger triggers.
+CREATE OR REPLACE FUNCTION treasury.sync_intraday_position_ledger() RETURNS trigger AS $$
+DECLARE
+    slice RECORD;
+BEGIN
+    FOR slice IN
+        SELECT DISTINCT ON (account_id, currency) account_id, currency, timestamp_utc, txn_id
+        FROM changed_rows
+        ORDER BY account_id, currency, timestamp_utc, txn_id
+    LOOP
+        PERFORM treasury.refresh_intraday_position_from(
+            slice.account_id, slice.currency, slice.timestamp_utc, slice.txn_id);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION treasury.sync_intraday_position_ledger_update() RETURNS trigger AS $$
+DECLARE
+    slice RECORD;
+BEGIN
+    -- Rows can move in time or between accounts/currencies: start each slice
+    -- at the earlier of the old and new positions
+    FOR slice IN
+        SELECT DISTINCT ON (account_id, currency) account_id, currency, timestamp_utc, txn_id
+        FROM (
+            SELECT account_id, currency, timestamp_utc, txn_id FROM changed_rows
+            UNION ALL
+            SELECT account_id, currency, timestamp_utc, txn_id FROM previous_rows
+        ) keys
+        ORDER BY account_id, currency, timestamp_utc, txn_id
+    LOOP
+        PERFORM treasury.refresh_intraday_position_from(
+            slice.account_id, slice.currency, slice.timestamp_utc, slice.txn_id);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Starting-balance writes shift every row of a slice, so those recompute the
+-- touched slices whole.
+CREATE OR REPLACE FUNCTION treasury.sync_intraday_position() RETURNS trigger AS $$
+DECLARE
+    account_ids TEXT[];
+    currencies TEXT[];
+BEGIN
+    SELECT ARRAY_AGG(account_id), ARRAY_AGG(currency) INTO account_ids, currencies
+    FROM (SELECT DISTINCT account_id, currency FROM changed_rows) keys;
+    IF account_ids IS NOT NULL THEN
+        PERFORM treasury.refresh_intraday_position(account_ids, currencies);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION treasury.sync_intraday_position_update() RETURNS trigger AS $$
+DECLARE
+    account_ids TEXT[];
+    currencies TEXT[];
+BEGIN
+    -- Rows can move between accounts/currencies: refresh old and new slices
+    SELECT ARRAY_AGG(account_id), ARRAY_AGG(currency) INTO account_ids, currencies
+    FROM (
+        SELECT account_id, currency FROM changed_rows
+        UNION
+        SELECT account_id, currency FROM previous_rows
+    ) keys;
+    IF account_ids IS NOT NULL THEN
+        PERFORM treasury.refresh_intraday_position(account_ids, currencies);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION treasury.rebuild_intraday_position() RETURNS trigger AS $$
+BEGIN
+    PERFORM treasury.refresh_intraday_position();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_position_ledger_insert ON treasury.ledger_today;
+CREATE TRIGGER trg_position_ledger_insert
+    AFTER INSERT ON treasury.ledger_today
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position_ledger();
+
+DROP TRIGGER IF EXISTS trg_position_ledger_update ON treasury.ledger_today;
+CREATE TRIGGER trg_position_ledger_update
+    AFTER UPDATE ON treasury.ledger_today
+    REFERENCING OLD TABLE AS previous_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position_ledger_update();
+
+DROP TRIGGER IF EXISTS trg_position_ledger_delete ON treasury.ledger_today;
+CREATE TRIGGER trg_position_ledger_delete
+    AFTER DELETE ON treasury.ledger_today
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position_ledger();
+
+DROP TRIGGER IF EXISTS trg_position_ledger_truncate ON treasury.ledger_today;
+CREATE TRIGGER trg_position_ledger_truncate
+    AFTER TRUNCATE ON treasury.ledger_today
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.rebuild_intraday_position();
+
+DROP TRIGGER IF EXISTS trg_position_balances_insert ON treasury.starting_balances;
+CREATE TRIGGER trg_position_balances_insert
+    AFTER INSERT ON treasury.starting_balances
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position();
+
+DROP TRIGGER IF EXISTS trg_position_balances_update ON treasury.starting_balances;
+CREATE TRIGGER trg_position_balances_update
+    AFTER UPDATE ON treasury.starting_balances
+    REFERENCING OLD TABLE AS previous_rows NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position_update();
+
+DROP TRIGGER IF EXISTS trg_position_balances_delete ON treasury.starting_balances;
+CREATE TRIGGER trg_position_balances_delete
+    AFTER DELETE ON treasury.starting_balances
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.sync_intraday_position();
+
+DROP TRIGGER IF EXISTS trg_position_balances_truncate ON treasury.starting_balances;
+CREATE TRIGGER trg_position_balances_truncate
+    AFTER TRUNCATE ON treasury.starting_balances
+    FOR EACH STATEMENT EXECUTE FUNCTION treasury.rebuild_intraday_position();
+
+-- Backfill (no-op on an empty ledger; the triggers keep it current afterwards)
+SELECT treasury.refresh_intraday_position();
@@ -0,0 +1,620 @@
+"""
+Data Sources
+============
+Local backends for the LiquidityGate loaders, without PostgreSQL.
+
+function_app makes every loader call on one DataSource: PostgresSource
+over Azure PostgreSQL (DB_CONFIG) by default. When ``LIQUIDITY_DATA_SOURCE``
+names one of the backends below, the same calls (load_ledger,
+load_balances, load_buffers, the targeted slice and payment lookups,
+load_fingerprint) are answered from local files instead, so snapshot,
+targeted, batch, schedule and stress requests all run with no network:
+
+- ``csv``: the curated files (ledger_today.csv, starting_balances.csv,
+  buffers.json), parsed into memory
+- ``parquet`` / ``arrow``: the same tables as Parquet or Arrow IPC files,
+  read through pyarrow (optional dependency) already typed, then held in
+  memory as row dicts like the CSV tables
+- ``sqlite``: an embedded treasury.sqlite with the PostgreSQL indexes,
+  queried per call like the SQL loaders
+
+Rows have the shape the SQL loaders return: numerics as float, NULLs as
+None, ``timestamp_epoch`` and the ``*_cents`` columns filled in. There is no
+change_seq high-water mark: the fingerprint is the size and mtime of the
+files, so rewriting them triggers a full snapshot reload. Nor is there a
+treasury.intraday_position table, so position load mode needs PostgreSQL.
+
+The Parquet, Arrow and SQLite files are derived from the curated CSVs:
+
+    python functions/LiquidityGate/data_sources.py --format sqlite [--path data/curated]
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from liquidity_engine import epoch_seconds, to_cents
+from timings import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only the parquet/arrow backends need pyarrow
+    pa = None
+    pq = None
+
+DATA_SOURCES = ("postgres", "csv", "parquet", "arrow", "sqlite")
+
+# data/curated in a checkout; deployed packages set LIQUIDITY_DATA_PATH
+DEFAULT_DATA_PATH = Path(__file__).resolve().parent.parent.parent / 'data' / 'curated'
+
+SQLITE_FILE = 'treasury.sqlite'
+
+LEDGER_COLUMNS = ['txn_id', 'timestamp_utc', 'timestamp_epoch', 'entity', 'account_id', 'beneficiary_name',
+                  'payment_type', 'amount', 'amount_cents', 'direction', 'currency', 'status', 'alert_flag',
+                  'channel', 'change_seq']
+BALANCE_COLUMNS = ['entity', 'account_id', 'currency', 'start_of_day_balance', 'balance_cents']
+BUFFER_COLUMNS = ['entity', 'currency', 'min_buffer', 'min_buffer_cents', 'cutoff_time_utc', 'description']
+
+
+def ledger_row(row: dict, seq: int) -> dict:
+    """A curated CSV ledger row as the SQL loaders return it (``seq`` stands in for change_seq)."""
+    amount = float(row['amount'])
+    return {
+        'txn_id': row['txn_id'],
+        'timestamp_utc': row['timestamp_utc'],
+        'timestamp_epoch': epoch_seconds(row['timestamp_utc']),
+        'entity': row['entity'],
+        'account_id': row['account_id'],
+        'beneficiary_name': row['beneficiary_name'] or None,
+        'payment_type': row['payment_type'] or None,
+        'amount': amount,
+        'amount_cents': to_cents(amount),
+        'direction': row['direction'],
+        'currency': row['currency'],
+        'status': row['status'],
+        'alert_flag': row.get('alert_flag') or None,
+        'channel': row['channel'] or None,
+        'change_seq': seq,
+    }
+
+
+def balance_row(row: dict) -> dict:
+    return {
+        'entity': row['entity'],
+        'account_id': row['account_id'],
+        'currency': row['currency'],
+        'start_of_day_balance': float(row['start_of_day_balance']),
+        'balance_cents': to_cents(row['start_of_day_balance']),
+    }
+
+
+def buffer_row(row: dict) -> dict:
+    return {
+        'entity': row['entity'],
+        'currency': row['currency'],
+        'min_buffer': float(row['min_buffer']),
+        'min_buffer_cents': to_cents(row['min_buffer']),
+        'cutoff_time_utc': row.get('cutoff_time_utc') or None,
+        'description': row.get('description'),
+    }
+
+
+def _file_stamp(files: list[Path]) -> tuple:
+    """(name, size, mtime_ns) per file: cheap change detection without reading them."""
+    stamp = []
+    for file in files:
+        stat = file.stat()
+        stamp.append((file.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+class UnsupportedCapability(RuntimeError):
+    """A DataSource asked for a PostgreSQL-only capability its flags say it lacks."""
+
+
+class DataSource(ABC):
+    """
+    The loaders function_app reads the treasury tables through.
+
+    Rows come back in the shape of the SQL loaders. Two capabilities are
+    PostgreSQL-only and flagged so callers can check before relying on them:
+    ``load_ledger_changes`` (incremental snapshot refresh past the change_seq
+    high-water mark) and ``load_position`` (treasury.intraday_position).
+    Elsewhere both raise UnsupportedCapability.
+    """
+
+    name = None
+    supports_changes = False
+    supports_position = False
+
+    @property
+    def label(self) -> str:
+        """Where the tables are read from, for the audit block of results."""
+        return f"{self.name} ({self.path})"
+
+    @abstractmethod
+    def load_fingerprint(self) -> tuple:
+        """Cheap change detection: (ledger rows, change_seq high-water mark, ...)."""
+
+    @abstractmethod
+    def load_ledger(self) -> list[dict]:
+        """Every ledger row, in timestamp order."""
+
+    @abstractmethod
+    def load_payment(self, payment_id: str) -> dict | None:
+        """One ledger row by txn_id, or None."""
+
+    @abstractmethod
+    def load_ledger_slice(self, account_id: str, currency: str) -> list[dict]:
+        """One account/currency slice of the ledger, in timestamp order."""
+
+    @abstractmethod
+    def load_payments(self, payment_ids: list[str] = None, status: str = None) -> list[dict]:
+        """Ledger rows by txn_id list and/or status."""
+
+    @abstractmethod
+    def count_outgoing(self, status: str, exclude_ids: list[str] = None) -> int:
+        """Number of OUT ledger rows with ``status`` whose txn_id is not in ``exclude_ids``."""
+
+    @abstractmethod
+    def load_ledger_slices(self, keys: list[tuple]) -> list[dict]:
+        """Several account/currency slices of the ledger, in timestamp order."""
+
+    @abstractmethod
+    def load_balances(self) -> list[dict]:
+        """Every starting balance row."""
+
+    @abstractmethod
+    def load_buffers(self) -> list[dict]:
+        """Every buffer rule."""
+
+    @abstractmethod
+    def load_balance(self, account_id: str, currency: str) -> list[dict]:
+        """The starting balance row(s) for one account/currency."""
+
+    @abstractmethod
+    def load_entity_balances(self, entity: str, currency: str) -> list[dict]:
+        """The starting balances of every account of one entity/currency."""
+
+    @abstractmethod
+    def load_buffer(self, entity: str, currency: str) -> list[dict]:
+        """The buffer rule for one entity/currency."""
+
+    @abstractmethod
+    def load_balances_for(self, keys: list[tuple]) -> list[dict]:
+        """Starting balances for several account/currency pairs."""
+
+    @abstractmethod
+    def row_counts(self) -> dict:
+        """Row count per table, for the health check."""
+
+    def load_ledger_changes(self, since_seq: int) -> list[dict]:
+        """Ledger rows changed past ``since_seq`` (only where ``supports_changes``)."""
+        raise UnsupportedCapability(f"The {self.name} data source has no change_seq high-water mark")
+
+    def load_position(self, target_payment: dict, entity: str, currency: str) -> dict:
+        """Position boundary rows for one release (only where ``supports_position``)."""
+        raise UnsupportedCapability(f"The {self.name} data source has no treasury.intraday_position")
+
+
+class _Tables:
+    """The three tables of one read, with the lookups the targeted loaders need."""
+
+    def __init__(self, ledger: list[dict], balances: list[dict], buffers: list[dict]):
+        ledger.sort(key=lambda txn: (txn['timestamp_epoch'], txn['txn_id']))
+        self.ledger = ledger
+        self.balances = balances
+        self.buffers = buffers
+        self.payments = {txn['txn_id']: txn for txn in ledger}
+        self.slices = {}
+        for txn in ledger:
+            self.slices.setdefault((txn['account_id'], txn['currency']), []).append(txn)
+        self.account_balances = {}
+        self.entity_balances = {}
+        for bal in balances:
+            self.account_balances.setdefault((bal['account_id'], bal['currency']), []).append(bal)
+            self.entity_balances.setdefault((bal['entity'], bal['currency']), []).append(bal)
+        self.entity_buffers = {}
+        for buf in buffers:
+            self.entity_buffers.setdefault((buf['entity'], buf['currency']), []).append(buf)
+
+
+class FileSource(DataSource):
+    """
+    Tables read whole from files and served from memory.
+
+    The files are re-read (under a lock, once for concurrent callers) when
+    their size or mtime changes. Loaders return fresh lists over shared row
+    dicts, which callers treat as read-only, as they do snapshot rows.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._tables = None
+        self._stamp = None
+
+    @abstractmethod
+    def files(self) -> list[Path]:
+        """The files the tables are read from (their stamps drive reloads)."""
+
+    @abstractmethod
+    def read_tables(self) -> tuple[list[dict], list[dict], list[dict]]:
+        """Read (ledger, balances, buffers) rows in loader shape."""
+
+    def tables(self) -> _Tables:
+        stamp = _file_stamp(self.files())
+        with self._lock:
+            if self._tables is None or stamp != self._stamp:
+                with stage(f"{self.name}.read"):
+                    self._tables = _Tables(*self.read_tables())
+                self._stamp = stamp
+            return self._tables
+
+    def load_fingerprint(self) -> tuple:
+        """Row counts and change_seq are unknown without a read, so (None, None) plus the file stamps."""
+        with stage(f"{self.name}.load_fingerprint"):
+            return (None, None) + _file_stamp(self.files())
+
+    def load_ledger(self) -> list[dict]:
+        return list(self.tables().ledger)
+
+    def load_payment(self, payment_id: str) -> dict | None:
+        return self.tables().payments.get(payment_id)
+
+    def load_ledger_slice(self, account_id: str, currency: str) -> list[dict]:
+        return list(self.tables().slices.get((account_id, currency), ()))
+
+    def load_payments(self, payment_ids: list[str] = None, status: str = None) -> list[dict]:
+        tables = self.tables()
+        if payment_ids:
+            rows = [tables.payments[txn_id] for txn_id in dict.fromkeys(payment_ids) if txn_id in tables.payments]
+        elif status:
+            rows = tables.ledger
+        else:
+            return []
+        return [txn for txn in rows if not status or txn['status'] == status]
+
+    def count_outgoing(self, status: str, exclude_ids: list[str] = None) -> int:
+        excluded = set(exclude_ids or ())
+        return sum(1 for txn in self.tables().ledger
+                   if txn['status'] == status and txn['direction'] == 'OUT' and txn['txn_id'] not in excluded)
+
+    def load_ledger_slices(self, keys: list[tuple]) -> list[dict]:
+        slices = self.tables().slices
+        rows = [txn for key in set(keys) for txn in slices.get(key, ())]
+        rows.sort(key=lambda txn: (txn['timestamp_epoch'], txn['txn_id']))
+        return rows
+
+    def load_balances(self) -> list[dict]:
+        return list(self.tables().balances)
+
+    def load_buffers(self) -> list[dict]:
+        return list(self.tables().buffers)
+
+    def load_balance(self, account_id: str, currency: str) -> list[dict]:
+        return list(self.tables().account_balances.get((account_id, currency), ()))
+
+    def load_entity_balances(self, entity: str, currency: str) -> list[dict]:
+        return list(self.tables().entity_balances.get((entity, currency), ()))
+
+    def load_buffer(self, entity: str, currency: str) -> list[dict]:
+        return list(self.tables().entity_buffers.get((entity, currency), ()))
+
+    def load_balances_for(self, keys: list[tuple]) -> list[dict]:
+        account_balances = self.tables().account_balances
+        return [bal for key in dict.fromkeys(keys) for bal in account_balances.get(key, ())]
+
+    def row_counts(self) -> dict:
+        tables = self.tables()
+        return {"ledger_today": len(tables.ledger), "starting_balances": len(tables.balances),
+                "buffers": len(tables.buffers)}
+
+
+class CsvSource(FileSource):
+    """ledger_today.csv, starting_balances.csv and buffers.json, as transform_banksim.py writes them."""
+
+    name = "csv"
+
+    def files(self) -> list[Path]:
+        return [self.path / 'ledger_today.csv', self.path / 'starting_balances.csv', self.path / 'buffers.json']
+
+    def read_tables(self) -> tuple[list[dict], list[dict], list[dict]]:
+        ledger_file, balances_file, buffers_file = self.files()
+        with open(ledger_file, newline='') as f:
+            ledger = [ledger_row(row, seq) for seq, row in enumerate(csv.DictReader(f), start=1)]
+        with open(balances_file, newline='') as f:
+            balances = [balance_row(row) for row in csv.DictReader(f)]
+        with open(buffers_file) as f:
+            buffers = [buffer_row(row) for row in json.load(f)]
+        return ledger, balances, buffers
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The parquet and arrow data sources require pyarrow (pip install pyarrow)")
+
+
+class ArrowSource(FileSource):
+    """
+    Parquet or Arrow IPC (Feather v2) files.
+
+    The files carry the loader columns already typed (the cents columns and
+    timestamp_epoch included), so a read is a columnar scan plus row dicts
+    and no per-value parsing. Every row is converted to a dict on read, as
+    the loaders serve from memory, so the files are read rather than mapped.
+    """
+
+    TABLES = ('ledger_today', 'starting_balances', 'buffers')
+
+    def __init__(self, path, fmt: str):
+        _require_pyarrow()
+        super().__init__(path)
+        self.name = fmt
+
+    def files(self) -> list[Path]:
+        return [self.path / f"{table}.{self.name}" for table in self.TABLES]
+
+    def _read(self, file: Path) -> list[dict]:
+        if self.name == 'parquet':
+            return pq.read_table(file).to_pylist()
+        with pa.OSFile(str(file)) as source:
+            return pa.ipc.open_file(source).read_all().to_pylist()
+
+    def read_tables(self) -> tuple[list[dict], list[dict], list[dict]]:
+        ledger, balances, buffers = (self._read(file) for file in self.files())
+        return ledger, balances, buffers
+
+
+class SqliteSource(DataSource):
+    """
+    An embedded treasury.sqlite, queried per call like the PostgreSQL loaders.
+
+    Each thread opens its own read-only connection. Slice lookups use the
+    same (account_id, currency) indexes as data/schema.sql, so targeted mode
+    reads only the rows a request needs.
+    """
+
+    name = "sqlite"
+
+    LEDGER_SELECT = f"SELECT {', '.join(LEDGER_COLUMNS)} FROM ledger_today"
+    BALANCE_SELECT = f"SELECT {', '.join(BALANCE_COLUMNS)} FROM starting_balances"
+    BUFFER_SELECT = f"SELECT {', '.join(BUFFER_COLUMNS)} FROM buffers"
+    # JSON-encoded [[account_id, currency], ...] pairs, like the unnest() arrays in the SQL loaders
+    KEYS_IN = """(account_id, currency) IN (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+    )"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = self.path / SQLITE_FILE if self.path.is_dir() else self.path
+        self._local = threading.local()
+
+    def _query(self, loader: str, sql: str, columns: list[str], *params) -> list[dict]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.file.resolve().as_uri()}?mode=ro", uri=True)
+            self._local.conn = conn
+        with stage(f"sqlite.{loader}"):
+            rows = conn.execute(sql, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def files(self) -> list[Path]:
+        wal = self.file.with_name(self.file.name + '-wal')
+        return [self.file, wal] if wal.exists() else [self.file]
+
+    def load_fingerprint(self) -> tuple:
+        with stage("sqlite.load_fingerprint"):
+            return (None, None) + _file_stamp(self.files())
+
+    def load_ledger(self) -> list[dict]:
+        return self._query("load_ledger", self.LEDGER_SELECT + " ORDER BY timestamp_epoch, txn_id", LEDGER_COLUMNS)
+
+    def load_payment(self, payment_id: str) -> dict | None:
+        rows = self._query("load_payment", self.LEDGER_SELECT + " WHERE txn_id = ?", LEDGER_COLUMNS, payment_id)
+        return rows[0] if rows else None
+
+    def load_ledger_slice(self, account_id: str, currency: str) -> list[dict]:
+        return self._query(
+            "load_ledger_slice",
+            self.LEDGER_SELECT + " WHERE account_id = ? AND currency = ? ORDER BY timestamp_epoch, txn_id",
+            LEDGER_COLUMNS, account_id, currency,
+        )
+
+    def load_payments(self, payment_ids: list[str] = None, status: str = None) -> list[dict]:
+        conditions, params = [], []
+        if payment_ids:
+            conditions.append("txn_id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(payment_ids)))
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if not conditions:
+            return []
+        return self._query("load_payments", self.LEDGER_SELECT + " WHERE " + " AND ".join(conditions),
+                           LEDGER_COLUMNS, *params)
+
+    def count_outgoing(self, status: str, exclude_ids: list[str] = None) -> int:
+        rows = self._query(
+            "count_outgoing",
+            "SELECT COUNT(*) FROM ledger_today WHERE status = ? AND direction = 'OUT' "
+            "AND txn_id NOT IN (SELECT value FROM json_each(?))",
+            ["count"], status, json.dumps(list(exclude_ids or ())),
+        )
+        return rows[0]['count']
+
+    def load_ledger_slices(self, keys: list[tuple]) -> list[dict]:
+        if not keys:
+            return []
+        return self._query("load_ledger_slices",
+                           self.LEDGER_SELECT + " WHERE " + self.KEYS_IN + " ORDER BY timestamp_epoch, txn_id",
+                           LEDGER_COLUMNS, json.dumps([list(key) for key in keys]))
+
+    def load_balances(self) -> list[dict]:
+        return self._query("load_balances", self.BALANCE_SELECT, BALANCE_COLUMNS)
+
+    def load_buffers(self) -> list[dict]:
+        return self._query("load_buffers", self.BUFFER_SELECT, BUFFER_COLUMNS)
+
+    def load_balance(self, account_id: str, currency: str) -> list[dict]:
+        return self._query("load_balance", self.BALANCE_SELECT + " WHERE account_id = ? AND currency = ?",
+                           BALANCE_COLUMNS, account_id, currency)
+
+    def load_entity_balances(self, entity: str, currency: str) -> list[dict]:
+        return self._query("load_entity_balances", self.BALANCE_SELECT + " WHERE entity = ? AND currency = ?",
+                           BALANCE_COLUMNS, entity, currency)
+
+    def load_buffer(self, entity: str, currency: str) -> list[dict]:
+        return self._query("load_buffer", self.BUFFER_SELECT + " WHERE entity = ? AND currency = ?",
+                           BUFFER_COLUMNS, entity, currency)
+
+    def load_balances_for(self, keys: list[tuple]) -> list[dict]:
+        if not keys:
+            return []
+        return self._query("load_balances_for", self.BALANCE_SELECT + " WHERE " + self.KEYS_IN,
+                           BALANCE_COLUMNS, json.dumps([list(key) for key in keys]))
+
+    def row_counts(self) -> dict:
+        counts = self._query(
+            "row_counts",
+            "SELECT (SELECT COUNT(*) FROM ledger_today), (SELECT COUNT(*) FROM starting_balances), "
+            "(SELECT COUNT(*) FROM buffers)",
+            ["ledger_today", "starting_balances", "buffers"],
+        )
+        return counts[0]
+
+
+def open_data_source(name: str, path):
+    """The local backend ``name`` over the files under ``path`` (see DATA_SOURCES)."""
+    if name == 'csv':
+        return CsvSource(path)
+    if name in ('parquet', 'arrow'):
+        return ArrowSource(path, name)
+    if name == 'sqlite':
+        return SqliteSource(path)
+    raise ValueError(f"Unknown data source: {name}. Use one of: {', '.join(DATA_SOURCES)}")
+
+
+# ---------------------------------------------------------------------------
+# Conversion from the curated CSVs
+# ---------------------------------------------------------------------------
+
+def arrow_schemas() -> dict:
+    """pyarrow schemas of the three tables, in loader column order (epoch and cents included)."""
+    string, real, integer = pa.string(), pa.float64(), pa.int64()
+    types = {'timestamp_epoch': integer, 'amount': real, 'amount_cents': integer, 'change_seq': integer,
+             'start_of_day_balance': real, 'balance_cents': integer, 'min_buffer': real, 'min_buffer_cents': integer}
+    return {
+        table: pa.schema([(col, types.get(col, string)) for col in columns])
+        for table, columns in (('ledger_today', LEDGER_COLUMNS), ('starting_balances', BALANCE_COLUMNS),
+                               ('buffers', BUFFER_COLUMNS))
+    }
+
+
+def write_arrow(path: Path, fmt: str, tables: dict):
+    """Write each table as <name>.parquet or an uncompressed <name>.arrow IPC file."""
+    _require_pyarrow()
+    schemas = arrow_schemas()
+    for table, rows in tables.items():
+        data = pa.Table.from_pylist(rows, schema=schemas[table])
+        file = path / f"{table}.{fmt}"
+        if fmt == 'parquet':
+            pq.write_table(data, file)
+        else:
+            with pa.OSFile(str(file), 'wb') as sink, pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+        print(f"  {file} ({len(rows):,} rows)")
+
+
+def write_sqlite(path: Path, tables: dict):
+    """Write treasury.sqlite with the tables and indexes of data/schema.sql (epoch and cents precomputed)."""
+    file = path / SQLITE_FILE
+    file.unlink(missing_ok=True)
+    conn = sqlite3.connect(file)
+    try:
+        conn.executescript("""
+            CREATE TABLE ledger_today (
+                txn_id TEXT PRIMARY KEY,
+                timestamp_utc TEXT NOT NULL,
+                timestamp_epoch INTEGER NOT NULL,
+                entity TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                beneficiary_name TEXT,
+                payment_type TEXT,
+                amount REAL NOT NULL,
+                amount_cents INTEGER NOT NULL,
+                direction TEXT NOT NULL CHECK (direction IN ('IN', 'OUT')),
+                currency TEXT NOT NULL,
+                status TEXT NOT NULL,
+                alert_flag TEXT,
+                channel TEXT,
+                change_seq INTEGER NOT NULL
+            );
+            CREATE INDEX idx_ledger_account_currency ON ledger_today(account_id, currency);
+            CREATE INDEX idx_ledger_status ON ledger_today(status);
+
+            CREATE TABLE starting_balances (
+                id INTEGER PRIMARY KEY,
+                entity TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                start_of_day_balance REAL NOT NULL,
+                balance_cents INTEGER NOT NULL,
+                UNIQUE (entity, account_id, currency)
+            );
+            CREATE INDEX idx_balances_account_currency ON starting_balances(account_id, currency);
+            CREATE INDEX idx_balances_entity ON starting_balances(entity);
+
+            CREATE TABLE buffers (
+                id INTEGER PRIMARY KEY,
+                entity TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                min_buffer REAL NOT NULL,
+                min_buffer_cents INTEGER NOT NULL,
+                cutoff_time_utc TEXT,
+                description TEXT,
+                UNIQUE (entity, currency)
+            );
+        """)
+        for table, columns in (('ledger_today', LEDGER_COLUMNS), ('starting_balances', BALANCE_COLUMNS),
+                               ('buffers', BUFFER_COLUMNS)):
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                ([row[col] for col in columns] for row in tables[table]),
+            )
+            print(f"  {file}:{table} ({len(tables[table]):,} rows)")
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the curated CSVs for the parquet, arrow or sqlite data source')
+    parser.add_argument('--format', required=True, choices=['parquet', 'arrow', 'sqlite'])
+    parser.add_argument('--path', type=Path, default=DEFAULT_DATA_PATH,
+                        help='Directory holding the curated CSVs; output is written next to them')
+    args = parser.parse_args()
+
+    ledger, balances, buffers = CsvSource(args.path).read_tables()
+    ledger.sort(key=lambda txn: (txn['timestamp_epoch'], txn['txn_id']))
+    tables = {'ledger_today': ledger, 'starting_balances': balances, 'buffers': buffers}
+    print(f"Writing {args.format} tables to {args.path}:")
+    try:
+        if args.format == 'sqlite':
+            write_sqlite(args.path, tables)
+        else:
+            write_arrow(args.path, args.format, tables)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
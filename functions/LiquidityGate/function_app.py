@@ -11,16 +11,38 @@ Given an emergency payment, computes:
 4. Context: net outflows, top beneficiaries, anomaly flags
 """
 
+import asyncio
 import azure.functions as func
 import json
 import logging
 import os
-import uuid
+import threading
+import time
 import traceback
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from collections import defaultdict
 from decimal import Decimal
 
+from data_sources import DEFAULT_DATA_PATH, DataSource, open_data_source
+from liquidity_engine import (
+    AGGREGATIONS,
+    DETAILS,
+    LedgerIndex,
+    compute_liquidity_impact,
+    compute_liquidity_impact_batch,
+    ndjson_lines,
+    parse_trajectory_option,
+    target_from_hypothetical,
+    target_from_ledger,
+)
+from intraday_position import position_impact, position_params
+from release_scheduler import RELEASABLE_STATUSES, parse_schedule_options, schedule_releases
+from stress_scenario import parse_limit, parse_shocks, run_stress_scenario
+from timings import metrics, propagate, stage, timed, with_timings
+
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
 # Database Configuration
@@ -31,6 +53,61 @@ DB_CONFIG = {
     'password': os.environ.get('db_password'),
 }
 
+# Where the treasury tables are read from: "postgres" (DB_CONFIG) or a local
+# backend over LIQUIDITY_DATA_PATH for load tests without a database: "csv",
+# "parquet" / "arrow" (needs pyarrow) or "sqlite" (see data_sources.py)
+LIQUIDITY_DATA_SOURCE = os.environ.get('LIQUIDITY_DATA_SOURCE', 'postgres').lower()
+LIQUIDITY_DATA_PATH = os.environ.get('LIQUIDITY_DATA_PATH', str(DEFAULT_DATA_PATH))
+
+# Snapshot cache configuration (seconds). A TTL of 0 disables caching.
+SNAPSHOT_TTL_SECONDS = float(os.environ.get('SNAPSHOT_TTL_SECONDS', '300'))
+SNAPSHOT_CHECK_SECONDS = float(os.environ.get('SNAPSHOT_CHECK_SECONDS', '5'))
+
+# Apply ledger inserts/updates past the change_seq high-water mark to the cached
+# snapshot instead of reloading it; larger deltas fall back to a full reload
+SNAPSHOT_INCREMENTAL = os.environ.get('SNAPSHOT_INCREMENTAL', 'true').lower() == 'true'
+SNAPSHOT_DELTA_MAX_ROWS = int(os.environ.get('SNAPSHOT_DELTA_MAX_ROWS', '10000'))
+# change_seq is drawn when a row is written but visible only at commit, so a
+# transaction can commit below the mark; each delta re-reads this many values
+# under it and skips the rows the snapshot already holds
+SNAPSHOT_DELTA_LOOKBACK = int(os.environ.get('SNAPSHOT_DELTA_LOOKBACK', '1000'))
+
+# compute_liquidity_impact results memoized per snapshot version (LRU, bounded
+# by entries and serialized size). A TTL of 0 disables the result cache.
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get('RESULT_CACHE_TTL_SECONDS', '60'))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '256'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Connection pool configuration
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', '30'))
+
+# How simulation inputs are loaded: "snapshot" (cached full tables),
+# "targeted" (per-request account/currency slice queries, for large ledgers) or
+# "position" (single-payment account checks answered from treasury.intraday_position;
+# other requests load as in snapshot mode)
+LIQUIDITY_LOAD_MODE = os.environ.get('LIQUIDITY_LOAD_MODE', 'snapshot').lower()
+
+# Batch simulation fan-out: worker count (1 = inline) and "thread" or "process" pool
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+BATCH_EXECUTOR = os.environ.get('BATCH_EXECUTOR', 'thread').lower()
+BATCH_MAX_PAYMENTS = int(os.environ.get('BATCH_MAX_PAYMENTS', '5000'))
+
+# Stress scenarios replay every account: worker count (0 = one per core) and pool type.
+# "process" forks a pool per request, so threads are the default.
+STRESS_MAX_WORKERS = int(os.environ.get('STRESS_MAX_WORKERS', '0')) or None
+STRESS_EXECUTOR = os.environ.get('STRESS_EXECUTOR', 'thread').lower()
+
+# Simulation engine: "index" (prefix-sum index per slice), "numpy" (columnar) or "replay"
+LIQUIDITY_ENGINE = os.environ.get('LIQUIDITY_ENGINE', 'index').lower()
+
+
+def to_json(body) -> str:
+    """Compact JSON for simulation responses (no indentation or padding)."""
+    with stage("serialize"):
+        return json.dumps(body, separators=(',', ':'))
+
 
 def get_db_connection():
     """Create a database connection using pg8000."""
@@ -45,6 +122,119 @@ def get_db_connection():
     )
 
 
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pg8000 connections.
+
+    Lives for the lifetime of the worker so warm invocations skip the TLS
+    handshake. Idle connections are reused most-recently-used first, closed
+    once idle for longer than ``max_idle_seconds``, and validated with
+    ``SELECT 1`` on checkout; a connection that fails validation is replaced.
+    """
+
+    def __init__(self, factory, max_size: int, max_idle_seconds: float, checkout_timeout: float):
+        self._factory = factory
+        self.max_size = max(1, max_size)
+        self.max_idle_seconds = max_idle_seconds
+        self.checkout_timeout = checkout_timeout
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recent last
+        self._size = 0  # open connections, idle or checked out
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+
+    @contextmanager
+    def connection(self):
+        """Check out a validated connection, returning it to the pool afterwards."""
+        with stage("db.checkout"):
+            conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            # The connection may be mid-transaction or broken; don't hand it out again.
+            self._discard(conn)
+            raise
+        self._checkin(conn)
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No database connection available within {self.checkout_timeout}s")
+                    self.waits += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    if time.monotonic() - last_used > self.max_idle_seconds:
+                        self._close(conn)
+                        continue
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    with stage("db.connect"):
+                        conn = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                self.created += 1
+                return conn
+
+            try:
+                conn.run("SELECT 1")
+            except Exception:
+                logging.info("Discarding stale pooled database connection")
+                with self._cond:
+                    self._close(conn)
+                continue
+            self.reused += 1
+            return conn
+
+    def _checkin(self, conn):
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._close(conn)
+
+    def _close(self, conn):
+        """Close a connection and release its slot. Caller holds the lock."""
+        self._size -= 1
+        self.discarded += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Pool size and lifetime counters."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "waits": self.waits,
+            }
+
+
+_db_pool = ConnectionPool(get_db_connection, DB_POOL_MAX_SIZE, DB_POOL_MAX_IDLE_SECONDS, DB_POOL_CHECKOUT_TIMEOUT)
+
+
 def convert_value(val):
     """Convert database values for JSON serialization."""
     if isinstance(val, Decimal):
@@ -54,328 +244,882 @@ def convert_value(val):
     return val
 
 
-def load_ledger() -> list[dict]:
-    """Load ledger transactions from PostgreSQL."""
-    conn = get_db_connection()
-    rows = conn.run("""
-        SELECT
-            txn_id,
-            TO_CHAR(timestamp_utc, 'YYYY-MM-DD HH24:MI:SS') as timestamp_utc,
-            entity,
-            account_id,
-            beneficiary_name,
-            payment_type,
-            amount,
-            direction,
-            currency,
-            status,
-            alert_flag,
-            channel
-        FROM treasury.ledger_today
-        ORDER BY timestamp_utc
-    """)
-    columns = ['txn_id', 'timestamp_utc', 'entity', 'account_id', 'beneficiary_name',
-               'payment_type', 'amount', 'direction', 'currency', 'status', 'alert_flag', 'channel']
-    conn.close()
-    return [{col: convert_value(val) for col, val in zip(columns, row)} for row in rows]
-
-
-def load_balances() -> list[dict]:
-    """Load starting balances from PostgreSQL."""
-    conn = get_db_connection()
-    rows = conn.run("""
-        SELECT
-            entity,
-            account_id,
-            currency,
-            start_of_day_balance
-        FROM treasury.starting_balances
-    """)
-    columns = ['entity', 'account_id', 'currency', 'start_of_day_balance']
-    conn.close()
-    return [{col: convert_value(val) for col, val in zip(columns, row)} for row in rows]
-
-
-def load_buffers() -> list[dict]:
-    """Load buffer thresholds from PostgreSQL."""
-    conn = get_db_connection()
-    rows = conn.run("""
-        SELECT
-            entity,
-            currency,
-            min_buffer,
-            TO_CHAR(cutoff_time_utc, 'HH24:MI') as cutoff_time_utc,
-            description
-        FROM treasury.buffers
-    """)
-    columns = ['entity', 'currency', 'min_buffer', 'cutoff_time_utc', 'description']
-    conn.close()
-    return [{col: convert_value(val) for col, val in zip(columns, row)} for row in rows]
-
-
-def parse_timestamp(ts: str) -> datetime:
-    """Parse timestamp string to datetime."""
-    formats = [
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%dT%H:%M",
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(ts, fmt)
-        except ValueError:
-            continue
-    raise ValueError(f"Unable to parse timestamp: {ts}")
+def convert_rows(columns: list[str], rows: list) -> list[dict]:
+    """Result rows as dicts of converted values (timed as the "convert" stage)."""
+    with stage("convert"):
+        return [{col: convert_value(val) for col, val in zip(columns, row)} for row in rows]
+
+
+LEDGER_COLUMNS = ['txn_id', 'timestamp_utc', 'timestamp_epoch', 'entity', 'account_id', 'beneficiary_name',
+                  'payment_type', 'amount', 'amount_cents', 'direction', 'currency', 'status', 'alert_flag',
+                  'channel', 'change_seq']
+
+LEDGER_SELECT = """
+    SELECT
+        txn_id,
+        TO_CHAR(timestamp_utc, 'YYYY-MM-DD HH24:MI:SS') as timestamp_utc,
+        EXTRACT(EPOCH FROM timestamp_utc)::bigint as timestamp_epoch,
+        entity,
+        account_id,
+        beneficiary_name,
+        payment_type,
+        amount,
+        (amount * 100)::bigint as amount_cents,
+        direction,
+        currency,
+        status,
+        alert_flag,
+        channel,
+        change_seq
+    FROM treasury.ledger_today
+"""
+
+
+BALANCE_COLUMNS = ['entity', 'account_id', 'currency', 'start_of_day_balance', 'balance_cents']
+
+# Money columns are also loaded as bigint cents, as amount_cents is, so the
+# engines never see a float balance or buffer
+BALANCE_SELECT = """
+    SELECT
+        entity,
+        account_id,
+        currency,
+        start_of_day_balance,
+        (start_of_day_balance * 100)::bigint as balance_cents
+    FROM treasury.starting_balances
+"""
+
+BUFFER_COLUMNS = ['entity', 'currency', 'min_buffer', 'min_buffer_cents', 'cutoff_time_utc', 'description']
+
+BUFFER_SELECT = """
+    SELECT
+        entity,
+        currency,
+        min_buffer,
+        (min_buffer * 100)::bigint as min_buffer_cents,
+        TO_CHAR(cutoff_time_utc, 'HH24:MI') as cutoff_time_utc,
+        description
+    FROM treasury.buffers
+"""
+
+POSITION_COLUMNS = ['start_of_day_balance_cents', 'min_buffer_cents', 'cutoff_time_utc', 'balance_at_cents',
+                    'running_min_cents', 'later_min_cents', 'transaction_count', 'end_of_day_balance_cents',
+                    'breach_time_before', 'breach_balance_before_cents', 'breach_time_after',
+                    'breach_balance_after_cents', 'min_time_before', 'min_time_after', 'release_time']
+
+# Boundary rows of one account/currency position around a release at :ts, each an
+# index probe on idx_position_account_time / the primary key (see intraday_position.py).
+# Money comes back as bigint cents; :delta and :release_offset are passed as exact numerics.
+POSITION_QUERY = """
+    WITH pos AS (
+        SELECT seq, timestamp_utc, balance, running_min, suffix_min
+        FROM treasury.intraday_position
+        WHERE account_id = :account_id AND currency = :currency
+    )
+    SELECT
+        (sb.start_of_day_balance * 100)::bigint,
+        (buf.min_buffer * 100)::bigint,
+        TO_CHAR(buf.cutoff_time_utc, 'HH24:MI'),
+        (le.balance * 100)::bigint,
+        (le.running_min * 100)::bigint,
+        (gt.suffix_min * 100)::bigint,
+        eod.seq,
+        (eod.balance * 100)::bigint,
+        TO_CHAR(breach_before.timestamp_utc, 'YYYY-MM-DD HH24:MI:SS'),
+        (breach_before.balance * 100)::bigint,
+        TO_CHAR(breach_after.timestamp_utc, 'YYYY-MM-DD HH24:MI:SS'),
+        (breach_after.balance * 100)::bigint,
+        TO_CHAR(min_before.timestamp_utc, 'YYYY-MM-DD HH24:MI:SS'),
+        TO_CHAR(min_after.timestamp_utc, 'YYYY-MM-DD HH24:MI:SS'),
+        TO_CHAR(release.timestamp_utc, 'YYYY-MM-DD HH24:MI:SS')
+    FROM (SELECT 1) AS one
+    LEFT JOIN LATERAL (
+        SELECT start_of_day_balance FROM treasury.starting_balances
+        WHERE account_id = :account_id AND currency = :currency ORDER BY id LIMIT 1
+    ) sb ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT min_buffer, cutoff_time_utc FROM treasury.buffers
+        WHERE entity = :entity AND currency = :currency
+    ) buf ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT seq, balance, running_min FROM pos
+        WHERE timestamp_utc <= CAST(:ts AS timestamp) ORDER BY seq DESC LIMIT 1
+    ) le ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT seq, suffix_min FROM pos
+        WHERE timestamp_utc > CAST(:ts AS timestamp) ORDER BY seq LIMIT 1
+    ) gt ON TRUE
+    LEFT JOIN LATERAL (SELECT seq, balance FROM pos ORDER BY seq DESC LIMIT 1) eod ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT timestamp_utc, balance FROM pos
+        WHERE seq <= le.seq AND balance < COALESCE(buf.min_buffer, 0) ORDER BY seq LIMIT 1
+    ) breach_before ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT timestamp_utc, balance FROM pos
+        WHERE seq >= gt.seq AND balance + :delta < COALESCE(buf.min_buffer, 0) ORDER BY seq LIMIT 1
+    ) breach_after ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT timestamp_utc FROM pos
+        WHERE seq <= le.seq AND balance = le.running_min ORDER BY seq LIMIT 1
+    ) min_before ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT timestamp_utc FROM pos
+        WHERE seq >= gt.seq AND balance = gt.suffix_min ORDER BY seq LIMIT 1
+    ) min_after ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT timestamp_utc FROM pos
+        WHERE seq >= gt.seq AND suffix_min >= COALESCE(buf.min_buffer, 0) + :release_offset ORDER BY seq LIMIT 1
+    ) release ON TRUE
+"""
+
+
+class PostgresSource(DataSource):
+    """The treasury tables in Azure PostgreSQL (DB_CONFIG), each loader a query on a pooled connection."""
+
+    name = "postgres"
+    label = "PostgreSQL (pg8000)"
+    supports_changes = True
+    supports_position = True
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def load_ledger(self) -> list[dict]:
+        """Load ledger transactions from PostgreSQL."""
+        with self.pool.connection() as conn, stage("sql.load_ledger"):
+            rows = conn.run(LEDGER_SELECT + " ORDER BY timestamp_utc, txn_id")
+        return convert_rows(LEDGER_COLUMNS, rows)
+
+    def load_payment(self, payment_id: str) -> dict | None:
+        """Load a single ledger transaction by txn_id (primary key lookup)."""
+        with self.pool.connection() as conn, stage("sql.load_payment"):
+            rows = conn.run(LEDGER_SELECT + " WHERE txn_id = :txn_id", txn_id=payment_id)
+        if not rows:
+            return None
+        return convert_rows(LEDGER_COLUMNS, rows[:1])[0]
+
+    def load_ledger_slice(self, account_id: str, currency: str) -> list[dict]:
+        """Load one account/currency slice of the ledger (uses idx_ledger_account_currency)."""
+        with self.pool.connection() as conn, stage("sql.load_ledger_slice"):
+            rows = conn.run(
+                LEDGER_SELECT + " WHERE account_id = :account_id AND currency = :currency"
+                " ORDER BY timestamp_utc, txn_id",
+                account_id=account_id,
+                currency=currency,
+            )
+        return convert_rows(LEDGER_COLUMNS, rows)
+
+    def load_payments(self, payment_ids: list[str] = None, status: str = None) -> list[dict]:
+        """Load ledger transactions by txn_id list and/or status."""
+        conditions, params = [], {}
+        if payment_ids:
+            conditions.append("txn_id = ANY(CAST(:payment_ids AS text[]))")
+            params['payment_ids'] = list(payment_ids)
+        if status:
+            conditions.append("status = :status")
+            params['status'] = status
+        if not conditions:
+            return []
+        with self.pool.connection() as conn, stage("sql.load_payments"):
+            rows = conn.run(LEDGER_SELECT + " WHERE " + " AND ".join(conditions), **params)
+        return convert_rows(LEDGER_COLUMNS, rows)
+
+    def count_outgoing(self, status: str, exclude_ids: list[str] = None) -> int:
+        """Count OUT transactions with a status, leaving out a txn_id list (uses idx_ledger_status)."""
+        with self.pool.connection() as conn, stage("sql.count_outgoing"):
+            rows = conn.run(
+                """
+                SELECT COUNT(*) FROM treasury.ledger_today
+                WHERE status = :status AND direction = 'OUT'
+                  AND NOT (txn_id = ANY(CAST(:exclude_ids AS text[])))""",
+                status=status,
+                exclude_ids=list(exclude_ids or []),
+            )
+        return rows[0][0]
+
+    def load_ledger_slices(self, keys: list[tuple]) -> list[dict]:
+        """Load several account/currency slices of the ledger in one round trip."""
+        if not keys:
+            return []
+        with self.pool.connection() as conn, stage("sql.load_ledger_slices"):
+            rows = conn.run(
+                LEDGER_SELECT + """
+                WHERE (account_id, currency) IN (
+                    SELECT * FROM unnest(CAST(:account_ids AS text[]), CAST(:currencies AS text[]))
+                )
+                ORDER BY timestamp_utc, txn_id""",
+                account_ids=[account_id for account_id, _ in keys],
+                currencies=[currency for _, currency in keys],
+            )
+        return convert_rows(LEDGER_COLUMNS, rows)
+
+    def load_balances(self) -> list[dict]:
+        """Load starting balances from PostgreSQL."""
+        with self.pool.connection() as conn, stage("sql.load_balances"):
+            rows = conn.run(BALANCE_SELECT)
+        return convert_rows(BALANCE_COLUMNS, rows)
+
+    def load_buffers(self) -> list[dict]:
+        """Load buffer thresholds from PostgreSQL."""
+        with self.pool.connection() as conn, stage("sql.load_buffers"):
+            rows = conn.run(BUFFER_SELECT)
+        return convert_rows(BUFFER_COLUMNS, rows)
+
+    def load_balance(self, account_id: str, currency: str) -> list[dict]:
+        """Load the starting balance row(s) for one account/currency."""
+        with self.pool.connection() as conn, stage("sql.load_balance"):
+            rows = conn.run(
+                BALANCE_SELECT + " WHERE account_id = :account_id AND currency = :currency",
+                account_id=account_id,
+                currency=currency,
+            )
+        return convert_rows(BALANCE_COLUMNS, rows)
+
+    def load_entity_balances(self, entity: str, currency: str) -> list[dict]:
+        """Load the starting balances of every account of one entity/currency."""
+        with self.pool.connection() as conn, stage("sql.load_entity_balances"):
+            rows = conn.run(
+                BALANCE_SELECT + " WHERE entity = :entity AND currency = :currency",
+                entity=entity,
+                currency=currency,
+            )
+        return convert_rows(BALANCE_COLUMNS, rows)
+
+    def load_buffer(self, entity: str, currency: str) -> list[dict]:
+        """Load the buffer rule for one entity/currency."""
+        with self.pool.connection() as conn, stage("sql.load_buffer"):
+            rows = conn.run(
+                BUFFER_SELECT + " WHERE entity = :entity AND currency = :currency",
+                entity=entity,
+                currency=currency,
+            )
+        return convert_rows(BUFFER_COLUMNS, rows)
+
+    def load_balances_for(self, keys: list[tuple]) -> list[dict]:
+        """Load starting balances for several account/currency pairs."""
+        if not keys:
+            return []
+        with self.pool.connection() as conn, stage("sql.load_balances_for"):
+            rows = conn.run(
+                BALANCE_SELECT + """
+                WHERE (account_id, currency) IN (
+                    SELECT * FROM unnest(CAST(:account_ids AS text[]), CAST(:currencies AS text[]))
+                )""",
+                account_ids=[account_id for account_id, _ in keys],
+                currencies=[currency for _, currency in keys],
+            )
+        return convert_rows(BALANCE_COLUMNS, rows)
+
+    def load_ledger_changes(self, since_seq: int) -> list[dict]:
+        """Load ledger rows inserted or updated after the ``since_seq`` high-water mark (uses idx_ledger_change_seq)."""
+        with self.pool.connection() as conn, stage("sql.load_ledger_changes"):
+            rows = conn.run(LEDGER_SELECT + " WHERE change_seq > :since_seq ORDER BY change_seq", since_seq=since_seq)
+        return convert_rows(LEDGER_COLUMNS, rows)
+
+    def load_position(self, target_payment: dict, entity: str, currency: str) -> dict:
+        """Position boundary rows, buffer and starting balance for one release (one round trip)."""
+        params = position_params(target_payment, currency)
+        with self.pool.connection() as conn, stage("sql.load_position"):
+            rows = conn.run(
+                POSITION_QUERY,
+                account_id=target_payment['account_id'],
+                currency=currency,
+                entity=entity,
+                ts=target_payment['timestamp_utc'],
+                delta=Decimal(params['delta']).scaleb(-2),
+                release_offset=Decimal(params['release_offset']).scaleb(-2),
+            )
+        return convert_rows(POSITION_COLUMNS, rows[:1])[0]
+
+    def load_fingerprint(self) -> tuple:
+        """Cheap change-detection query: row counts plus the ledger change_seq high-water mark."""
+        with self.pool.connection() as conn, stage("sql.load_fingerprint"):
+            rows = conn.run("""
+                SELECT
+                    (SELECT COUNT(*) FROM treasury.ledger_today),
+                    (SELECT MAX(change_seq) FROM treasury.ledger_today),
+                    (SELECT COUNT(*) FROM treasury.starting_balances),
+                    (SELECT COUNT(*) FROM treasury.buffers)
+            """)
+        return tuple(rows[0])
+
+    def row_counts(self) -> dict:
+        """Row count per treasury table, for the health check."""
+        with self.pool.connection() as conn, stage("sql.row_counts"):
+            rows = conn.run("""
+                SELECT
+                    (SELECT COUNT(*) FROM treasury.ledger_today),
+                    (SELECT COUNT(*) FROM treasury.starting_balances),
+                    (SELECT COUNT(*) FROM treasury.buffers)
+            """)
+        return dict(zip(["ledger_today", "starting_balances", "buffers"], rows[0]))
+
+
+# Every loader call goes through this one object, PostgreSQL or a local backend
+if LIQUIDITY_DATA_SOURCE == 'postgres':
+    _source = PostgresSource(_db_pool)
+else:
+    _source = open_data_source(LIQUIDITY_DATA_SOURCE, LIQUIDITY_DATA_PATH)
+if LIQUIDITY_LOAD_MODE == 'position' and not _source.supports_position:
+    raise ValueError(f"LIQUIDITY_LOAD_MODE=position reads treasury.intraday_position, which the "
+                     f"{_source.name} data source does not have; use snapshot or targeted")
+
+# Merged into the audit block of every result: where its inputs were read from and how
+AUDIT_CONTEXT = {"data_source": _source.label, "load_mode": LIQUIDITY_LOAD_MODE}
+
+
+class LedgerRows(Sequence):
+    """
+    Ledger rows of a snapshot refreshed with a delta, merged on first use.
+
+    Single-payment simulations answer from the snapshot index and only need
+    the row count, so the O(N) copy of the base rows with the changed ones
+    replaced is deferred until something iterates or indexes the rows (batch
+    status scans, schedules, stress runs). Deltas on a snapshot whose rows
+    were never merged accumulate on the same base list.
+    """
+
+    def __init__(self, base: Sequence, changed: dict, length: int):
+        self._base = base
+        self._changed = changed  # txn_id -> row, in the order the rows were last changed
+        self._length = length
+        self._rows = None
+
+    @classmethod
+    def derive(cls, ledger: Sequence, changed: list[dict], by_id) -> "LedgerRows":
+        """``ledger`` with ``changed`` rows inserted or replaced; ``by_id`` is its payment lookup."""
+        if isinstance(ledger, LedgerRows) and ledger._rows is None:
+            base, pending = ledger._base, dict(ledger._changed)
+        else:
+            base, pending = ledger, {}
+        for txn in changed:
+            pending.pop(txn['txn_id'], None)
+            pending[txn['txn_id']] = txn
+        inserted = sum(1 for txn_id in {txn['txn_id'] for txn in changed} if txn_id not in by_id)
+        return cls(base, pending, len(ledger) + inserted)
+
+    def rows(self) -> list[dict]:
+        if self._rows is None:
+            # Concurrent first uses may both merge; either result is the same list of rows
+            changed = self._changed
+            self._rows = [txn for txn in self._base if txn['txn_id'] not in changed] + list(changed.values())
+        return self._rows
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, item):
+        return self.rows()[item]
+
+    def __iter__(self):
+        return iter(self.rows())
+
+
+class LedgerSnapshot:
+    """The three treasury datasets, loaded together and treated as read-only."""
+
+    def __init__(self, ledger: Sequence[dict], balances: list[dict], buffers: list[dict],
+                 fingerprint: tuple, version: int, index: LedgerIndex = None):
+        self.ledger = ledger
+        self.balances = balances
+        self.buffers = buffers
+        self.fingerprint = fingerprint
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.loaded_at_utc = datetime.utcnow().isoformat() + "Z"
+        self._index = index
+
+    @property
+    def index(self) -> LedgerIndex:
+        """Payment lookup and per-slice prefix-sum indexes, built on first use."""
+        if self._index is None:
+            self._index = LedgerIndex(self.ledger)
+        return self._index
+
+    def with_changes(self, changed: list[dict], fingerprint: tuple, version: int) -> "LedgerSnapshot":
+        """
+        A new snapshot with ``changed`` ledger rows inserted or replaced by txn_id.
+
+        This snapshot is left as is for requests still holding it. If its index
+        has been built, the new one is derived from it, rebuilding only the
+        slices the changes touch, and the full row list is merged only when
+        something iterates it (see LedgerRows); balances and buffers are shared.
+        """
+        if self._index is None:
+            changed_ids = {txn['txn_id'] for txn in changed}
+            ledger = [txn for txn in self.ledger if txn['txn_id'] not in changed_ids] + changed
+            index = None
+        else:
+            ledger = LedgerRows.derive(self.ledger, changed, self._index.by_id)
+            index = self._index.apply_changes(ledger, changed)
+        snapshot = LedgerSnapshot(ledger, self.balances, self.buffers, fingerprint, version, index)
+        snapshot.loaded_at = self.loaded_at
+        return snapshot
+
+
+class SnapshotCache:
+    """
+    Worker-level cache of ledger, balances and buffers.
+
+    A snapshot is served from memory until it is older than ``ttl_seconds``.
+    Within the TTL, a fingerprint query (row counts and the ledger change_seq
+    high-water mark) runs at most every ``check_seconds``. When only the
+    ledger has moved and ``incremental`` is set, rows past the high-water
+    mark are fetched and applied to the snapshot (see
+    LedgerSnapshot.with_changes); anything else (deleted rows, changed
+    balances or buffers, a delta over ``delta_max_rows``) forces a full
+    reload, as does the TTL. Reloads happen under the lock so a burst of
+    requests on a cold worker triggers a single load.
+
+    Sequence values are assigned before commit, so a slow transaction can
+    make rows visible below a mark already passed. Each delta therefore
+    re-reads ``lookback`` sequence values under the mark and applies only
+    rows whose change_seq the snapshot does not hold yet. Such a commit is
+    picked up on the next detected change (or by the TTL reload), as long
+    as it lands within ``lookback`` values of the mark.
+    """
+
+    def __init__(self, ttl_seconds: float, check_seconds: float,
+                 incremental: bool = True, delta_max_rows: int = 10000, lookback: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self.incremental = incremental
+        self.delta_max_rows = delta_max_rows
+        self.lookback = lookback
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_check = 0.0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.changes_detected = 0
+        self.deltas_applied = 0
+        self.delta_rows = 0
+        self.last_load_ms = None
+        self.last_delta_ms = None
+
+    def get(self) -> LedgerSnapshot:
+        """Return a current snapshot, reloading from PostgreSQL if needed."""
+        with stage("snapshot"), self._lock:
+            now = time.monotonic()
+            snapshot = self._snapshot
+            if snapshot is not None and now - snapshot.loaded_at < self.ttl_seconds:
+                if now - self._last_check < self.check_seconds:
+                    self.hits += 1
+                    return snapshot
+                self._last_check = now
+                fingerprint = _source.load_fingerprint()
+                if fingerprint == snapshot.fingerprint:
+                    self.hits += 1
+                    return snapshot
+                self.changes_detected += 1
+                refreshed = self._apply_delta(snapshot, fingerprint)
+                if refreshed is not None:
+                    self.hits += 1
+                    return refreshed
+                logging.info("Ledger change detected, reloading snapshot")
+            self.misses += 1
+            return self._reload()
+
+    def invalidate(self):
+        """Drop the current snapshot (and the results computed on it) so the next request reloads."""
+        with self._lock:
+            self._snapshot = None
+        _result_cache.invalidate()
+
+    def _apply_delta(self, snapshot: LedgerSnapshot, fingerprint: tuple) -> LedgerSnapshot | None:
+        """Apply ledger rows past the snapshot's high-water mark, or None if a full reload is needed."""
+        if (not self.incremental or not _source.supports_changes or fingerprint[2:] != snapshot.fingerprint[2:]
+                or snapshot.fingerprint[1] is None):
+            return None
+        started = time.monotonic()
+        mark = snapshot.fingerprint[1]
+        changed = _source.load_ledger_changes(mark - self.lookback)
+        if len(changed) > self.delta_max_rows:
+            return None
+        high_water_mark = max([mark] + [txn['change_seq'] for txn in changed])
+        # The look-back window returns rows already applied; keep the ones that are new or newer
+        by_id = snapshot.index.by_id
+        changed = [txn for txn in changed
+                   if txn['txn_id'] not in by_id or by_id[txn['txn_id']]['change_seq'] != txn['change_seq']]
+        fingerprint = (fingerprint[0], high_water_mark) + fingerprint[2:]
+        refreshed = snapshot.with_changes(changed, fingerprint, self._version + 1)
+        # Deleted rows (or a change racing the fingerprint) leave the counts apart
+        if len(refreshed.ledger) != fingerprint[0]:
+            return None
+        self._version += 1
+        self._snapshot = refreshed
+        self.deltas_applied += 1
+        self.delta_rows += len(changed)
+        self.last_delta_ms = round((time.monotonic() - started) * 1000, 1)
+        logging.info(f"Applied {len(changed)} ledger changes to snapshot v{self._version} "
+                     f"in {self.last_delta_ms} ms")
+        return refreshed
+
+    def _reload(self) -> LedgerSnapshot:
+        started = time.monotonic()
+        # Fingerprint first: a change landing mid-load is picked up on the next check.
+        fingerprint = _source.load_fingerprint()
+        # The three tables are independent; load them on separate pooled connections
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="snapshot-load") as pool:
+            ledger, balances, buffers = pool.map(
+                lambda load: load(),
+                [propagate(load) for load in (_source.load_ledger, _source.load_balances, _source.load_buffers)])
+        self._version += 1
+        self._snapshot = LedgerSnapshot(ledger, balances, buffers, fingerprint, self._version)
+        self._last_check = self._snapshot.loaded_at
+        self.last_load_ms = round((self._snapshot.loaded_at - started) * 1000, 1)
+        logging.info(f"Loaded snapshot v{self._version}: {len(ledger)} ledger rows, "
+                     f"{len(balances)} balance rows, {len(buffers)} buffer rules "
+                     f"in {self.last_load_ms} ms")
+        return self._snapshot
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the age of the current snapshot."""
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.ttl_seconds > 0,
+            "ttl_seconds": self.ttl_seconds,
+            "check_seconds": self.check_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "changes_detected": self.changes_detected,
+            "incremental": self.incremental,
+            "deltas_applied": self.deltas_applied,
+            "delta_rows": self.delta_rows,
+            "delta_lookback": self.lookback,
+            "last_delta_ms": self.last_delta_ms,
+            "high_water_mark": snapshot.fingerprint[1] if snapshot else None,
+            "version": snapshot.version if snapshot else None,
+            "loaded_at_utc": snapshot.loaded_at_utc if snapshot else None,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "last_load_ms": self.last_load_ms,
+            "ledger_rows": len(snapshot.ledger) if snapshot else None,
+        }
 
 
-def compute_liquidity_impact(
-    ledger: list[dict],
-    balances: list[dict],
-    buffers: list[dict],
+_snapshot_cache = SnapshotCache(SNAPSHOT_TTL_SECONDS, SNAPSHOT_CHECK_SECONDS,
+                                SNAPSHOT_INCREMENTAL, SNAPSHOT_DELTA_MAX_ROWS, SNAPSHOT_DELTA_LOOKBACK)
+
+
+class ResultCache:
+    """
+    Worker-level LRU of compute_liquidity_impact results.
+
+    Entries are keyed by the normalized request and the snapshot version they
+    were computed on, live for at most ``ttl_seconds`` and are bounded by
+    ``max_entries`` and ``max_bytes`` of serialized JSON (least recently used
+    evicted first). A lookup on a newer snapshot version drops every entry, so
+    results never outlive the ledger they were computed from. Only snapshot
+    loads carry a version; targeted loads bypass the cache, as do hypothetical
+    payments without a timestamp (see ``cacheable``).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (result, size, stored_at)
+        self._version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.largest_entry_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def key(version: int, **request) -> tuple:
+        """Cache key: the snapshot version plus the request with defaults and trajectory normalized."""
+        request = {name: value for name, value in request.items() if value is not None}
+        request['trajectory'] = parse_trajectory_option(request.get('trajectory'))
+        request['aggregation'] = request.get('aggregation') or 'account'
+        return version, LIQUIDITY_ENGINE, json.dumps(request, sort_keys=True, default=str)
+
+    @staticmethod
+    def cacheable(hypothetical_payment: dict = None, **request) -> bool:
+        """False for a hypothetical payment without timestamp_utc: the engine releases it at the current time."""
+        return not hypothetical_payment or bool(hypothetical_payment.get('timestamp_utc'))
+
+    def get(self, key: tuple) -> dict | None:
+        """Cached result for ``key`` (marked in its audit block), or None."""
+        with self._lock:
+            if self._version is None or key[0] > self._version:
+                self._drop_all(key[0])
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] >= self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        result = entry[0]
+        return {**result, "audit": {**result.get("audit", {}), "result_cache": "hit"}}
+
+    def put(self, key: tuple, result: dict):
+        """
+        Store a result computed on snapshot version ``key[0]``, evicting LRU entries to fit.
+
+        Sizing the entry serializes it, so call this from a worker thread;
+        it is not timed as the response's "serialize" stage.
+        """
+        size = len(json.dumps(result, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key[0] != self._version:
+                # Computed on a snapshot that has since been replaced
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, time.monotonic())
+            self.bytes += size
+            self.largest_entry_bytes = max(self.largest_entry_bytes, size)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached result."""
+        with self._lock:
+            self._drop_all(self._version)
+
+    def _drop_all(self, version):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.bytes = 0
+        self._version = version
+
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        """Hit rate, evictions and entry sizes."""
+        lookups = self.hits + self.misses
+        entries = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "entries": entries,
+            "bytes": self.bytes,
+            "mean_entry_bytes": round(self.bytes / entries) if entries else None,
+            "largest_entry_bytes": self.largest_entry_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "version": self._version,
+        }
+
+
+_result_cache = ResultCache(RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
+
+
+async def load_targeted_inputs(
     payment_id: str = None,
     hypothetical_payment: dict = None,
     entity_filter: str = None,
     currency_filter: str = None,
-) -> dict:
+    aggregation: str = 'account',
+) -> tuple[list[dict], list[dict], list[dict]]:
     """
-    Core liquidity computation.
-
-    Args:
-        ledger: Today's transactions
-        balances: Starting balances per account/currency
-        buffers: Buffer thresholds per entity/currency
-        payment_id: ID of payment to simulate releasing (from ledger)
-        hypothetical_payment: Hypothetical payment to simulate
-        entity_filter: Filter to specific entity
-        currency_filter: Filter to specific currency
-
-    Returns:
-        Structured result with breach verdict and evidence
+    Load only the rows one simulation needs.
+
+    Resolves the target payment first, then fetches its account/currency
+    ledger slice, starting balance and buffer rule concurrently, each query
+    on its own pooled connection in a worker thread (with
+    aggregation="entity", the slices and balances of every account of the
+    entity/currency). Returns empty inputs when the payment does not exist so
+    that compute_liquidity_impact reports it as not found.
     """
-    run_id = str(uuid.uuid4())[:8]
-    timestamp_utc = datetime.utcnow().isoformat() + "Z"
-
-    # Find the target payment
-    target_payment = None
     if payment_id:
-        for txn in ledger:
-            if txn.get('txn_id') == payment_id:
-                target_payment = {
-                    'payment_id': txn['txn_id'],
-                    'amount': float(txn['amount']),
-                    'currency': txn['currency'],
-                    'account_id': txn['account_id'],
-                    'entity': txn['entity'],
-                    'beneficiary_name': txn['beneficiary_name'],
-                    'timestamp_utc': txn['timestamp_utc'],
-                    'direction': txn.get('direction', 'OUT'),
-                    'status': txn.get('status', 'QUEUED'),
-                }
-                break
-        if not target_payment:
-            return {
-                "error": f"Payment {payment_id} not found in ledger",
-                "audit": {"run_id": run_id, "timestamp_utc": timestamp_utc}
-            }
+        target = await asyncio.to_thread(_source.load_payment, payment_id)
+        if target is None:
+            return [], [], []
     elif hypothetical_payment:
-        target_payment = {
-            'payment_id': hypothetical_payment.get('payment_id', 'HYPOTHETICAL'),
-            'amount': float(hypothetical_payment['amount']),
-            'currency': hypothetical_payment['currency'],
-            'account_id': hypothetical_payment['account_id'],
-            'entity': hypothetical_payment['entity'],
-            'beneficiary_name': hypothetical_payment.get('beneficiary_name', 'Unknown'),
-            'timestamp_utc': hypothetical_payment.get('timestamp_utc', datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')),
-            'direction': hypothetical_payment.get('direction', 'OUT'),
-            'status': 'HYPOTHETICAL',
-        }
+        target = hypothetical_payment
     else:
-        return {
-            "error": "Either payment_id or hypothetical_payment must be provided",
-            "audit": {"run_id": run_id, "timestamp_utc": timestamp_utc}
-        }
+        return [], [], []
 
-    # Determine filters from target payment
-    target_entity = entity_filter or target_payment['entity']
-    target_currency = currency_filter or target_payment['currency']
-    target_account = target_payment['account_id']
-
-    # Get starting balance for target account/currency
-    starting_balance = 0
-    for bal in balances:
-        if bal['account_id'] == target_account and bal['currency'] == target_currency:
-            starting_balance = float(bal['start_of_day_balance'])
-            break
-
-    # Get buffer threshold for entity/currency
-    buffer_threshold = 0
-    cutoff_time = None
-    for buf in buffers:
-        if buf['entity'] == target_entity and buf['currency'] == target_currency:
-            buffer_threshold = float(buf['min_buffer'])
-            cutoff_time = buf.get('cutoff_time_utc')
-            break
-
-    # Filter and sort ledger by timestamp
-    relevant_txns = []
-    for txn in ledger:
-        if txn['account_id'] == target_account and txn['currency'] == target_currency:
-            # Skip the target payment if it's QUEUED (we'll simulate its release)
-            if txn.get('txn_id') == payment_id and txn.get('status') == 'QUEUED':
-                continue
-            relevant_txns.append({
-                'txn_id': txn['txn_id'],
-                'timestamp': parse_timestamp(txn['timestamp_utc']),
-                'timestamp_str': txn['timestamp_utc'],
-                'amount': float(txn['amount']),
-                'direction': txn.get('direction', 'OUT'),
-                'beneficiary': txn.get('beneficiary_name', ''),
-                'status': txn.get('status', 'RELEASED'),
-                'alert_flag': txn.get('alert_flag', ''),
-            })
-
-    # Add target payment at its scheduled time
-    target_timestamp = parse_timestamp(target_payment['timestamp_utc'])
-    relevant_txns.append({
-        'txn_id': target_payment['payment_id'],
-        'timestamp': target_timestamp,
-        'timestamp_str': target_payment['timestamp_utc'],
-        'amount': target_payment['amount'],
-        'direction': target_payment['direction'],
-        'beneficiary': target_payment['beneficiary_name'],
-        'status': 'SIMULATED_RELEASE',
-        'alert_flag': '',
-        'is_target': True,
-    })
-
-    # Sort by timestamp
-    relevant_txns.sort(key=lambda x: x['timestamp'])
-
-    # Simulate balance trajectory
-    balance = starting_balance
-    min_balance = starting_balance
-    min_balance_time = None
-    first_breach_time = None
-    breach_gap = 0
-    balance_trajectory = []
-
-    # Track beneficiary totals for concentration analysis
-    beneficiary_totals = defaultdict(float)
-    anomalies = []
-    total_outflow = 0
-    total_inflow = 0
-
-    for txn in relevant_txns:
-        # Apply transaction
-        if txn['direction'] == 'OUT':
-            balance -= txn['amount']
-            total_outflow += txn['amount']
-            beneficiary_totals[txn['beneficiary']] += txn['amount']
-        else:  # IN
-            balance += txn['amount']
-            total_inflow += txn['amount']
-
-        # Track trajectory
-        balance_trajectory.append({
-            'timestamp': txn['timestamp_str'],
-            'txn_id': txn['txn_id'],
-            'amount': txn['amount'],
-            'direction': txn['direction'],
-            'balance_after': round(balance, 2),
-            'is_target_payment': txn.get('is_target', False),
-        })
-
-        # Track minimum balance
-        if balance < min_balance:
-            min_balance = balance
-            min_balance_time = txn['timestamp_str']
-
-        # Check for buffer breach
-        if balance < buffer_threshold and first_breach_time is None:
-            first_breach_time = txn['timestamp_str']
-            breach_gap = buffer_threshold - balance
-
-        # Collect anomalies
-        if txn.get('alert_flag'):
-            anomalies.append({
-                'txn_id': txn['txn_id'],
-                'flag': txn['alert_flag'],
-                'amount': txn['amount'],
-                'beneficiary': txn['beneficiary'],
-            })
-
-    # Calculate beneficiary concentration (top 5)
-    top_beneficiaries = sorted(
-        [{'beneficiary': k, 'total_amount': round(v, 2)} for k, v in beneficiary_totals.items()],
-        key=lambda x: x['total_amount'],
-        reverse=True
-    )[:5]
-
-    # Determine breach status
-    breach = min_balance < buffer_threshold
-
-    # Build result
-    result = {
-        "buffer_breach_risk": {
-            "breach": breach,
-            "first_breach_time": first_breach_time,
-            "gap": round(breach_gap, 2) if breach else 0,
-            "projected_balance_min": round(min_balance, 2),
-            "min_balance_time": min_balance_time,
-            "buffer_threshold": buffer_threshold,
-            "headroom": round(min_balance - buffer_threshold, 2),
-        },
-        "payment_context": {
-            "payment_id": target_payment['payment_id'],
-            "amount": target_payment['amount'],
-            "currency": target_currency,
-            "beneficiary": target_payment['beneficiary_name'],
-            "account_id": target_account,
-            "entity": target_entity,
-            "scheduled_time": target_payment['timestamp_utc'],
-        },
-        "account_summary": {
-            "start_of_day_balance": starting_balance,
-            "total_outflow": round(total_outflow, 2),
-            "total_inflow": round(total_inflow, 2),
-            "net_flow": round(total_inflow - total_outflow, 2),
-            "end_of_day_balance": round(balance, 2),
-            "transaction_count": len(relevant_txns),
-        },
-        "concentration_analysis": {
-            "top_beneficiaries": top_beneficiaries,
-            "largest_single_payment": max([t['amount'] for t in relevant_txns if t['direction'] == 'OUT'], default=0),
-        },
-        "anomalies": anomalies[:10],  # Limit to 10
-        "recommendation": {
-            "action": "HOLD" if breach else "RELEASE",
-            "reason": f"Payment would breach buffer by ${breach_gap:,.2f}" if breach else "Payment within buffer limits",
-            "alternatives": [
-                "Delay payment until inflows received",
-                "Request partial release",
-                "Escalate to treasury for funding",
-            ] if breach else [],
-        },
-        "audit": {
-            "run_id": run_id,
-            "timestamp_utc": timestamp_utc,
-            "data_snapshot": {
-                "ledger_rows": len(ledger),
-                "balance_rows": len(balances),
-                "buffer_rules": len(buffers),
-            },
-            "cutoff_time": cutoff_time,
-            "version": "2.0.0",
-            "data_source": "PostgreSQL (pg8000)",
-        },
-    }
+    account_id = target.get('account_id')
+    currency = currency_filter or target.get('currency')
+    entity = entity_filter or target.get('entity')
 
+    if aggregation == 'entity':
+        balances, own_balance, buffers = await asyncio.gather(
+            asyncio.to_thread(_source.load_entity_balances, entity, currency),
+            asyncio.to_thread(_source.load_balance, account_id, currency),
+            asyncio.to_thread(_source.load_buffer, entity, currency),
+        )
+        keys = sorted({(bal['account_id'], currency) for bal in balances} | {(account_id, currency)})
+        ledger = await asyncio.to_thread(_source.load_ledger_slices, keys)
+        if not any(bal['account_id'] == account_id for bal in balances):
+            balances += own_balance
+    else:
+        ledger, balances, buffers = await asyncio.gather(
+            asyncio.to_thread(_source.load_ledger_slice, account_id, currency),
+            asyncio.to_thread(_source.load_balance, account_id, currency),
+            asyncio.to_thread(_source.load_buffer, entity, currency),
+        )
+    if payment_id and not any(txn['txn_id'] == payment_id for txn in ledger):
+        # currency_filter can point the slice away from the payment's own currency
+        ledger.append(target)
+    return ledger, balances, buffers
+
+
+async def load_simulation_inputs(
+    payment_id: str = None,
+    hypothetical_payment: dict = None,
+    entity_filter: str = None,
+    currency_filter: str = None,
+    aggregation: str = 'account',
+) -> LedgerSnapshot:
+    """Return the inputs for one simulation per LIQUIDITY_LOAD_MODE, without blocking the event loop."""
+    if LIQUIDITY_LOAD_MODE == 'targeted':
+        ledger, balances, buffers = await load_targeted_inputs(
+            payment_id, hypothetical_payment, entity_filter, currency_filter, aggregation)
+        return LedgerSnapshot(ledger, balances, buffers, fingerprint=None, version=None)
+    return await asyncio.to_thread(_snapshot_cache.get)
+
+
+async def position_check(
+    payment_id: str = None,
+    hypothetical_payment: dict = None,
+    entity_filter: str = None,
+    currency_filter: str = None,
+) -> dict:
+    """Account-level breach check from treasury.intraday_position, without loading the ledger."""
+    if payment_id:
+        txn = await asyncio.to_thread(_source.load_payment, payment_id)
+        if txn is None:
+            return {"error": f"Payment {payment_id} not found in ledger"}
+        target = target_from_ledger(txn)
+    else:
+        target = target_from_hypothetical(hypothetical_payment)
+    entity = entity_filter or target['entity']
+    currency = currency_filter or target['currency']
+    position = await asyncio.to_thread(_source.load_position, target, entity, currency)
+    return position_impact(target, position, entity, currency, audit_context={"load_mode": LIQUIDITY_LOAD_MODE})
+
+
+def simulate(inputs: LedgerSnapshot, **kwargs) -> dict:
+    """compute_liquidity_impact over loaded inputs; run in a worker thread by the async triggers."""
+    with stage("simulate"):
+        return compute_liquidity_impact(
+            ledger=inputs.ledger,
+            balances=inputs.balances,
+            buffers=inputs.buffers,
+            audit_context=AUDIT_CONTEXT,
+            engine=LIQUIDITY_ENGINE,
+            ledger_index=inputs.index,
+            **kwargs,
+        )
+
+
+def simulate_and_store(key: tuple, inputs: LedgerSnapshot, **kwargs) -> dict:
+    """simulate() and store the result under ``key``; sizing the entry serializes it, so run in a worker thread."""
+    result = simulate(inputs, **kwargs)
+    if "error" not in result:
+        _result_cache.put(key, result)
     return result
 
 
+async def simulate_cached(inputs: LedgerSnapshot, **kwargs) -> dict:
+    """simulate() off the event loop, answered from the result cache when the snapshot is unchanged."""
+    if inputs.version is None or not _result_cache.enabled or not ResultCache.cacheable(**kwargs):
+        return await asyncio.to_thread(simulate, inputs, **kwargs)
+    key = ResultCache.key(inputs.version, **kwargs)
+    result = _result_cache.get(key)
+    if result is None:
+        result = await asyncio.to_thread(simulate_and_store, key, inputs, **kwargs)
+    return result
+
+
+def batch_size(payment_ids: list[str], hypothetical_payments: list[dict], status_filter: str = None) -> int:
+    """
+    Number of payments a batch evaluates, known before its inputs are loaded.
+
+    The ``status_filter`` expansion is a COUNT query in targeted mode and a
+    scan of the cached snapshot otherwise, and is skipped when the explicit
+    lists alone are already over BATCH_MAX_PAYMENTS.
+    """
+    size = len(payment_ids) + len(hypothetical_payments)
+    if not status_filter or size > BATCH_MAX_PAYMENTS:
+        return size
+    if LIQUIDITY_LOAD_MODE != 'targeted':
+        requested = set(payment_ids)
+        return size + sum(
+            1 for txn in _snapshot_cache.get().ledger
+            if txn['status'] == status_filter and txn['direction'] == 'OUT' and txn['txn_id'] not in requested
+        )
+    return size + _source.count_outgoing(status_filter, exclude_ids=payment_ids)
+
+
+def load_batch_inputs(
+    payment_ids: list[str] = None,
+    hypothetical_payments: list[dict] = None,
+    status_filter: str = None,
+    currency_filter: str = None,
+) -> tuple[LedgerSnapshot, list[str]]:
+    """
+    Return (inputs, payment_ids) for a batch simulation.
+
+    ``status_filter`` adds every OUT payment with that status to the batch.
+    In targeted mode only the account/currency slices the batch touches are
+    loaded.
+    """
+    payment_ids = list(payment_ids or [])
+    hypothetical_payments = hypothetical_payments or []
+
+    if LIQUIDITY_LOAD_MODE != 'targeted':
+        snapshot = _snapshot_cache.get()
+        if status_filter:
+            requested = set(payment_ids)
+            payment_ids += [
+                txn['txn_id'] for txn in snapshot.ledger
+                if txn['status'] == status_filter and txn['direction'] == 'OUT' and txn['txn_id'] not in requested
+            ]
+        return snapshot, payment_ids
+
+    targets = _source.load_payments(payment_ids) if payment_ids else []
+    if status_filter:
+        requested = set(payment_ids)
+        for txn in _source.load_payments(status=status_filter):
+            if txn['direction'] == 'OUT' and txn['txn_id'] not in requested:
+                payment_ids.append(txn['txn_id'])
+                targets.append(txn)
+
+    keys = {(t['account_id'], currency_filter or t['currency']) for t in targets}
+    keys |= {(hp.get('account_id'), currency_filter or hp.get('currency')) for hp in hypothetical_payments}
+    keys = sorted(keys, key=str)
+    ledger = _source.load_ledger_slices(keys)
+    # currency_filter can point a slice away from a payment's own currency
+    loaded = {txn['txn_id'] for txn in ledger}
+    ledger += [t for t in targets if t['txn_id'] not in loaded]
+    balances = _source.load_balances_for(keys)
+    return LedgerSnapshot(ledger, balances, _source.load_buffers(), fingerprint=None, version=None), payment_ids
+
+
 @app.route(route="compute_liquidity_impact", methods=["POST"])
-def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
+@timed("compute_liquidity_impact")
+async def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP trigger for liquidity impact computation.
 
@@ -391,7 +1135,10 @@ def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
             "timestamp_utc": "2026-01-19 10:25:00"
         },
         "entity_filter": "BankSubsidiary_TR",  // optional
-        "currency_filter": "USD"  // optional
+        "currency_filter": "USD",  // optional
+        "aggregation": "account",  // optional: "entity" checks the buffer across all the entity's accounts
+        "trajectory": "breach_window",  // optional: none (default), breach_window, downsample=N, full
+        "format": "json"  // optional: "ndjson" returns the result line then one trajectory point per line
     }
     """
     logging.info("Liquidity impact computation requested")
@@ -410,6 +1157,9 @@ def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
     hypothetical_payment = req_body.get('hypothetical_payment')
     entity_filter = req_body.get('entity_filter')
     currency_filter = req_body.get('currency_filter')
+    trajectory = req_body.get('trajectory')
+    aggregation = req_body.get('aggregation') or 'account'
+    ndjson = req_body.get('format') == 'ndjson' or 'application/x-ndjson' in (req.headers.get('Accept') or '')
 
     if not payment_id and not hypothetical_payment:
         return func.HttpResponse(
@@ -419,26 +1169,48 @@ def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
         )
 
     try:
-        # Load data from PostgreSQL
-        logging.info("Loading data from PostgreSQL...")
-        ledger = load_ledger()
-        balances = load_balances()
-        buffers = load_buffers()
-        logging.info(f"Loaded {len(ledger)} ledger rows, {len(balances)} balance rows, {len(buffers)} buffer rules")
-
-        # Compute liquidity impact
-        result = compute_liquidity_impact(
-            ledger=ledger,
-            balances=balances,
-            buffers=buffers,
+        parse_trajectory_option(trajectory)
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}")
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    try:
+        if LIQUIDITY_LOAD_MODE == 'position' and aggregation == 'account' and parse_trajectory_option(trajectory)[0] == 'none':
+            result = await position_check(payment_id, hypothetical_payment, entity_filter, currency_filter)
+            return func.HttpResponse(
+                to_json(with_timings(result)),
+                status_code=200,
+                mimetype="application/json"
+            )
+
+        # Load data (worker snapshot cache or concurrent targeted slice queries)
+        inputs = await load_simulation_inputs(
+            payment_id, hypothetical_payment, entity_filter, currency_filter, aggregation)
+
+        # Compute liquidity impact off the event loop (or reuse it for this snapshot)
+        result = await simulate_cached(
+            inputs,
             payment_id=payment_id,
             hypothetical_payment=hypothetical_payment,
             entity_filter=entity_filter,
             currency_filter=currency_filter,
+            trajectory=trajectory,
+            aggregation=aggregation,
         )
 
+        if ndjson:
+            return func.HttpResponse(
+                "".join(ndjson_lines(with_timings(result))),
+                status_code=200,
+                mimetype="application/x-ndjson"
+            )
         return func.HttpResponse(
-            json.dumps(result, indent=2),
+            to_json(with_timings(result)),
             status_code=200,
             mimetype="application/json"
         )
@@ -452,7 +1224,260 @@ def compute_liquidity_impact_http(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
+@app.route(route="compute_liquidity_impact_batch", methods=["POST"])
+@timed("compute_liquidity_impact_batch")
+def compute_liquidity_impact_batch_http(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    HTTP trigger for batch liquidity impact computation.
+
+    Request body:
+    {
+        "payment_ids": ["TXN-EMRG-001", "TXN-000123"],  // and/or
+        "hypothetical_payments": [{...}, {...}],  // same shape as hypothetical_payment
+        "status_filter": "QUEUED",  // optional: add every OUT payment with this status
+        "entity_filter": "BankSubsidiary_TR",  // optional
+        "currency_filter": "USD",  // optional
+        "detail": "verdict"  // optional: "verdict" (default) or "full"
+    }
+    """
+    logging.info("Batch liquidity impact computation requested")
+
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    payment_ids = req_body.get('payment_ids') or []
+    hypothetical_payments = req_body.get('hypothetical_payments') or []
+    status_filter = req_body.get('status_filter')
+    entity_filter = req_body.get('entity_filter')
+    currency_filter = req_body.get('currency_filter')
+    detail = req_body.get('detail') or 'verdict'
+
+    if not payment_ids and not hypothetical_payments and not status_filter:
+        return func.HttpResponse(
+            json.dumps({"error": "Provide payment_ids, hypothetical_payments or status_filter"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    if detail not in DETAILS:
+        return func.HttpResponse(
+            json.dumps({"error": f"Unknown detail '{detail}', expected one of {DETAILS}"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    try:
+        if batch_size(payment_ids, hypothetical_payments, status_filter) > BATCH_MAX_PAYMENTS:
+            return func.HttpResponse(
+                json.dumps({"error": f"Batch exceeds {BATCH_MAX_PAYMENTS} payments"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        inputs, payment_ids = load_batch_inputs(
+            payment_ids, hypothetical_payments, status_filter, currency_filter)
+
+        with stage("simulate"):
+            result = compute_liquidity_impact_batch(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                payment_ids=payment_ids,
+                hypothetical_payments=hypothetical_payments,
+                entity_filter=entity_filter,
+                currency_filter=currency_filter,
+                detail=detail,
+                max_workers=BATCH_MAX_WORKERS,
+                executor=BATCH_EXECUTOR,
+                audit_context=AUDIT_CONTEXT,
+                engine=LIQUIDITY_ENGINE,
+                ledger_index=inputs.index,
+            )
+
+        return func.HttpResponse(
+            to_json(with_timings(result)),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Error computing batch liquidity impact: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "traceback": traceback.format_exc()}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+
+def load_schedule_inputs(statuses: list[str], currency_filter: str = None) -> LedgerSnapshot:
+    """
+    Inputs for the release scheduler.
+
+    In targeted mode only the account/currency slices holding a payment in
+    ``statuses`` are loaded.
+    """
+    if LIQUIDITY_LOAD_MODE != 'targeted':
+        return _snapshot_cache.get()
+    keys = set()
+    for status in statuses:
+        keys |= {(txn['account_id'], txn['currency']) for txn in _source.load_payments(status=status)
+                 if not currency_filter or txn['currency'] == currency_filter}
+    keys = sorted(keys)
+    return LedgerSnapshot(_source.load_ledger_slices(keys), _source.load_balances_for(keys), _source.load_buffers(),
+                          fingerprint=None, version=None)
+
+
+@app.route(route="schedule_releases", methods=["POST"])
+@timed("schedule_releases")
+def schedule_releases_http(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    HTTP trigger for the queued payment release scheduler.
+
+    Request body (every field optional):
+    {
+        "statuses": ["QUEUED", "PENDING_APPROVAL"],  // backlog to schedule (or one status as a string)
+        "objective": "priority",  // "priority", "value" (most amount released) or "count"
+        "priorities": {"TXN-EMRG-001": 10},  // higher is released first
+        "entity_filter": "BankSubsidiary_TR",
+        "currency_filter": "USD"
+    }
+    """
+    logging.info("Release schedule requested")
+
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    try:
+        options = parse_schedule_options(req_body)
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    currency_filter = req_body.get('currency_filter')
+
+    try:
+        inputs = load_schedule_inputs(options['statuses'], currency_filter)
+        with stage("simulate"):
+            result = schedule_releases(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                **options,
+                entity_filter=req_body.get('entity_filter'),
+                currency_filter=currency_filter,
+                audit_context=AUDIT_CONTEXT,
+                ledger_index=inputs.index,
+            )
+
+        return func.HttpResponse(
+            to_json(with_timings(result)),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Error scheduling releases: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "traceback": traceback.format_exc()}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+
+def load_stress_inputs() -> LedgerSnapshot:
+    """Stress scenarios cover every account, so they always read the full tables."""
+    if LIQUIDITY_LOAD_MODE == 'targeted':
+        return LedgerSnapshot(_source.load_ledger(), _source.load_balances(), _source.load_buffers(),
+                              fingerprint=None, version=None)
+    return _snapshot_cache.get()
+
+
+@app.route(route="stress_scenario", methods=["POST"])
+@timed("stress_scenario")
+def stress_scenario_http(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    HTTP trigger for a shock-day stress scenario across all accounts.
+
+    Request body (every field optional):
+    {
+        "inflow_haircut_pct": 20,  // cut every inflow by 20%
+        "delayed_inflows": {"SWIFT": 120},  // channel -> minutes late
+        "fx_shocks": {"TRY": 15},  // currency -> % increase in outflows
+        "additional_outflows": [{"amount": 500000, "currency": "USD", "account_id": "ACC-BAN-001",
+                                 "entity": "BankSubsidiary_TR", "timestamp_utc": "2026-01-19 11:00:00"}],
+        "entity_filter": "BankSubsidiary_TR",
+        "currency_filter": "USD",
+        "limit": 25  // top N rows of the ranking (default 20)
+    }
+    """
+    logging.info("Stress scenario requested")
+
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    try:
+        shocks = parse_shocks(req_body)
+        limit = parse_limit(req_body)
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    try:
+        inputs = load_stress_inputs()
+        with stage("simulate"):
+            result = run_stress_scenario(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                shocks=shocks,
+                entity_filter=req_body.get('entity_filter'),
+                currency_filter=req_body.get('currency_filter'),
+                limit=limit,
+                max_workers=STRESS_MAX_WORKERS,
+                executor=STRESS_EXECUTOR,
+                audit_context=AUDIT_CONTEXT,
+                ledger_index=inputs.index,
+            )
+
+        return func.HttpResponse(
+            to_json(with_timings(result)),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Error running stress scenario: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "traceback": traceback.format_exc()}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+
 @app.route(route="ping", methods=["GET"])
+@timed("ping")
 def ping_check(req: func.HttpRequest) -> func.HttpResponse:
     """Simple ping endpoint - no database."""
     return func.HttpResponse(
@@ -481,7 +1506,9 @@ TOOL_PROPERTIES_LIQUIDITY_IMPACT = json.dumps([
     {"propertyName": "account_id", "propertyType": "string", "description": "Account ID (e.g., ACC-BAN-001)", "isRequired": False},
     {"propertyName": "entity", "propertyType": "string", "description": "Entity name (e.g., BankSubsidiary_TR)", "isRequired": False},
     {"propertyName": "beneficiary_name", "propertyType": "string", "description": "Beneficiary name", "isRequired": False},
-    {"propertyName": "timestamp_utc", "propertyType": "string", "description": "Payment timestamp (YYYY-MM-DD HH:MM:SS)", "isRequired": False}
+    {"propertyName": "timestamp_utc", "propertyType": "string", "description": "Payment timestamp (YYYY-MM-DD HH:MM:SS)", "isRequired": False},
+    {"propertyName": "trajectory", "propertyType": "string", "description": "Balance trajectory to include: none (default), breach_window, downsample=N or full", "isRequired": False},
+    {"propertyName": "aggregation", "propertyType": "string", "description": "account (default) or entity to check the buffer across every account of the entity and currency", "isRequired": False}
 ])
 
 
@@ -492,7 +1519,8 @@ TOOL_PROPERTIES_LIQUIDITY_IMPACT = json.dumps([
     description="Compute intraday liquidity impact for a payment. Determines if releasing a payment would breach minimum cash buffer thresholds. Returns breach status, timing, gap amount, and recommendations.",
     toolProperties=TOOL_PROPERTIES_LIQUIDITY_IMPACT
 )
-def compute_liquidity_impact_mcp(context: str) -> str:
+@timed("mcp.compute_liquidity_impact")
+async def compute_liquidity_impact_mcp(context: str) -> str:
     """MCP Tool: Compute liquidity impact of a payment."""
     logging.info(f"MCP compute_liquidity_impact called with context: {context}")
 
@@ -516,68 +1544,236 @@ def compute_liquidity_impact_mcp(context: str) -> str:
         if not payment_id and not hypothetical_payment:
             return json.dumps({"error": "Either payment_id or hypothetical payment parameters required"})
 
-        ledger = load_ledger()
-        balances = load_balances()
-        buffers = load_buffers()
+        aggregation = arguments.get("aggregation") or "account"
+        if (LIQUIDITY_LOAD_MODE == 'position' and aggregation == 'account'
+                and parse_trajectory_option(arguments.get("trajectory"))[0] == 'none'):
+            return to_json(with_timings(await position_check(payment_id, hypothetical_payment)))
+        inputs = await load_simulation_inputs(payment_id, hypothetical_payment, aggregation=aggregation)
 
-        result = compute_liquidity_impact(
-            ledger=ledger,
-            balances=balances,
-            buffers=buffers,
+        result = await simulate_cached(
+            inputs,
             payment_id=payment_id,
             hypothetical_payment=hypothetical_payment,
+            trajectory=arguments.get("trajectory"),
+            aggregation=aggregation,
         )
 
-        return json.dumps(result, indent=2)
+        return to_json(with_timings(result))
+    except Exception as e:
+        logging.error(f"MCP Tool error: {str(e)}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+TOOL_PROPERTIES_LIQUIDITY_IMPACT_BATCH = json.dumps([
+    {"propertyName": "payment_ids", "propertyType": "string", "description": "Comma-separated transaction IDs to simulate (e.g., TXN-EMRG-001,TXN-000123)", "isRequired": False},
+    {"propertyName": "status_filter", "propertyType": "string", "description": "Evaluate every outgoing payment with this status (e.g., QUEUED)", "isRequired": False},
+    {"propertyName": "hypothetical_payments", "propertyType": "string", "description": "JSON array of hypothetical payments (amount, currency, account_id, entity, beneficiary_name, timestamp_utc)", "isRequired": False},
+    {"propertyName": "currency_filter", "propertyType": "string", "description": "Restrict simulation to this currency (e.g., USD)", "isRequired": False}
+])
+
+
+@app.generic_trigger(
+    arg_name="context",
+    type="mcpToolTrigger",
+    toolName="compute_liquidity_impact_batch",
+    description="Compute intraday liquidity impact for many payments in one call. Returns a HOLD/RELEASE verdict, breach time and gap per payment plus a summary. Use status_filter=QUEUED to assess the whole queue.",
+    toolProperties=TOOL_PROPERTIES_LIQUIDITY_IMPACT_BATCH
+)
+@timed("mcp.compute_liquidity_impact_batch")
+def compute_liquidity_impact_batch_mcp(context: str) -> str:
+    """MCP Tool: Compute liquidity impact for a batch of payments."""
+    logging.info(f"MCP compute_liquidity_impact_batch called with context: {context}")
+
+    try:
+        content = json.loads(context)
+        arguments = content.get("arguments", {})
+
+        payment_ids = [pid.strip() for pid in (arguments.get("payment_ids") or "").split(",") if pid.strip()]
+        status_filter = arguments.get("status_filter")
+        currency_filter = arguments.get("currency_filter")
+        hypothetical_payments = arguments.get("hypothetical_payments") or []
+        if isinstance(hypothetical_payments, str):
+            hypothetical_payments = json.loads(hypothetical_payments)
+
+        if not payment_ids and not hypothetical_payments and not status_filter:
+            return json.dumps({"error": "Provide payment_ids, hypothetical_payments or status_filter"})
+
+        if batch_size(payment_ids, hypothetical_payments, status_filter) > BATCH_MAX_PAYMENTS:
+            return json.dumps({"error": f"Batch exceeds {BATCH_MAX_PAYMENTS} payments"})
+
+        inputs, payment_ids = load_batch_inputs(
+            payment_ids, hypothetical_payments, status_filter, currency_filter)
+
+        with stage("simulate"):
+            result = compute_liquidity_impact_batch(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                payment_ids=payment_ids,
+                hypothetical_payments=hypothetical_payments,
+                currency_filter=currency_filter,
+                max_workers=BATCH_MAX_WORKERS,
+                executor=BATCH_EXECUTOR,
+                audit_context=AUDIT_CONTEXT,
+                engine=LIQUIDITY_ENGINE,
+                ledger_index=inputs.index,
+            )
+
+        return to_json(with_timings(result))
+    except Exception as e:
+        logging.error(f"MCP Tool error: {str(e)}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+TOOL_PROPERTIES_STRESS_SCENARIO = json.dumps([
+    {"propertyName": "inflow_haircut_pct", "propertyType": "number", "description": "Percentage cut applied to every inflow (e.g., 20)", "isRequired": False},
+    {"propertyName": "delayed_inflows", "propertyType": "string", "description": "JSON object of channel to delay in minutes (e.g., {\"SWIFT\": 120})", "isRequired": False},
+    {"propertyName": "fx_shocks", "propertyType": "string", "description": "JSON object of currency to percentage increase in outflows (e.g., {\"TRY\": 15})", "isRequired": False},
+    {"propertyName": "additional_outflows", "propertyType": "string", "description": "JSON array of extra payments (amount, currency, account_id, entity, timestamp_utc)", "isRequired": False},
+    {"propertyName": "currency_filter", "propertyType": "string", "description": "Restrict the scenario to this currency (e.g., USD)", "isRequired": False},
+    {"propertyName": "limit", "propertyType": "number", "description": "Number of ranked accounts to return (default 20)", "isRequired": False}
+])
+
+
+@app.generic_trigger(
+    arg_name="context",
+    type="mcpToolTrigger",
+    toolName="stress_scenario",
+    description="Run a shock-day stress scenario across every account and currency. Applies inflow haircuts, channel delays, FX moves and extra outflows, then returns accounts ranked by buffer breach gap with breach times and a summary.",
+    toolProperties=TOOL_PROPERTIES_STRESS_SCENARIO
+)
+@timed("mcp.stress_scenario")
+def stress_scenario_mcp(context: str) -> str:
+    """MCP Tool: Run a stress scenario across all accounts."""
+    logging.info(f"MCP stress_scenario called with context: {context}")
+
+    try:
+        content = json.loads(context)
+        arguments = content.get("arguments", {})
+        try:
+            for name in ("delayed_inflows", "fx_shocks", "additional_outflows"):
+                if isinstance(arguments.get(name), str):
+                    arguments[name] = json.loads(arguments[name])
+            shocks = parse_shocks(arguments)
+            limit = parse_limit(arguments)
+        except ValueError as e:
+            return json.dumps({"error": str(e)})
+        inputs = load_stress_inputs()
+
+        with stage("simulate"):
+            result = run_stress_scenario(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                shocks=shocks,
+                currency_filter=arguments.get("currency_filter"),
+                limit=limit,
+                max_workers=STRESS_MAX_WORKERS,
+                executor=STRESS_EXECUTOR,
+                audit_context=AUDIT_CONTEXT,
+                ledger_index=inputs.index,
+            )
+
+        return to_json(with_timings(result))
+    except Exception as e:
+        logging.error(f"MCP Tool error: {str(e)}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+TOOL_PROPERTIES_SCHEDULE_RELEASES = json.dumps([
+    {"propertyName": "objective", "propertyType": "string", "description": "priority (default), value (most amount released before cutoff) or count (most payments)", "isRequired": False},
+    {"propertyName": "priorities", "propertyType": "string", "description": "JSON object of payment ID to priority, higher released first (e.g., {\"TXN-EMRG-001\": 10})", "isRequired": False},
+    {"propertyName": "entity_filter", "propertyType": "string", "description": "Restrict scheduling to this entity (e.g., BankSubsidiary_TR)", "isRequired": False},
+    {"propertyName": "currency_filter", "propertyType": "string", "description": "Restrict scheduling to this currency (e.g., USD)", "isRequired": False},
+    {"propertyName": "limit", "propertyType": "number", "description": "Number of per-payment decisions to return (default 50; summaries cover all)", "isRequired": False}
+])
+
+
+@app.generic_trigger(
+    arg_name="context",
+    type="mcpToolTrigger",
+    toolName="schedule_releases",
+    description="Propose release times for the QUEUED and PENDING_APPROVAL backlog. Releases as much as possible before each buffer cutoff without breaching min_buffer and returns RELEASE, RELEASE_DELAYED (with release time) or HOLD per payment plus per-account summaries.",
+    toolProperties=TOOL_PROPERTIES_SCHEDULE_RELEASES
+)
+@timed("mcp.schedule_releases")
+def schedule_releases_mcp(context: str) -> str:
+    """MCP Tool: Schedule the queued payment backlog."""
+    logging.info(f"MCP schedule_releases called with context: {context}")
+
+    try:
+        content = json.loads(context)
+        arguments = content.get("arguments", {})
+        try:
+            if isinstance(arguments.get("priorities"), str):
+                arguments["priorities"] = json.loads(arguments["priorities"])
+            options = parse_schedule_options({**arguments, "statuses": RELEASABLE_STATUSES})
+        except ValueError as e:
+            return json.dumps({"error": str(e)})
+        currency_filter = arguments.get("currency_filter")
+
+        inputs = load_schedule_inputs(options['statuses'], currency_filter)
+        with stage("simulate"):
+            result = schedule_releases(
+                ledger=inputs.ledger,
+                balances=inputs.balances,
+                buffers=inputs.buffers,
+                **options,
+                entity_filter=arguments.get("entity_filter"),
+                currency_filter=currency_filter,
+                audit_context=AUDIT_CONTEXT,
+                ledger_index=inputs.index,
+            )
+        result["schedule"] = result["schedule"][:int(arguments.get("limit") or 50)]
+
+        return to_json(with_timings(result))
     except Exception as e:
         logging.error(f"MCP Tool error: {str(e)}")
         return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
 
 
 @app.route(route="health", methods=["GET"])
+@timed("health")
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
-    """Health check endpoint with database connectivity check."""
+    """Health check endpoint with database (or local data source) connectivity check."""
     db_status = "unknown"
     db_error = None
     row_counts = {}
 
     try:
-        conn = get_db_connection()
-
-        # Test basic connectivity
-        conn.run("SELECT 1")
+        # For PostgreSQL the pool checkout validates the connection with SELECT 1
+        row_counts = _source.row_counts()
         db_status = "connected"
-
-        # Get row counts from treasury tables
-        try:
-            ledger_count = conn.run("SELECT COUNT(*) FROM treasury.ledger_today")[0][0]
-            balance_count = conn.run("SELECT COUNT(*) FROM treasury.starting_balances")[0][0]
-            buffer_count = conn.run("SELECT COUNT(*) FROM treasury.buffers")[0][0]
-            row_counts = {
-                "ledger_today": ledger_count,
-                "starting_balances": balance_count,
-                "buffers": buffer_count
-            }
-        except Exception as e:
-            row_counts = {"error": str(e)}
-
-        conn.close()
-    except Exception as e:
+    except Exception:
         db_status = "error"
         db_error = traceback.format_exc()
 
     status = "healthy" if db_status == "connected" else "degraded"
 
-    response = {
-        "status": status,
-        "service": "LiquidityGate",
-        "version": "2.0.0",
-        "database": {
+    if isinstance(_source, PostgresSource):
+        database = {
+            "source": "postgres",
             "host": DB_CONFIG['host'],
             "database": DB_CONFIG['database'],
             "status": db_status,
             "row_counts": row_counts if row_counts else None,
+            "pool": _db_pool.stats(),
+        }
+    else:
+        database = {
+            "source": _source.name,
+            "path": LIQUIDITY_DATA_PATH,
+            "status": db_status,
+            "row_counts": row_counts if row_counts else None,
         }
+
+    response = {
+        "status": status,
+        "service": "LiquidityGate",
+        "version": "2.0.0",
+        "database": database,
+        "snapshot_cache": _snapshot_cache.stats(),
+        "result_cache": _result_cache.stats(),
     }
 
     if db_error:
@@ -588,3 +1784,13 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
         status_code=200 if status == "healthy" else 503,
         mimetype="application/json"
     )
+
+
+@app.route(route="metrics", methods=["GET"])
+def metrics_http(req: func.HttpRequest) -> func.HttpResponse:
+    """Latency percentiles (p50/p95/p99) per route and stage over the recent request window."""
+    return func.HttpResponse(
+        json.dumps(metrics(), indent=2),
+        status_code=200,
+        mimetype="application/json"
+    )
@@ -0,0 +1,151 @@
+"""
+Intraday Position
+=================
+Breach checks answered from ``treasury.intraday_position``.
+
+The table (see data/schema.sql) holds, per account/currency and ledger row,
+the balance after the row plus the running minimum up to it and the minimum
+from it to end of day. A payment released at time T shifts every balance
+after T by its amount, so the projected minimum is the least of:
+
+- the running minimum at the last row at or before T
+- the balance at T plus the payment (the payment itself)
+- the minimum from the first row after T, plus the payment
+
+function_app fetches those boundary rows (and the first breach, minimum and
+release-time rows) with one indexed query; position_impact turns them into
+the same buffer_breach_risk / recommendation blocks the engines return,
+without replaying the day.
+"""
+
+import uuid
+from datetime import datetime
+
+from liquidity_engine import (
+    ENGINE_VERSION, _max_releasable, _release_fields, breach_risk, from_cents, recommendation,
+)
+
+
+def position_params(target_payment: dict, target_currency: str) -> dict:
+    """
+    Query offsets for a target payment, in int cents.
+
+    A QUEUED ledger payment is already in the position at its scheduled time,
+    so it moves no balance (``delta`` 0) and the partial release figures take
+    its amount back out (``included``); any other target is added on top.
+    """
+    amount = target_payment['amount_cents']
+    signed = -amount if target_payment['direction'] == 'OUT' else amount
+    included = (target_payment['status'] == 'QUEUED' and target_payment['currency'] == target_currency)
+    return {
+        'signed': signed,
+        'included': included,
+        'delta': 0 if included else signed,
+        # Raw-table suffix minimum from which the full amount fits (buffer + amount, in base terms)
+        'release_offset': amount + (signed if included else 0),
+    }
+
+
+def position_impact(
+    target_payment: dict,
+    position: dict,
+    target_entity: str,
+    target_currency: str,
+    audit_context: dict = None,
+) -> dict:
+    """
+    Breach verdict for ``target_payment`` from the rows of one position query.
+
+    Args:
+        target_payment: From target_from_ledger / target_from_hypothetical
+        position: Columns of the position query (see function_app.POSITION_COLUMNS)
+        target_entity, target_currency: Buffer entity and position currency
+        audit_context: Extra fields merged into the audit block
+
+    Returns:
+        buffer_breach_risk, payment_context, account_summary and recommendation
+        blocks as compute_liquidity_impact, plus an audit block
+    """
+    params = position_params(target_payment, target_currency)
+    delta = params['delta']
+    # Balances come back as int cents, as the engines carry them
+    cents = {col: position[f'{col}_cents'] for col in (
+        'min_buffer', 'start_of_day_balance', 'balance_at', 'running_min', 'later_min',
+        'end_of_day_balance', 'breach_balance_before', 'breach_balance_after')}
+    buffer_cents = cents['min_buffer'] or 0
+    start_cents = cents['start_of_day_balance'] or 0
+    scheduled_time = target_payment['timestamp_utc']
+
+    balance_at = cents['balance_at'] if cents['balance_at'] is not None else start_cents
+    running_min = cents['running_min'] if cents['running_min'] is not None else start_cents
+    target_balance = balance_at + delta
+    later_min = cents['later_min']
+
+    # Earliest point wins ties, as in the replay
+    min_balance, min_balance_time = start_cents, None
+    for balance, at in [
+        (running_min, position['min_time_before']),
+        (target_balance, scheduled_time),
+        (later_min + delta if later_min is not None else None, position['min_time_after']),
+    ]:
+        if balance is not None and balance < min_balance:
+            min_balance, min_balance_time = balance, at
+
+    first_breach_time, breach_gap = None, 0
+    if position['breach_time_before'] is not None:
+        first_breach_time = position['breach_time_before']
+        breach_gap = buffer_cents - cents['breach_balance_before']
+    elif target_balance < buffer_cents:
+        first_breach_time = scheduled_time
+        breach_gap = buffer_cents - target_balance
+    elif position['breach_time_after'] is not None:
+        first_breach_time = position['breach_time_after']
+        breach_gap = buffer_cents - (cents['breach_balance_after'] + delta)
+
+    # Partial release figures over the day without the target
+    amount = target_payment['amount_cents']
+    if target_payment['direction'] == 'OUT':
+        undo = params['signed'] if params['included'] else 0
+        pre_balance = balance_at - undo
+        lowest = min(pre_balance, later_min - undo) if later_min is not None else pre_balance
+        max_releasable = _max_releasable(amount, lowest, buffer_cents)
+        bound = buffer_cents + amount
+        if pre_balance >= bound and (later_min is None or later_min - undo >= bound):
+            earliest_full_release_time = scheduled_time
+        else:
+            earliest_full_release_time = position['release_time']
+    else:
+        max_releasable, earliest_full_release_time = amount, scheduled_time
+
+    transaction_count = position['transaction_count'] or 0
+    end_of_day_balance = cents['end_of_day_balance']
+    end_of_day_balance = (end_of_day_balance if end_of_day_balance is not None else start_cents) + delta
+
+    return {
+        "buffer_breach_risk": breach_risk(min_balance, min_balance_time, first_breach_time, breach_gap, buffer_cents),
+        "payment_context": {
+            "payment_id": target_payment['payment_id'],
+            "amount": target_payment['amount'],
+            "currency": target_currency,
+            "beneficiary": target_payment['beneficiary_name'],
+            "account_id": target_payment['account_id'],
+            "entity": target_entity,
+            "scheduled_time": scheduled_time,
+        },
+        "account_summary": {
+            "start_of_day_balance": from_cents(start_cents),
+            "end_of_day_balance": from_cents(end_of_day_balance),
+            "transaction_count": transaction_count if params['included'] else transaction_count + 1,
+        },
+        "recommendation": recommendation(
+            min_balance < buffer_cents, breach_gap, _release_fields(max_releasable, earliest_full_release_time)),
+        "audit": {
+            "run_id": str(uuid.uuid4())[:8],
+            "timestamp_utc": datetime.utcnow().isoformat() + "Z",
+            "cutoff_time": position['cutoff_time_utc'],
+            "engine": "position",
+            "version": ENGINE_VERSION,
+            "data_source": "PostgreSQL (treasury.intraday_position)",
+            **(audit_context or {}),
+        },
+    }
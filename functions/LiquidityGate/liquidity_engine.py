@@ -0,0 +1,1584 @@
+"""
+Liquidity Engine
+================
+Pure simulation logic behind the Liquidity Gate function.
+
+Kept free of Azure Functions and database imports so it can be reused by
+batch workers (including process pools) and run offline against files.
+"""
+
+import heapq
+import json
+import math
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import ChainMap, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # only the numpy engine needs it
+    np = None
+
+ENGINE_VERSION = "2.0.0"
+
+# "replay" walks the account timeline per request; "index" answers from a
+# prefix-sum AccountIndex built once per slice; "numpy" runs the replay on
+# columnar AccountColumns arrays
+ENGINES = ("replay", "index", "numpy")
+
+# "account" checks the buffer against the target account alone; "entity" merges
+# every account of the entity/currency, matching how buffers are defined
+AGGREGATIONS = ("account", "entity")
+
+# Batch result shape: "verdict" is the compact per-payment verdict, "full" the
+# complete compute_liquidity_impact result
+DETAILS = ("verdict", "full")
+
+# Deltas LedgerIndex.apply_changes chains over the payment lookup before flattening it
+BY_ID_MAX_DEPTH = 16
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@lru_cache(maxsize=8192)
+def parse_timestamp(ts: str) -> datetime:
+    """
+    Parse an ISO timestamp (YYYY-MM-DD HH:MM[:SS], space or T) to naive UTC.
+
+    Only user-supplied timestamps and file-loaded rows come through here;
+    database rows carry ``timestamp_epoch`` already.
+    """
+    try:
+        parsed = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        raise ValueError(f"Unable to parse timestamp: {ts}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@lru_cache(maxsize=8192)
+def epoch_seconds(ts: str) -> int:
+    """Integer epoch seconds for an ISO timestamp string."""
+    return int((parse_timestamp(ts) - _EPOCH).total_seconds())
+
+
+def txn_epoch(txn: dict) -> int:
+    """Epoch seconds of a ledger row: the loaded ``timestamp_epoch`` column, else parsed."""
+    epoch = txn.get('timestamp_epoch')
+    return int(epoch) if epoch is not None else epoch_seconds(txn['timestamp_utc'])
+
+
+def to_cents(value) -> int:
+    """
+    A money value (float, Decimal, int or numeric string) as integer minor units, half-up.
+
+    The engines carry every amount and balance as int cents so sums are exact
+    and a verdict at the buffer edge cannot flip on float drift; floats only
+    reappear at the response boundary (from_cents).
+    """
+    if isinstance(value, float):
+        return math.floor(value * 100 + 0.5)
+    if isinstance(value, int):
+        return value * 100
+    return int((Decimal(value) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """Integer minor units back to a JSON-friendly amount."""
+    return cents / 100
+
+
+def txn_cents(txn: dict) -> int:
+    """Amount of a ledger row in cents: the loaded ``amount_cents`` column, else converted."""
+    cents = txn.get('amount_cents')
+    return int(cents) if cents is not None else to_cents(txn['amount'])
+
+
+def bal_cents(bal: dict) -> int:
+    """Starting balance of a balances row in cents: the loaded ``balance_cents`` column, else converted."""
+    cents = bal.get('balance_cents')
+    return int(cents) if cents is not None else to_cents(bal['start_of_day_balance'])
+
+
+def buf_cents(buf: dict) -> int:
+    """Minimum buffer of a buffer rule in cents: the loaded ``min_buffer_cents`` column, else converted."""
+    cents = buf.get('min_buffer_cents')
+    return int(cents) if cents is not None else to_cents(buf['min_buffer'])
+
+
+class AccountTimeline:
+    """Time-sorted transactions (epoch-second timestamps) for one account/currency, shared across simulations."""
+
+    def __init__(self, account_id: str, currency: str, txns: list[dict]):
+        self.account_id = account_id
+        self.currency = currency
+        self.txns = txns
+
+
+def _timeline_entry(txn: dict) -> dict:
+    return {
+        'txn_id': txn['txn_id'],
+        'account_id': txn['account_id'],
+        'timestamp': txn_epoch(txn),
+        'timestamp_str': txn['timestamp_utc'],
+        'amount': float(txn['amount']),
+        'cents': txn_cents(txn),
+        'direction': txn.get('direction', 'OUT'),
+        'beneficiary': txn.get('beneficiary_name', ''),
+        'status': txn.get('status', 'RELEASED'),
+        'alert_flag': txn.get('alert_flag', ''),
+        'channel': txn.get('channel', ''),
+    }
+
+
+def timeline_order(entry: dict) -> tuple:
+    """
+    Sort key of timeline entries: time, then txn_id for rows in the same second.
+
+    treasury.intraday_position numbers rows the same way (see data/schema.sql),
+    so every engine and the position table agree on the order of ties.
+    """
+    return entry['timestamp'], entry['txn_id']
+
+
+def build_account_timeline(ledger: list[dict], account_id: str, currency: str) -> AccountTimeline:
+    """Filter the ledger to one account/currency and sort it by timeline_order."""
+    txns = [
+        _timeline_entry(txn) for txn in ledger
+        if txn['account_id'] == account_id and txn['currency'] == currency
+    ]
+    txns.sort(key=timeline_order)
+    return AccountTimeline(account_id, currency, txns)
+
+
+def build_account_timelines(ledger: list[dict], keys: set) -> dict:
+    """Build timelines for several (account_id, currency) keys in one ledger pass."""
+    grouped = {key: [] for key in keys}
+    for txn in ledger:
+        bucket = grouped.get((txn['account_id'], txn['currency']))
+        if bucket is not None:
+            bucket.append(_timeline_entry(txn))
+    timelines = {}
+    for (account_id, currency), txns in grouped.items():
+        txns.sort(key=timeline_order)
+        timelines[(account_id, currency)] = AccountTimeline(account_id, currency, txns)
+    return timelines
+
+
+def merge_account_timelines(timelines: list[AccountTimeline], name: str, currency: str) -> AccountTimeline:
+    """
+    k-way heap merge of already sorted account timelines into one stream in timeline_order.
+
+    Same-second rows of different accounts are ordered by txn_id, as within one account.
+    """
+    txns = list(heapq.merge(*(timeline.txns for timeline in timelines), key=timeline_order))
+    return AccountTimeline(name, currency, txns)
+
+
+def target_from_ledger(txn: dict) -> dict:
+    """Target payment fields for a ledger transaction being simulated."""
+    return {
+        'payment_id': txn['txn_id'],
+        'amount': float(txn['amount']),
+        'amount_cents': txn_cents(txn),
+        'currency': txn['currency'],
+        'account_id': txn['account_id'],
+        'entity': txn['entity'],
+        'beneficiary_name': txn['beneficiary_name'],
+        'timestamp_utc': txn['timestamp_utc'],
+        'timestamp_epoch': txn_epoch(txn),
+        'direction': txn.get('direction', 'OUT'),
+        'status': txn.get('status', 'QUEUED'),
+    }
+
+
+def target_from_hypothetical(hypothetical_payment: dict) -> dict:
+    """Target payment fields for a hypothetical payment."""
+    timestamp_utc = hypothetical_payment.get('timestamp_utc', datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+    return {
+        'payment_id': hypothetical_payment.get('payment_id', 'HYPOTHETICAL'),
+        'amount': float(hypothetical_payment['amount']),
+        'amount_cents': to_cents(hypothetical_payment['amount']),
+        'currency': hypothetical_payment['currency'],
+        'account_id': hypothetical_payment['account_id'],
+        'entity': hypothetical_payment['entity'],
+        'beneficiary_name': hypothetical_payment.get('beneficiary_name', 'Unknown'),
+        'timestamp_utc': timestamp_utc,
+        'timestamp_epoch': epoch_seconds(timestamp_utc),
+        'direction': hypothetical_payment.get('direction', 'OUT'),
+        'status': 'HYPOTHETICAL',
+    }
+
+
+def find_starting_cents(balances: list[dict], account_id: str, currency: str) -> int:
+    """Starting balance in cents for an account/currency (0 if unknown)."""
+    for bal in balances:
+        if bal['account_id'] == account_id and bal['currency'] == currency:
+            return bal_cents(bal)
+    return 0
+
+
+def find_entity_cents(balances: list[dict], entity: str, currency: str, include_account: str = None) -> dict:
+    """Starting cents per account of an entity/currency, sorted by account (``include_account`` added at 0 if absent)."""
+    account_balances = {
+        bal['account_id']: bal_cents(bal)
+        for bal in balances if bal['entity'] == entity and bal['currency'] == currency
+    }
+    if include_account and include_account not in account_balances:
+        account_balances[include_account] = find_starting_cents(balances, include_account, currency)
+    return dict(sorted(account_balances.items()))
+
+
+def find_buffer_cents(buffers: list[dict], entity: str, currency: str) -> tuple:
+    """(min_buffer in cents, cutoff_time) for an entity/currency ((0, None) if no rule)."""
+    for buf in buffers:
+        if buf['entity'] == entity and buf['currency'] == currency:
+            return buf_cents(buf), buf.get('cutoff_time_utc')
+    return 0, None
+
+
+def simulate_release(
+    target_payment: dict,
+    timeline: AccountTimeline,
+    start_cents: int,
+    buffer_cents: int,
+    target_entity: str,
+    skip_txn_id: str = None,
+) -> dict:
+    """
+    Replay an account timeline with the target payment released at its scheduled time.
+
+    Balances are int cents (``start_cents``, ``buffer_cents``). ``skip_txn_id``
+    is replaced by the target when it is QUEUED in the timeline, so the
+    payment is released in its own slot; any other target goes after every
+    row of its second. Returns the result body without the audit block.
+    """
+    relevant_txns = list(timeline.txns)
+    position = next((
+        i for i, txn in enumerate(relevant_txns)
+        if skip_txn_id and txn['txn_id'] == skip_txn_id and txn['status'] == 'QUEUED'
+    ), None)
+    if position is not None:
+        del relevant_txns[position]
+    else:
+        position = bisect_right(relevant_txns, target_payment['timestamp_epoch'], key=lambda x: x['timestamp'])
+    relevant_txns.insert(position, {
+        'txn_id': target_payment['payment_id'],
+        'timestamp': target_payment['timestamp_epoch'],
+        'timestamp_str': target_payment['timestamp_utc'],
+        'amount': target_payment['amount'],
+        'cents': target_payment['amount_cents'],
+        'direction': target_payment['direction'],
+        'beneficiary': target_payment['beneficiary_name'],
+        'status': 'SIMULATED_RELEASE',
+        'alert_flag': '',
+        'is_target': True,
+    })
+
+    # Replay the day; base_balance leaves out the target, for the partial release figures
+    balance = start_cents
+    base_balance = start_cents
+    pre_target_balance = None
+    later_balances = []
+    later_times = []
+    min_balance = start_cents
+    min_balance_time = None
+    first_breach_time = None
+    breach_gap = 0
+
+    # Track beneficiary totals for concentration analysis
+    beneficiary_totals = defaultdict(int)
+    anomalies = []
+    total_outflow = 0
+    total_inflow = 0
+
+    for txn in relevant_txns:
+        # Apply transaction
+        if txn['direction'] == 'OUT':
+            balance -= txn['cents']
+            total_outflow += txn['cents']
+            beneficiary_totals[txn['beneficiary']] += txn['cents']
+        else:  # IN
+            balance += txn['cents']
+            total_inflow += txn['cents']
+
+        if txn.get('is_target'):
+            pre_target_balance = base_balance
+        else:
+            base_balance = _apply(base_balance, txn['direction'], txn['cents'])
+            if pre_target_balance is not None:
+                later_balances.append(base_balance)
+                later_times.append(txn['timestamp_str'])
+
+        # Track minimum balance
+        if balance < min_balance:
+            min_balance = balance
+            min_balance_time = txn['timestamp_str']
+
+        # Check for buffer breach
+        if balance < buffer_cents and first_breach_time is None:
+            first_breach_time = txn['timestamp_str']
+            breach_gap = buffer_cents - balance
+
+        # Collect anomalies
+        if txn.get('alert_flag'):
+            anomalies.append({
+                'txn_id': txn['txn_id'],
+                'flag': txn['alert_flag'],
+                'amount': txn['amount'],
+                'beneficiary': txn['beneficiary'],
+            })
+
+    # Calculate beneficiary concentration (top 5)
+    top_beneficiaries = sorted(
+        [{'beneficiary': k, 'total_amount': from_cents(v)} for k, v in beneficiary_totals.items()],
+        key=lambda x: x['total_amount'],
+        reverse=True
+    )[:5]
+
+    return _release_result(
+        target_payment, timeline, target_entity, start_cents, buffer_cents,
+        min_balance=min_balance,
+        min_balance_time=min_balance_time,
+        first_breach_time=first_breach_time,
+        breach_gap=breach_gap,
+        total_outflow=total_outflow,
+        total_inflow=total_inflow,
+        end_of_day_balance=balance,
+        transaction_count=len(relevant_txns),
+        top_beneficiaries=top_beneficiaries,
+        largest_single_payment=max([t['cents'] for t in relevant_txns if t['direction'] == 'OUT'], default=0),
+        anomalies=anomalies,
+        **_partial_release(target_payment, buffer_cents, pre_target_balance, later_balances, later_times.__getitem__),
+    )
+
+
+def _partial_release(target_payment: dict, buffer_cents: int, pre_balance: int,
+                     later_balances, later_time) -> dict:
+    """
+    Partial release figures from the balances (cents) without the target payment.
+
+    ``pre_balance`` is the balance just before the scheduled time and
+    ``later_balances`` the balance after each later transaction (a list or
+    array), with ``later_time(i)`` giving its timestamp. The payment fits in
+    full wherever every balance from its release on stays at or above
+    buffer + amount, so the earliest full release is just after the
+    transaction following the last point below that bound.
+    """
+    amount = target_payment['amount_cents']
+    if target_payment['direction'] != 'OUT':
+        return _release_fields(amount, target_payment['timestamp_utc'])
+    bound = buffer_cents + amount
+    if np is not None and isinstance(later_balances, np.ndarray):
+        lowest = min(pre_balance, int(later_balances.min())) if later_balances.size else pre_balance
+        below = np.flatnonzero(later_balances < bound)
+        last = int(below[-1]) if below.size else None
+    else:
+        lowest = min(pre_balance, min(later_balances)) if later_balances else pre_balance
+        last = next((i for i in range(len(later_balances) - 1, -1, -1) if later_balances[i] < bound), None)
+    if last is None and pre_balance < bound:
+        last = -1
+    return _release_fields(
+        _max_releasable(amount, lowest, buffer_cents),
+        _earliest_release_time(target_payment, last, len(later_balances), later_time),
+    )
+
+
+def _earliest_release_time(target_payment: dict, last_blocking, later_count: int, later_time):
+    """Scheduled time if nothing blocks; else just after the next transaction (None if none is left)."""
+    if last_blocking is None:
+        return target_payment['timestamp_utc']
+    return later_time(last_blocking + 1) if last_blocking + 1 < later_count else None
+
+
+def _max_releasable(amount: int, lowest_balance: int, buffer_cents: int) -> int:
+    """Largest amount in cents that keeps ``lowest_balance`` at or above the buffer."""
+    return min(amount, max(lowest_balance - buffer_cents, 0))
+
+
+def _release_fields(max_releasable_cents: int, earliest_full_release_time: str) -> dict:
+    return {
+        "max_releasable_amount": from_cents(max_releasable_cents),
+        "earliest_full_release_time": earliest_full_release_time,
+    }
+
+
+def _release_result(
+    target_payment: dict,
+    timeline: AccountTimeline,
+    target_entity: str,
+    start_cents: int,
+    buffer_cents: int,
+    *,
+    min_balance: int,
+    min_balance_time: str,
+    first_breach_time: str,
+    breach_gap: int,
+    total_outflow: int,
+    total_inflow: int,
+    end_of_day_balance: int,
+    transaction_count: int,
+    top_beneficiaries: list[dict],
+    largest_single_payment: int,
+    anomalies: list[dict],
+    max_releasable_amount: float,
+    earliest_full_release_time: str,
+) -> dict:
+    """Assemble the result body shared by every engine; balances and flows come in as int cents."""
+    return {
+        "buffer_breach_risk": breach_risk(min_balance, min_balance_time, first_breach_time, breach_gap, buffer_cents),
+        "payment_context": {
+            "payment_id": target_payment['payment_id'],
+            "amount": target_payment['amount'],
+            "currency": timeline.currency,
+            "beneficiary": target_payment['beneficiary_name'],
+            "account_id": timeline.account_id,
+            "entity": target_entity,
+            "scheduled_time": target_payment['timestamp_utc'],
+        },
+        "account_summary": {
+            "start_of_day_balance": from_cents(start_cents),
+            "total_outflow": from_cents(total_outflow),
+            "total_inflow": from_cents(total_inflow),
+            "net_flow": from_cents(total_inflow - total_outflow),
+            "end_of_day_balance": from_cents(end_of_day_balance),
+            "transaction_count": transaction_count,
+        },
+        "concentration_analysis": {
+            "top_beneficiaries": top_beneficiaries,
+            "largest_single_payment": from_cents(largest_single_payment),
+        },
+        "anomalies": anomalies[:10],  # Limit to 10
+        "recommendation": recommendation(min_balance < buffer_cents, breach_gap, {
+            "max_releasable_amount": max_releasable_amount,
+            "earliest_full_release_time": earliest_full_release_time,
+        }),
+    }
+
+
+def breach_risk(min_balance: int, min_balance_time: str, first_breach_time: str,
+                breach_gap: int, buffer_cents: int) -> dict:
+    """The buffer_breach_risk block for a projected day (int cents in, amounts out)."""
+    breach = min_balance < buffer_cents
+    return {
+        "breach": breach,
+        "first_breach_time": first_breach_time,
+        "gap": from_cents(breach_gap) if breach else 0,
+        "projected_balance_min": from_cents(min_balance),
+        "min_balance_time": min_balance_time,
+        "buffer_threshold": from_cents(buffer_cents),
+        "headroom": from_cents(min_balance - buffer_cents),
+    }
+
+
+def recommendation(breach: bool, breach_gap: int, partial: dict) -> dict:
+    """HOLD/RELEASE recommendation with the partial release fields (see _release_fields)."""
+    return {
+        "action": "HOLD" if breach else "RELEASE",
+        "reason": f"Payment would breach buffer by ${from_cents(breach_gap):,.2f}" if breach else "Payment within buffer limits",
+        "alternatives": [
+            "Delay payment until inflows received",
+            "Request partial release",
+            "Escalate to treasury for funding",
+        ] if breach else [],
+        **partial,
+    }
+
+
+class _MinTree:
+    """Array-backed segment tree over a fixed list: range minimum and first-below search."""
+
+    def __init__(self, values: list):
+        self.n = len(values)
+        size = 1
+        while size < self.n:
+            size *= 2
+        self.size = size
+        tree = [float('inf')] * (2 * size)
+        tree[size:size + self.n] = values
+        for i in range(size - 1, 0, -1):
+            tree[i] = min(tree[2 * i], tree[2 * i + 1])
+        self.tree = tree
+
+    def range_min(self, lo: int, hi: int):
+        """Minimum of values[lo:hi] (inf when empty)."""
+        result = float('inf')
+        lo += self.size
+        hi += self.size
+        tree = self.tree
+        while lo < hi:
+            if lo & 1:
+                result = min(result, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = min(result, tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def first_below(self, lo: int, hi: int, bound, inclusive: bool = False):
+        """Smallest j in [lo, hi) with values[j] < bound (<= if inclusive), else None."""
+        if lo >= hi:
+            return None
+        return self._first_below(1, 0, self.size, lo, hi, bound, inclusive)
+
+    def _first_below(self, node, node_lo, node_hi, lo, hi, bound, inclusive):
+        if node_hi <= lo or hi <= node_lo:
+            return None
+        value = self.tree[node]
+        if value > bound or (value == bound and not inclusive):
+            return None
+        if node_hi - node_lo == 1:
+            return node_lo
+        mid = (node_lo + node_hi) // 2
+        found = self._first_below(2 * node, node_lo, mid, lo, hi, bound, inclusive)
+        if found is None:
+            found = self._first_below(2 * node + 1, mid, node_hi, lo, hi, bound, inclusive)
+        return found
+
+
+class AccountIndex:
+    """
+    Prefix-sum index over one account timeline.
+
+    Holds the sorted timestamps, the cumulative net flow (int cents) after each
+    transaction, its suffix running minimum and a min segment tree, plus the
+    aggregates the result needs (totals, beneficiary totals, anomalies). A
+    what-if release at time t then only shifts the cumulative flow from the
+    insertion point onwards, so the verdict, minimum balance and first breach
+    come from a bisect and O(log n) range queries instead of a full replay.
+    Independent of the starting balance, so one index serves every request
+    against the same snapshot.
+    """
+
+    def __init__(self, timeline: AccountTimeline):
+        self.timeline = timeline
+        txns = timeline.txns
+        self.timestamps = [txn['timestamp'] for txn in txns]
+        self.positions = {}
+
+        cumulative = []
+        flow = 0
+        total_outflow = 0
+        total_inflow = 0
+        beneficiary_totals = defaultdict(int)
+        beneficiary_first = {}  # beneficiary -> first two OUT positions
+        top_outflows = []  # two largest OUT amounts as (amount, position)
+        anomalies = []  # first 11 flagged transactions as (position, anomaly)
+        for i, txn in enumerate(txns):
+            self.positions.setdefault(txn['txn_id'], i)
+            amount = txn['cents']
+            if txn['direction'] == 'OUT':
+                flow -= amount
+                total_outflow += amount
+                beneficiary = txn['beneficiary']
+                beneficiary_totals[beneficiary] += amount
+                seen = beneficiary_first.setdefault(beneficiary, [])
+                if len(seen) < 2:
+                    seen.append(i)
+                top_outflows = sorted(top_outflows + [(amount, i)], key=lambda x: -x[0])[:2]
+            else:
+                flow += amount
+                total_inflow += amount
+            cumulative.append(flow)
+            if txn.get('alert_flag') and len(anomalies) < 11:
+                anomalies.append((i, {
+                    'txn_id': txn['txn_id'],
+                    'flag': txn['alert_flag'],
+                    'amount': txn['amount'],
+                    'beneficiary': txn['beneficiary'],
+                }))
+
+        suffix_min = cumulative[:]
+        for i in range(len(suffix_min) - 2, -1, -1):
+            if suffix_min[i + 1] < suffix_min[i]:
+                suffix_min[i] = suffix_min[i + 1]
+
+        self.cumulative = cumulative
+        self.suffix_min = suffix_min
+        self.tree = _MinTree(cumulative)
+        self.total_outflow = total_outflow
+        self.total_inflow = total_inflow
+        self.beneficiary_totals = dict(beneficiary_totals)
+        self.beneficiary_first = beneficiary_first
+        self.ranked_beneficiaries = sorted(
+            beneficiary_totals,
+            key=lambda b: (-beneficiary_totals[b], beneficiary_first[b][0]),
+        )
+        self.top_outflows = top_outflows
+        self.anomalies = anomalies
+
+    def __len__(self):
+        return len(self.cumulative)
+
+    def queued_position(self, txn_id: str):
+        """Timeline position of a QUEUED transaction, or None."""
+        position = self.positions.get(txn_id)
+        if position is not None and self.timeline.txns[position]['status'] == 'QUEUED':
+            return position
+        return None
+
+
+class LedgerIndex:
+    """
+    Lookup structures for one ledger snapshot.
+
+    Groups the ledger by account/currency and indexes payments by ID in one
+    pass; timelines and AccountIndex objects are then built lazily per slice
+    and reused for the lifetime of the snapshot.
+    """
+
+    def __init__(self, ledger: list[dict]):
+        self.ledger = ledger
+        self.by_id = {}
+        self._slices = defaultdict(list)
+        for txn in ledger:
+            self.by_id.setdefault(txn.get('txn_id'), txn)
+            self._slices[(txn['account_id'], txn['currency'])].append(txn)
+        self._timelines = {}
+        self._entity_timelines = {}
+        self._structures = {}
+
+    def timeline(self, account_id: str, currency: str) -> AccountTimeline:
+        key = (account_id, currency)
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            timeline = build_account_timeline(self._slices.get(key, []), account_id, currency)
+            timeline = self._timelines.setdefault(key, timeline)
+        return timeline
+
+    def entity_timeline(self, entity: str, currency: str, account_ids: list[str]) -> AccountTimeline:
+        """Merged timeline of several accounts of one entity/currency."""
+        key = (entity, currency, tuple(account_ids))
+        timeline = self._entity_timelines.get(key)
+        if timeline is None:
+            timeline = merge_account_timelines(
+                [self.timeline(account_id, currency) for account_id in account_ids], entity, currency)
+            timeline = self._entity_timelines.setdefault(key, timeline)
+        return timeline
+
+    def account_slice(self, engine: str, account_id: str, currency: str):
+        """The per-slice structure ``engine`` simulates on, built once and cached."""
+        return self._structure(engine, ("account", account_id, currency), self.timeline(account_id, currency))
+
+    def entity_slice(self, engine: str, entity: str, currency: str, account_ids: list[str]):
+        """As account_slice, over the merged timeline of an entity's accounts."""
+        return self._structure(engine, ("entity", entity, currency, tuple(account_ids)),
+                               self.entity_timeline(entity, currency, account_ids))
+
+    def apply_changes(self, ledger: list[dict], changed: list[dict]) -> "LedgerIndex":
+        """
+        Index for ``ledger``: this index's ledger with ``changed`` rows inserted or replaced.
+
+        Only the account/currency slices a changed row enters or leaves are
+        touched: their built timelines are copied with the row spliced in at
+        its time position, and their engine structures and merged entity
+        timelines are dropped to be rebuilt lazily. Every other slice shares
+        its timeline and structures with this index. The payment lookup is
+        not copied either: the changed rows shadow it in a ChainMap, flattened
+        into one dict every ``BY_ID_MAX_DEPTH`` deltas to bound lookup cost.
+        """
+        index = LedgerIndex.__new__(LedgerIndex)
+        index.ledger = ledger
+        overlay = {}
+        index._slices = defaultdict(list, self._slices)
+
+        changed_ids = set()
+        added = defaultdict(list)
+        for txn in changed:
+            previous = overlay.get(txn['txn_id']) or self.by_id.get(txn['txn_id'])
+            if previous is not None:
+                added.setdefault((previous['account_id'], previous['currency']), [])
+            overlay[txn['txn_id']] = txn
+            changed_ids.add(txn['txn_id'])
+            added[(txn['account_id'], txn['currency'])].append(txn)
+        maps = [overlay] + (self.by_id.maps if isinstance(self.by_id, ChainMap) else [self.by_id])
+        if len(maps) > BY_ID_MAX_DEPTH:
+            index.by_id = {}
+            for mapping in reversed(maps):
+                index.by_id.update(mapping)
+        else:
+            index.by_id = ChainMap(*maps)
+
+        index._timelines = dict(self._timelines)
+        for key, txns in added.items():
+            index._slices[key] = [txn for txn in self._slices.get(key, []) if txn['txn_id'] not in changed_ids] + txns
+            timeline = self._timelines.get(key)
+            if timeline is None:
+                continue
+            entries = [entry for entry in timeline.txns if entry['txn_id'] not in changed_ids]
+            for txn in txns:
+                entry = _timeline_entry(txn)
+                entries.insert(bisect_right(entries, timeline_order(entry), key=timeline_order), entry)
+            index._timelines[key] = AccountTimeline(key[0], key[1], entries)
+
+        def untouched(currency, account_ids):
+            return not any((account_id, currency) in added for account_id in account_ids)
+
+        index._entity_timelines = {
+            key: timeline for key, timeline in self._entity_timelines.items() if untouched(key[1], key[2])
+        }
+        index._structures = {
+            key: structure for key, structure in self._structures.items()
+            if (key[1] == "account" and (key[2], key[3]) not in added)
+            or (key[1] == "entity" and untouched(key[3], key[4]))
+        }
+        return index
+
+    def _structure(self, engine: str, key: tuple, timeline: AccountTimeline):
+        if engine == "replay":
+            return timeline
+        key = (engine,) + key
+        structure = self._structures.get(key)
+        if structure is None:
+            structure = self._structures.setdefault(key, _SLICE_TYPES[engine](timeline))
+        return structure
+
+
+def simulate_release_indexed(
+    target_payment: dict,
+    index: AccountIndex,
+    start_cents: int,
+    buffer_cents: int,
+    target_entity: str,
+    skip_txn_id: str = None,
+) -> dict:
+    """
+    Same result as simulate_release, answered from an AccountIndex.
+
+    The modified trajectory is the indexed one split into segments with a
+    constant offset each: everything before the insertion point
+    (unchanged), the target itself, and everything after it (net target
+    delta, with a skipped QUEUED transaction's amount added back). As in
+    simulate_release, a QUEUED target takes its own slot.
+    """
+    timeline = index.timeline
+    txns = timeline.txns
+    n = len(index)
+    cumulative = index.cumulative
+    tree = index.tree
+
+    amount = target_payment['amount_cents']
+    is_out = target_payment['direction'] == 'OUT'
+    delta = -amount if is_out else amount
+
+    skip = index.queued_position(skip_txn_id) if skip_txn_id else None
+    position = skip + 1 if skip is not None else bisect_right(index.timestamps, target_payment['timestamp_epoch'])
+
+    undo = 0
+    if skip is not None:
+        skipped = txns[skip]
+        undo = skipped['cents'] if skipped['direction'] == 'OUT' else -skipped['cents']
+
+    # (lo, hi, offset) segments over the cumulative flow, in trajectory order;
+    # the target point sits between them
+    before = [(0, skip if skip is not None else position, 0)]
+    after = (position, n, undo + delta)
+    flow_before_target = (cumulative[position - 1] if position else 0) + undo
+    target_balance = start_cents + flow_before_target + delta
+
+    # (balance_min, lo, hi, raw_min, offset) per segment
+    segments = []
+    for lo, hi, offset in before:
+        if lo < hi:
+            raw_min = tree.range_min(lo, hi)
+            segments.append((start_cents + raw_min + offset, lo, hi, raw_min, offset))
+    segments.append((target_balance, None, None, None, None))
+    lo, hi, offset = after
+    if lo < hi:
+        raw_min = index.suffix_min[lo]
+        segments.append((start_cents + raw_min + offset, lo, hi, raw_min, offset))
+
+    # Minimum balance and where it is first reached (only if below the start)
+    min_balance = start_cents
+    min_balance_time = None
+    for value, lo, hi, raw_min, _ in segments:
+        if value < min_balance:
+            min_balance = value
+            if lo is None:
+                min_balance_time = target_payment['timestamp_utc']
+            else:
+                min_balance_time = txns[tree.first_below(lo, hi, raw_min, inclusive=True)]['timestamp_str']
+
+    # First breach of the buffer, in trajectory order
+    first_breach_time = None
+    breach_gap = 0
+    for value, lo, hi, raw_min, offset in segments:
+        if value >= buffer_cents:
+            continue
+        if lo is None:
+            first_breach_time = target_payment['timestamp_utc']
+            breach_gap = buffer_cents - value
+            break
+        j = tree.first_below(lo, hi, buffer_cents - start_cents - offset)
+        first_breach_time = txns[j]['timestamp_str']
+        breach_gap = buffer_cents - (start_cents + cumulative[j] + offset)
+        break
+
+    # Aggregates: drop the skipped transaction, add the target
+    total_outflow = index.total_outflow
+    total_inflow = index.total_inflow
+    if skip is not None:
+        if txns[skip]['direction'] == 'OUT':
+            total_outflow -= txns[skip]['cents']
+        else:
+            total_inflow -= txns[skip]['cents']
+    if is_out:
+        total_outflow += amount
+    else:
+        total_inflow += amount
+
+    ranked = [b for b in index.ranked_beneficiaries[:6] if b != target_payment['beneficiary_name']]
+    ranking = [(b, index.beneficiary_totals[b], index.beneficiary_first[b][0]) for b in ranked]
+    beneficiary = target_payment['beneficiary_name']
+    if beneficiary in index.beneficiary_totals or is_out:
+        total = index.beneficiary_totals.get(beneficiary, 0)
+        first_seen = [i for i in index.beneficiary_first.get(beneficiary, []) if i != skip]
+        if skip is not None and txns[skip]['direction'] == 'OUT' and txns[skip]['beneficiary'] == beneficiary:
+            total -= txns[skip]['cents']
+        if is_out:
+            total += amount
+            first_seen.append(position - 0.5)  # inserted just before `position`
+        if first_seen:
+            ranking.append((beneficiary, total, min(first_seen)))
+    ranking.sort(key=lambda x: (-x[1], x[2]))
+    top_beneficiaries = [{'beneficiary': b, 'total_amount': from_cents(v)} for b, v, _ in ranking[:5]]
+
+    outflows = [a for a, i in index.top_outflows if i != skip]
+    if is_out:
+        outflows.append(amount)
+    largest_single_payment = max(outflows, default=0)
+
+    # Partial release: the balances without the target from the insertion point on are
+    # start + cumulative + undo; suffix_min is non-decreasing, so the points below a
+    # bound form a prefix of it and the last blocking point is a bisect away
+    if is_out:
+        pre_balance = start_cents + flow_before_target
+        lowest = pre_balance
+        if position < n:
+            lowest = min(lowest, start_cents + index.suffix_min[position] + undo)
+        bound = buffer_cents + amount
+        last = bisect_left(index.suffix_min, bound - start_cents - undo) - 1
+        if last >= position:
+            last -= position
+        else:
+            last = -1 if pre_balance < bound else None
+        partial = _release_fields(
+            _max_releasable(amount, lowest, buffer_cents),
+            _earliest_release_time(target_payment, last, n - position, lambda i: txns[position + i]['timestamp_str']),
+        )
+    else:
+        partial = _release_fields(amount, target_payment['timestamp_utc'])
+
+    return _release_result(
+        target_payment, timeline, target_entity, start_cents, buffer_cents,
+        min_balance=min_balance,
+        min_balance_time=min_balance_time,
+        first_breach_time=first_breach_time,
+        breach_gap=breach_gap,
+        total_outflow=total_outflow,
+        total_inflow=total_inflow,
+        end_of_day_balance=start_cents + (cumulative[-1] if n else 0) + undo + delta,
+        transaction_count=n - (1 if skip is not None else 0) + 1,
+        top_beneficiaries=top_beneficiaries,
+        largest_single_payment=largest_single_payment,
+        anomalies=[anomaly for i, anomaly in index.anomalies if i != skip],
+        **partial,
+    )
+
+
+class AccountColumns:
+    """
+    Columnar (NumPy) view of one account timeline.
+
+    Timestamps are int64 epoch seconds, amounts int64 cents (plus a signed
+    copy), and direction, status, alert flag and beneficiary are categorical codes,
+    so a simulation is a delete/insert plus ``cumsum`` and a few reductions.
+    """
+
+    def __init__(self, timeline: AccountTimeline):
+        _require_numpy()
+        self.timeline = timeline
+        txns = timeline.txns
+        self.txn_ids = [txn['txn_id'] for txn in txns]
+        self.timestamp_strs = [txn['timestamp_str'] for txn in txns]
+        self.timestamps = np.array([txn['timestamp'] for txn in txns], dtype=np.int64)
+        self.amounts = np.array([txn['cents'] for txn in txns], dtype=np.int64)
+        self.is_out = np.array([txn['direction'] == 'OUT' for txn in txns], dtype=bool)
+        self.signed = np.where(self.is_out, -self.amounts, self.amounts)
+        self.status_labels, self.status_codes = _categorize([txn['status'] for txn in txns])
+        self.alert_labels, self.alert_codes = _categorize([txn.get('alert_flag') or '' for txn in txns], first='')
+        self.beneficiary_labels, self.beneficiary_codes = _categorize([txn['beneficiary'] for txn in txns])
+        self._queued_code = self.status_labels.index('QUEUED') if 'QUEUED' in self.status_labels else -1
+        self.positions = {}
+        for i, txn_id in enumerate(self.txn_ids):
+            self.positions.setdefault(txn_id, i)
+
+    def __len__(self):
+        return len(self.txn_ids)
+
+    def queued_position(self, txn_id: str):
+        """Timeline position of a QUEUED transaction, or None."""
+        position = self.positions.get(txn_id)
+        if position is not None and self.status_codes[position] == self._queued_code:
+            return position
+        return None
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The numpy engine requires numpy (pip install numpy)")
+
+
+def _categorize(values: list, first: str = None) -> tuple:
+    """(labels, int32 codes) in order of first appearance; ``first`` is pinned to code 0."""
+    labels = [] if first is None else [first]
+    lookup = {label: code for code, label in enumerate(labels)}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(labels)
+            labels.append(value)
+        codes[i] = code
+    return labels, codes
+
+
+def simulate_release_numpy(
+    target_payment: dict,
+    columns: AccountColumns,
+    start_cents: int,
+    buffer_cents: int,
+    target_entity: str,
+    skip_txn_id: str = None,
+) -> dict:
+    """
+    Same result as simulate_release, computed on AccountColumns.
+
+    Amounts and balances are int64 cents, so ``cumsum`` and the reductions
+    are exact and agree with the other engines to the cent.
+    """
+    n = len(columns)
+    amount = target_payment['amount_cents']
+    is_out = target_payment['direction'] == 'OUT'
+    beneficiary = target_payment['beneficiary_name']
+
+    skip = columns.queued_position(skip_txn_id) if skip_txn_id else None
+    if skip is not None:
+        position = skip + 1
+    else:
+        position = int(np.searchsorted(columns.timestamps, target_payment['timestamp_epoch'], side='right'))
+
+    keep = np.ones(n, dtype=bool)
+    if skip is not None:
+        keep[skip] = False
+    # Position of the target within the kept rows
+    insert_at = position - (1 if skip is not None and skip < position else 0)
+
+    signed = np.insert(columns.signed[keep], insert_at, -amount if is_out else amount)
+    amounts = np.insert(columns.amounts[keep], insert_at, amount)
+    out_mask = np.insert(columns.is_out[keep], insert_at, is_out)
+    kept_rows = np.flatnonzero(keep)
+    rows = np.insert(kept_rows, insert_at, -1)  # -1 marks the target
+
+    balances = start_cents + np.cumsum(signed)
+    # Without the target, for the partial release figures
+    base_balances = np.cumsum(np.concatenate(([start_cents], columns.signed[keep])))
+
+    def time_at(i):
+        row = rows[i]
+        return target_payment['timestamp_utc'] if row < 0 else columns.timestamp_strs[row]
+
+    # Minimum balance (first occurrence, only if below the start)
+    min_balance = start_cents
+    min_balance_time = None
+    lowest = int(np.argmin(balances))
+    if balances[lowest] < start_cents:
+        min_balance = int(balances[lowest])
+        min_balance_time = time_at(lowest)
+
+    # First breach
+    first_breach_time = None
+    breach_gap = 0
+    below = np.flatnonzero(balances < buffer_cents)
+    if below.size:
+        first_breach_time = time_at(int(below[0]))
+        breach_gap = buffer_cents - int(balances[below[0]])
+
+    out_amounts = amounts[out_mask]
+    total_outflow = int(out_amounts.sum())
+    total_inflow = int(amounts.sum()) - total_outflow
+
+    # Beneficiary concentration: exact int64 totals per beneficiary code
+    labels = columns.beneficiary_labels
+    target_code = labels.index(beneficiary) if beneficiary in labels else len(labels)
+    codes = np.insert(columns.beneficiary_codes[keep], insert_at, target_code)
+    out_codes = codes[out_mask]
+    totals = np.zeros(len(labels) + 1, dtype=np.int64)
+    np.add.at(totals, out_codes, out_amounts)
+    present, first_seen = np.unique(out_codes, return_index=True)
+    ranked = sorted(
+        ((int(totals[code]), int(first), int(code)) for code, first in zip(present, first_seen)),
+        key=lambda x: (-x[0], x[1]),
+    )[:5]
+    top_beneficiaries = [
+        {'beneficiary': labels[code] if code < len(labels) else beneficiary, 'total_amount': from_cents(total)}
+        for total, _, code in ranked
+    ]
+
+    anomalies = []
+    for row in np.flatnonzero(columns.alert_codes[keep] != 0)[:10]:
+        row = int(kept_rows[row])
+        anomalies.append({
+            'txn_id': columns.txn_ids[row],
+            'flag': columns.alert_labels[columns.alert_codes[row]],
+            'amount': from_cents(int(columns.amounts[row])),
+            'beneficiary': labels[columns.beneficiary_codes[row]],
+        })
+
+    return _release_result(
+        target_payment, columns.timeline, target_entity, start_cents, buffer_cents,
+        min_balance=min_balance,
+        min_balance_time=min_balance_time,
+        first_breach_time=first_breach_time,
+        breach_gap=breach_gap,
+        total_outflow=total_outflow,
+        total_inflow=total_inflow,
+        end_of_day_balance=int(balances[-1]),
+        transaction_count=int(balances.size),
+        top_beneficiaries=top_beneficiaries,
+        largest_single_payment=int(out_amounts.max()) if out_amounts.size else 0,
+        anomalies=anomalies,
+        **_partial_release(
+            target_payment, buffer_cents, int(base_balances[insert_at]), base_balances[insert_at + 1:],
+            lambda i: columns.timestamp_strs[kept_rows[insert_at + i]],
+        ),
+    )
+
+
+_SLICE_TYPES = {"index": AccountIndex, "numpy": AccountColumns}
+_SIMULATORS = {"replay": simulate_release, "index": simulate_release_indexed, "numpy": simulate_release_numpy}
+
+
+def engine_slice(engine: str, timeline: AccountTimeline):
+    """Build the per-slice structure ``engine`` simulates on from a timeline."""
+    return timeline if engine == "replay" else _SLICE_TYPES[engine](timeline)
+
+
+# Balance trajectory options: "none", "breach_window", "downsample=N", "full"
+TRAJECTORY_MODES = ("none", "breach_window", "downsample", "full")
+BREACH_WINDOW_POINTS = 3  # points kept either side of the minimum and the first breach
+
+
+def parse_trajectory_option(value) -> tuple:
+    """Parse a trajectory request option into (mode, points); None means "none"."""
+    if value is None or value == "":
+        return "none", None
+    mode, _, points = str(value).strip().lower().partition("=")
+    if mode not in TRAJECTORY_MODES:
+        raise ValueError(f"Unknown trajectory option '{value}', expected none, breach_window, downsample=N or full")
+    if mode != "downsample":
+        if points:
+            raise ValueError(f"Trajectory option '{mode}' takes no value")
+        return mode, None
+    try:
+        points = int(points)
+    except ValueError:
+        raise ValueError("Trajectory option downsample needs a point count, e.g. downsample=200") from None
+    if points < 2:
+        raise ValueError("Trajectory option downsample needs at least 2 points")
+    return mode, points
+
+
+def iter_release_order(target_payment: dict, timeline: AccountTimeline, skip_txn_id: str = None):
+    """
+    Yield (timestamp_str, txn_id, cents, direction, account_id, is_target) in simulated order.
+
+    Orders the day exactly as simulate_release does: the target in place of
+    a QUEUED ``skip_txn_id``, otherwise after anything at its timestamp.
+    """
+    target_timestamp = target_payment['timestamp_epoch']
+    target = (target_payment['timestamp_utc'], target_payment['payment_id'], target_payment['amount_cents'],
+              target_payment['direction'], target_payment['account_id'], True)
+    target_pending = True
+    for txn in timeline.txns:
+        if skip_txn_id and txn['txn_id'] == skip_txn_id and txn['status'] == 'QUEUED':
+            if target_pending:
+                target_pending = False
+                yield target
+            continue
+        if target_pending and txn['timestamp'] > target_timestamp:
+            target_pending = False
+            yield target
+        yield txn['timestamp_str'], txn['txn_id'], txn['cents'], txn['direction'], txn['account_id'], False
+    if target_pending:
+        yield target
+
+
+def iter_balance_trajectory(
+    target_payment: dict,
+    timeline: AccountTimeline,
+    start_cents: int,
+    skip_txn_id: str = None,
+):
+    """
+    Yield the balance after every transaction with the target payment released.
+
+    Points line up with the breach verdict of any engine.
+    """
+    balance = start_cents
+    for index, (timestamp, txn_id, amount, direction, _, is_target) in enumerate(
+            iter_release_order(target_payment, timeline, skip_txn_id)):
+        balance = _apply(balance, direction, amount)
+        yield _trajectory_point(index, timestamp, txn_id, amount, direction, balance, is_target)
+
+
+def entity_contributions(
+    target_payment: dict,
+    timeline: AccountTimeline,
+    account_balances: dict,
+    start_cents: int,
+    skip_txn_id: str = None,
+) -> list[dict]:
+    """
+    Per-account breakdown of an entity-level simulation on a merged timeline.
+
+    Each account's flows, own minimum and its balance at the moment the
+    entity-wide balance bottoms out, so the accounts driving a breach stand out.
+    ``account_balances`` maps account to starting balance in cents.
+    """
+    events = list(iter_release_order(target_payment, timeline, skip_txn_id))
+
+    # Pass 1: position of the entity-wide minimum (first occurrence, as the engines report it)
+    balance = min_balance = start_cents
+    min_index = None
+    for i, (_, _, amount, direction, _, _) in enumerate(events):
+        balance = _apply(balance, direction, amount)
+        if balance < min_balance:
+            min_balance, min_index = balance, i
+
+    # Pass 2: per-account running balances
+    accounts = {
+        account_id: {'start': start, 'balance': start, 'min': start, 'at_entity_min': start,
+                     'inflow': 0, 'outflow': 0, 'target': False}
+        for account_id, start in account_balances.items()
+    }
+    for i, (_, _, amount, direction, account_id, is_target) in enumerate(events):
+        account = accounts[account_id]
+        account['balance'] = _apply(account['balance'], direction, amount)
+        account['outflow' if direction == 'OUT' else 'inflow'] += amount
+        account['min'] = min(account['min'], account['balance'])
+        account['target'] = account['target'] or is_target
+        if i == min_index:
+            for state in accounts.values():
+                state['at_entity_min'] = state['balance']
+
+    return [
+        {
+            "account_id": account_id,
+            "start_of_day_balance": from_cents(state['start']),
+            "total_inflow": from_cents(state['inflow']),
+            "total_outflow": from_cents(state['outflow']),
+            "net_flow": from_cents(state['inflow'] - state['outflow']),
+            "end_of_day_balance": from_cents(state['balance']),
+            "projected_balance_min": from_cents(state['min']),
+            "balance_at_entity_min": from_cents(state['at_entity_min']),
+            "includes_target_payment": state['target'],
+        }
+        for account_id, state in accounts.items()
+    ]
+
+
+def _apply(balance: int, direction: str, amount: int) -> int:
+    return balance - amount if direction == 'OUT' else balance + amount
+
+
+def _trajectory_point(index, timestamp, txn_id, cents, direction, balance, is_target) -> dict:
+    # The balance in cents rides along under "_balance" for point selection
+    return {
+        'index': index,
+        'timestamp': timestamp,
+        'txn_id': txn_id,
+        'amount': from_cents(cents),
+        'direction': direction,
+        'balance_after': from_cents(balance),
+        'is_target_payment': is_target,
+        '_balance': balance,
+    }
+
+
+def select_trajectory(points: list[dict], mode: str, limit: int, start_cents: int,
+                      buffer_cents: int) -> list[dict]:
+    """
+    Reduce a full trajectory to the points ``mode`` asks for.
+
+    breach_window keeps BREACH_WINDOW_POINTS either side of the minimum balance
+    and the first breach; downsample keeps the minimum and maximum of ``limit``/2
+    equal buckets, so no dip below the buffer is smoothed away. Both always keep
+    the target payment's point.
+    """
+    if mode == "full" or not points:
+        keep = range(len(points))
+    else:
+        keep = {i for i, p in enumerate(points) if p['is_target_payment']}
+        if mode == "breach_window":
+            anchors = []
+            min_balance = start_cents
+            min_index = None
+            for i, p in enumerate(points):
+                if p['_balance'] < min_balance:
+                    min_balance, min_index = p['_balance'], i
+            if min_index is not None:
+                anchors.append(min_index)
+            first_breach = next((i for i, p in enumerate(points) if p['_balance'] < buffer_cents), None)
+            if first_breach is not None:
+                anchors.append(first_breach)
+            for anchor in anchors:
+                keep.update(range(max(0, anchor - BREACH_WINDOW_POINTS),
+                                  min(len(points), anchor + BREACH_WINDOW_POINTS + 1)))
+        elif len(points) <= limit:
+            keep = range(len(points))
+        else:
+            buckets = max(1, limit // 2)
+            for b in range(buckets):
+                lo, hi = b * len(points) // buckets, (b + 1) * len(points) // buckets
+                bucket = range(lo, hi)
+                keep.add(min(bucket, key=lambda i: points[i]['_balance']))
+                keep.add(max(bucket, key=lambda i: points[i]['_balance']))
+        keep = sorted(keep)
+    return [{k: v for k, v in points[i].items() if k != '_balance'} for i in keep]
+
+
+def ndjson_lines(result: dict):
+    """
+    Yield a result as NDJSON: the result without trajectory points first, then one point per line.
+    """
+    trajectory = result.get("balance_trajectory")
+    points = trajectory.get("points", []) if trajectory else []
+    header = dict(result)
+    if trajectory:
+        header["balance_trajectory"] = {k: v for k, v in trajectory.items() if k != "points"}
+    yield json.dumps(header, separators=(',', ':')) + "\n"
+    for point in points:
+        yield json.dumps(point, separators=(',', ':')) + "\n"
+
+
+def compute_liquidity_impact(
+    ledger: list[dict],
+    balances: list[dict],
+    buffers: list[dict],
+    payment_id: str = None,
+    hypothetical_payment: dict = None,
+    entity_filter: str = None,
+    currency_filter: str = None,
+    audit_context: dict = None,
+    engine: str = "replay",
+    ledger_index: LedgerIndex = None,
+    trajectory: str = None,
+    aggregation: str = "account",
+) -> dict:
+    """
+    Core liquidity computation.
+
+    Args:
+        ledger: Today's transactions
+        balances: Starting balances per account/currency
+        buffers: Buffer thresholds per entity/currency
+        payment_id: ID of payment to simulate releasing (from ledger)
+        hypothetical_payment: Hypothetical payment to simulate
+        entity_filter: Filter to specific entity
+        currency_filter: Filter to specific currency
+        audit_context: Extra fields merged into the audit block (the caller's data_source, load_mode)
+        engine: Simulation engine, one of ENGINES
+        ledger_index: Prebuilt LedgerIndex for this ledger, reused across calls
+        trajectory: Balance trajectory to include: "none" (default), "breach_window",
+            "downsample=N" or "full"
+        aggregation: "account" (default) or "entity" to check the buffer against
+            the merged timeline of every account of the entity/currency
+
+    Returns:
+        Structured result with breach verdict and evidence
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}")
+    trajectory_mode, trajectory_points = parse_trajectory_option(trajectory)
+
+    run_id = str(uuid.uuid4())[:8]
+    timestamp_utc = datetime.utcnow().isoformat() + "Z"
+
+    # Find the target payment
+    target_payment = None
+    if payment_id:
+        if ledger_index is not None:
+            txn = ledger_index.by_id.get(payment_id)
+            target_payment = target_from_ledger(txn) if txn else None
+        else:
+            for txn in ledger:
+                if txn.get('txn_id') == payment_id:
+                    target_payment = target_from_ledger(txn)
+                    break
+        if not target_payment:
+            return {
+                "error": f"Payment {payment_id} not found in ledger",
+                "audit": {"run_id": run_id, "timestamp_utc": timestamp_utc}
+            }
+    elif hypothetical_payment:
+        target_payment = target_from_hypothetical(hypothetical_payment)
+    else:
+        return {
+            "error": "Either payment_id or hypothetical_payment must be provided",
+            "audit": {"run_id": run_id, "timestamp_utc": timestamp_utc}
+        }
+
+    # Determine filters from target payment
+    target_entity = entity_filter or target_payment['entity']
+    target_currency = currency_filter or target_payment['currency']
+    target_account = target_payment['account_id']
+
+    buffer_cents, cutoff_time = find_buffer_cents(buffers, target_entity, target_currency)
+
+    if aggregation == "entity":
+        # Every account of the entity/currency, merged into one timeline
+        account_balances = find_entity_cents(balances, target_entity, target_currency, target_account)
+        account_ids = list(account_balances)
+        start_cents = sum(account_balances.values())
+        if ledger_index is not None:
+            timeline = ledger_index.entity_timeline(target_entity, target_currency, account_ids)
+            account_slice = ledger_index.entity_slice(engine, target_entity, target_currency, account_ids)
+        else:
+            timelines = build_account_timelines(ledger, {(account_id, target_currency) for account_id in account_ids})
+            timeline = merge_account_timelines(
+                [timelines[(account_id, target_currency)] for account_id in account_ids], target_entity, target_currency)
+            account_slice = engine_slice(engine, timeline)
+    else:
+        # Starting balance and slice of the target account/currency (cached per snapshot when indexed)
+        start_cents = find_starting_cents(balances, target_account, target_currency)
+        if ledger_index is not None:
+            timeline = ledger_index.timeline(target_account, target_currency)
+            account_slice = ledger_index.account_slice(engine, target_account, target_currency)
+        else:
+            timeline = build_account_timeline(ledger, target_account, target_currency)
+            account_slice = engine_slice(engine, timeline)
+
+    result = _SIMULATORS[engine](
+        target_payment, account_slice, start_cents, buffer_cents, target_entity,
+        skip_txn_id=payment_id,
+    )
+
+    if aggregation == "entity":
+        result["payment_context"]["account_id"] = target_account
+        result["entity_view"] = {
+            "entity": target_entity,
+            "currency": target_currency,
+            "account_count": len(account_ids),
+            "accounts": entity_contributions(
+                target_payment, timeline, account_balances, start_cents, payment_id),
+        }
+
+    if trajectory_mode != "none":
+        points = list(iter_balance_trajectory(target_payment, timeline, start_cents, payment_id))
+        selected = select_trajectory(points, trajectory_mode, trajectory_points, start_cents, buffer_cents)
+        result["balance_trajectory"] = {
+            "mode": trajectory_mode if trajectory_points is None else f"{trajectory_mode}={trajectory_points}",
+            "total_points": len(points),
+            "returned_points": len(selected),
+            "points": selected,
+        }
+
+    result["audit"] = {
+        "run_id": run_id,
+        "timestamp_utc": timestamp_utc,
+        "data_snapshot": {
+            "ledger_rows": len(ledger),
+            "balance_rows": len(balances),
+            "buffer_rules": len(buffers),
+        },
+        "cutoff_time": cutoff_time,
+        "engine": engine,
+        "aggregation": aggregation,
+        "version": ENGINE_VERSION,
+        **(audit_context or {}),
+    }
+
+    return result
+
+
+def _batch_verdict(result: dict) -> dict:
+    """Compact per-payment verdict from a full simulation result."""
+    risk = result["buffer_breach_risk"]
+    context = result["payment_context"]
+    return {
+        "payment_id": context["payment_id"],
+        "account_id": context["account_id"],
+        "entity": context["entity"],
+        "currency": context["currency"],
+        "amount": context["amount"],
+        "scheduled_time": context["scheduled_time"],
+        "action": result["recommendation"]["action"],
+        "breach": risk["breach"],
+        "first_breach_time": risk["first_breach_time"],
+        "gap": risk["gap"],
+        "headroom": risk["headroom"],
+        "projected_balance_min": risk["projected_balance_min"],
+        "max_releasable_amount": result["recommendation"]["max_releasable_amount"],
+        "earliest_full_release_time": result["recommendation"]["earliest_full_release_time"],
+    }
+
+
+def _evaluate_slice(task: tuple) -> list[tuple]:
+    """Simulate every candidate that shares one account/currency slice."""
+    account_slice, candidates, detail, engine = task
+    simulate = _SIMULATORS[engine]
+    results = []
+    for index, target, skip_txn_id, start_cents, buffer_cents, cutoff_time, entity in candidates:
+        result = simulate(target, account_slice, start_cents, buffer_cents, entity, skip_txn_id)
+        if detail == "full":
+            result["cutoff_time"] = cutoff_time
+        else:
+            result = _batch_verdict(result)
+        results.append((index, result))
+    return results
+
+
+def compute_liquidity_impact_batch(
+    ledger: list[dict],
+    balances: list[dict],
+    buffers: list[dict],
+    payment_ids: list[str] = None,
+    hypothetical_payments: list[dict] = None,
+    entity_filter: str = None,
+    currency_filter: str = None,
+    detail: str = "verdict",
+    max_workers: int = None,
+    executor: str = "thread",
+    audit_context: dict = None,
+    engine: str = "index",
+    ledger_index: LedgerIndex = None,
+) -> dict:
+    """
+    Evaluate many payments in one call.
+
+    Each distinct account/currency slice is filtered and sorted once and the
+    resulting per-engine structure (timeline, AccountIndex or AccountColumns)
+    is shared by every candidate in it. Slices are fanned out across a thread or process
+    pool when ``max_workers`` > 1.
+
+    Args:
+        ledger, balances, buffers: As for compute_liquidity_impact
+        payment_ids: Ledger transaction IDs to simulate releasing
+        hypothetical_payments: Hypothetical payments to simulate
+        entity_filter, currency_filter: Applied to every candidate
+        detail: "verdict" for compact per-payment verdicts, "full" for full results
+        max_workers: Pool size; None or 1 evaluates inline
+        executor: "thread" or "process"
+        audit_context: Extra fields merged into the audit block (the caller's data_source, load_mode)
+        engine: Simulation engine, one of ENGINES
+        ledger_index: Prebuilt LedgerIndex for this ledger, reused across calls
+
+    Returns:
+        Per-payment results in request order plus a summary
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if detail not in DETAILS:
+        raise ValueError(f"Unknown detail '{detail}', expected one of {DETAILS}")
+
+    run_id = str(uuid.uuid4())[:8]
+    timestamp_utc = datetime.utcnow().isoformat() + "Z"
+
+    if ledger_index is not None:
+        ledger_by_id = ledger_index.by_id
+    else:
+        ledger_by_id = {txn.get('txn_id'): txn for txn in ledger} if payment_ids else {}
+
+    # Resolve targets, keeping request order
+    results = []
+    candidates_by_slice = defaultdict(list)
+    requests = [(pid, None) for pid in payment_ids or []] + [(None, hp) for hp in hypothetical_payments or []]
+    for index, (payment_id, hypothetical_payment) in enumerate(requests):
+        if payment_id:
+            txn = ledger_by_id.get(payment_id)
+            if txn is None:
+                results.append({"payment_id": payment_id, "error": f"Payment {payment_id} not found in ledger"})
+                continue
+            target = target_from_ledger(txn)
+        else:
+            try:
+                target = target_from_hypothetical(hypothetical_payment)
+            except (KeyError, TypeError, ValueError) as e:
+                results.append({
+                    "payment_id": (hypothetical_payment or {}).get('payment_id', 'HYPOTHETICAL'),
+                    "error": f"Invalid hypothetical payment: {e}",
+                })
+                continue
+        results.append(None)
+
+        entity = entity_filter or target['entity']
+        currency = currency_filter or target['currency']
+        account_id = target['account_id']
+        buffer_cents, cutoff_time = find_buffer_cents(buffers, entity, currency)
+        candidates_by_slice[(account_id, currency)].append((
+            index, target, payment_id,
+            find_starting_cents(balances, account_id, currency), buffer_cents, cutoff_time, entity,
+        ))
+
+    if ledger_index is not None:
+        slices = {key: ledger_index.account_slice(engine, *key) for key in candidates_by_slice}
+    else:
+        timelines = build_account_timelines(ledger, set(candidates_by_slice))
+        slices = {key: engine_slice(engine, timeline) for key, timeline in timelines.items()}
+    tasks = [(slices[key], candidates, detail, engine) for key, candidates in candidates_by_slice.items()]
+
+    if max_workers and max_workers > 1 and len(tasks) > 1:
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        with pool_class(max_workers=max_workers) as pool:
+            evaluated = list(pool.map(_evaluate_slice, tasks))
+    else:
+        evaluated = [_evaluate_slice(task) for task in tasks]
+
+    for slice_results in evaluated:
+        for index, result in slice_results:
+            results[index] = result
+
+    evaluated_results = [r for r in results if "error" not in r]
+    hold_count = sum(1 for r in evaluated_results if _action(r) == "HOLD")
+
+    return {
+        "results": results,
+        "summary": {
+            "requested": len(requests),
+            "evaluated": len(evaluated_results),
+            "errors": len(results) - len(evaluated_results),
+            "hold": hold_count,
+            "release": len(evaluated_results) - hold_count,
+            "account_slices": len(tasks),
+        },
+        "audit": {
+            "run_id": run_id,
+            "timestamp_utc": timestamp_utc,
+            "data_snapshot": {
+                "ledger_rows": len(ledger),
+                "balance_rows": len(balances),
+                "buffer_rules": len(buffers),
+            },
+            "executor": executor if max_workers and max_workers > 1 else "inline",
+            "max_workers": max_workers,
+            "engine": engine,
+            "version": ENGINE_VERSION,
+            **(audit_context or {}),
+        },
+    }
+
+
+def _action(result: dict) -> str:
+    if "recommendation" in result:
+        return result["recommendation"]["action"]
+    return result["action"]
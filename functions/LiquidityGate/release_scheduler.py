@@ -0,0 +1,401 @@
+"""
+Release Scheduler
+=================
+Proposes release times for the QUEUED / PENDING_APPROVAL backlog.
+
+For each account/currency the day is replayed without the backlog, giving
+the balance after every booked transaction. Releasing a payment at time t
+lowers every balance from t onwards by its amount, which is a suffix range
+add on a lazy min segment tree. The earliest time a payment fits is just
+after the last point that would otherwise dip below the buffer, found in
+O(log n) by descending the tree. Payments are placed greedily by priority.
+
+Because the balance curve only gets more permissive later in the day, any
+set of payments releasable before the cutoff is also releasable all at the
+cutoff. That makes "release the most value by cutoff" a subset-sum problem
+over the headroom at the cutoff. For the "value" objective it is solved
+with a bitset and used when it beats the greedy choice.
+"""
+
+import math
+import uuid
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import reduce
+from math import gcd
+
+from liquidity_engine import (
+    _EPOCH,
+    ENGINE_VERSION,
+    LedgerIndex,
+    build_account_timelines,
+    find_buffer_cents,
+    find_starting_cents,
+    from_cents,
+    to_cents,
+    txn_cents,
+    txn_epoch,
+)
+
+RELEASABLE_STATUSES = ("QUEUED", "PENDING_APPROVAL")
+OBJECTIVES = ("priority", "value", "count")
+
+# Subset-sum resolution: the cutoff headroom is split into at most this many units
+KNAPSACK_UNITS = 1 << 16
+
+
+class _LazyMinTree:
+    """Min segment tree with lazy range add and a last-below search."""
+
+    def __init__(self, values: list):
+        self.n = len(values)
+        size = 1
+        while size < self.n:
+            size *= 2
+        self.size = size
+        self.tree = [float('inf')] * (2 * size)
+        self.lazy = [0] * (2 * size)
+        self.tree[size:size + self.n] = values
+        for i in range(size - 1, 0, -1):
+            self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def add(self, lo: int, hi: int, delta: float):
+        """Add ``delta`` to every value in [lo, hi)."""
+        if lo < hi:
+            self._add(1, 0, self.size, lo, hi, delta)
+
+    def _add(self, node, node_lo, node_hi, lo, hi, delta):
+        if hi <= node_lo or node_hi <= lo:
+            return
+        if lo <= node_lo and node_hi <= hi:
+            self.tree[node] += delta
+            self.lazy[node] += delta
+            return
+        mid = (node_lo + node_hi) // 2
+        self._add(2 * node, node_lo, mid, lo, hi, delta)
+        self._add(2 * node + 1, mid, node_hi, lo, hi, delta)
+        self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1]) + self.lazy[node]
+
+    def range_min(self, lo: int, hi: int) -> float:
+        """Minimum over [lo, hi) (inf when empty)."""
+        return self._min(1, 0, self.size, lo, hi) if lo < hi else float('inf')
+
+    def _min(self, node, node_lo, node_hi, lo, hi):
+        if hi <= node_lo or node_hi <= lo:
+            return float('inf')
+        if lo <= node_lo and node_hi <= hi:
+            return self.tree[node]
+        mid = (node_lo + node_hi) // 2
+        return min(self._min(2 * node, node_lo, mid, lo, hi),
+                   self._min(2 * node + 1, mid, node_hi, lo, hi)) + self.lazy[node]
+
+    def last_below(self, lo: int, hi: int, bound: float):
+        """Largest index in [lo, hi) whose value is < ``bound``, or None."""
+        if lo >= hi:
+            return None
+        return self._last_below(1, 0, self.size, lo, hi, bound)
+
+    def _last_below(self, node, node_lo, node_hi, lo, hi, bound):
+        # Values below this node carry the lazy adds of its ancestors, folded into bound
+        if hi <= node_lo or node_hi <= lo or self.tree[node] >= bound:
+            return None
+        if node_hi - node_lo == 1:
+            return node_lo
+        bound -= self.lazy[node]
+        mid = (node_lo + node_hi) // 2
+        found = self._last_below(2 * node + 1, mid, node_hi, lo, hi, bound)
+        if found is None:
+            found = self._last_below(2 * node, node_lo, mid, lo, hi, bound)
+        return found
+
+
+def _format_epoch(epoch: int) -> str:
+    return (_EPOCH + timedelta(seconds=epoch)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _cutoff_epoch(cutoff_time: str, day_epoch: int):
+    """Epoch of an HH:MM cutoff on the day containing ``day_epoch`` (None if no cutoff)."""
+    if not cutoff_time:
+        return None
+    hours, minutes = (int(part) for part in str(cutoff_time).split(':')[:2])
+    return day_epoch - day_epoch % 86400 + hours * 3600 + minutes * 60
+
+
+def _subset_sum(amounts: list[int], capacity: int) -> list[int]:
+    """
+    Indices of a subset of ``amounts`` (int cents) with the largest total not above ``capacity``.
+
+    Works in units of the amounts' common divisor when that keeps the
+    capacity within KNAPSACK_UNITS, which is exact; otherwise amounts are
+    rounded up and the capacity down to KNAPSACK_UNITS units, so the chosen
+    subset always fits. Reachable totals are a Python int bitset; ``first``
+    records which item first reached each total for backtracking.
+    """
+    if capacity <= 0:
+        return []
+    divisor = reduce(gcd, amounts, 0)
+    unit = divisor if divisor and capacity // divisor <= KNAPSACK_UNITS else -(-capacity // KNAPSACK_UNITS)
+    limit = capacity // unit
+    weights = [-(-amount // unit) for amount in amounts]
+    mask = (1 << (limit + 1)) - 1
+    reachable = 1
+    first = {}
+    for i, weight in enumerate(weights):
+        if weight > limit:
+            continue
+        new = ((reachable << weight) & mask) & ~reachable
+        while new:
+            low = new & -new
+            first[low.bit_length() - 1] = i
+            new ^= low
+        reachable |= (reachable << weight) & mask
+    total = reachable.bit_length() - 1
+    chosen = []
+    while total > 0:
+        i = first[total]
+        chosen.append(i)
+        total -= weights[i]
+    return chosen
+
+
+def schedule_account(
+    base_txns: list[dict],
+    candidates: list[dict],
+    start_cents: int,
+    buffer_cents: int,
+    cutoff_time: str,
+    objective: str = "priority",
+) -> tuple[list[dict], dict]:
+    """
+    Schedule the backlog of one account/currency.
+
+    ``base_txns`` is the time-sorted timeline without the backlog; each
+    candidate carries payment_id, amount, cents, timestamp_epoch, timestamp_utc
+    and priority. Balances are int cents. Returns (per-payment decisions,
+    account summary).
+    """
+    timestamps = [txn['timestamp'] for txn in base_txns]
+    points = [start_cents]
+    balance = start_cents
+    for txn in base_txns:
+        balance = balance - txn['cents'] if txn['direction'] == 'OUT' else balance + txn['cents']
+        points.append(balance)
+    tree = _LazyMinTree(points)
+    n_points = len(points)
+
+    day_epoch = min([c['timestamp_epoch'] for c in candidates] + timestamps[:1])
+    cutoff = _cutoff_epoch(cutoff_time, day_epoch)
+    # Releases may happen after any booked transaction at or before the cutoff
+    last_position = bisect_right(timestamps, cutoff) if cutoff is not None else len(timestamps)
+
+    if objective == "value":
+        order = sorted(range(len(candidates)), key=lambda i: (-candidates[i]['cents'], candidates[i]['timestamp_epoch']))
+    elif objective == "count":
+        order = sorted(range(len(candidates)), key=lambda i: (candidates[i]['cents'], candidates[i]['timestamp_epoch']))
+    else:
+        order = sorted(range(len(candidates)), key=lambda i: (-candidates[i]['priority'], candidates[i]['timestamp_epoch']))
+
+    solver = "greedy"
+    if objective == "value":
+        # Any releasable set fits under the headroom left at the cutoff
+        capacity = tree.range_min(last_position, n_points) - buffer_cents
+        eligible = [i for i in order if cutoff is None or candidates[i]['timestamp_epoch'] <= cutoff]
+        greedy_total = _greedy_total([candidates[i]['cents'] for i in eligible], capacity)
+        chosen = {eligible[j] for j in _subset_sum([candidates[i]['cents'] for i in eligible], capacity)}
+        if sum(candidates[i]['cents'] for i in chosen) > greedy_total:
+            order = [i for i in order if i in chosen] + [i for i in order if i not in chosen]
+            solver = "knapsack"
+
+    decisions = [None] * len(candidates)
+    for i in order:
+        candidate = candidates[i]
+        amount = candidate['cents']
+        earliest = bisect_right(timestamps, candidate['timestamp_epoch'])
+        release_at = None
+        if cutoff is None or candidate['timestamp_epoch'] <= cutoff:
+            # Last point from the earliest slot on that the payment would push below the buffer
+            blocking = tree.last_below(earliest, n_points, buffer_cents + amount)
+            position = earliest if blocking is None else blocking + 1
+            if position <= last_position:
+                release_at = position
+        if release_at is None:
+            decisions[i] = _decision(candidate, None, "HOLD")
+            continue
+        tree.add(release_at, n_points, -amount)
+        if release_at == earliest:
+            decisions[i] = _decision(candidate, candidate['timestamp_epoch'], "RELEASE")
+        else:
+            decisions[i] = _decision(candidate, timestamps[release_at - 1], "RELEASE_DELAYED")
+
+    released = [d for d in decisions if d['action'] != "HOLD"]
+    held = [d for d in decisions if d['action'] == "HOLD"]
+    return decisions, {
+        "candidates": len(candidates),
+        "released": len(released),
+        "released_amount": from_cents(sum(to_cents(d['amount']) for d in released)),
+        "held": len(held),
+        "held_amount": from_cents(sum(to_cents(d['amount']) for d in held)),
+        "cutoff_time": cutoff_time,
+        "headroom_at_cutoff": from_cents(tree.range_min(last_position, n_points) - buffer_cents),
+        "solver": solver,
+    }
+
+
+def _greedy_total(amounts: list[int], capacity: int) -> int:
+    total = 0
+    for amount in amounts:
+        if total + amount <= capacity:
+            total += amount
+    return total
+
+
+def _decision(candidate: dict, release_epoch, action: str) -> dict:
+    return {
+        "payment_id": candidate['payment_id'],
+        "amount": candidate['amount'],
+        "beneficiary": candidate['beneficiary_name'],
+        "status": candidate['status'],
+        "priority": candidate['priority'],
+        "scheduled_time": candidate['timestamp_utc'],
+        "release_time": _format_epoch(release_epoch) if release_epoch is not None else None,
+        "delay_minutes": (release_epoch - candidate['timestamp_epoch']) // 60 if release_epoch is not None else None,
+        "action": action,
+    }
+
+
+def parse_schedule_options(body: dict) -> dict:
+    """
+    Validate scheduling options from a request body.
+
+    Returns statuses (a tuple; a single string is one status), objective and
+    priorities ({payment_id: float}). Raises ValueError on malformed input.
+    """
+    statuses = body.get('statuses') or RELEASABLE_STATUSES
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    if not isinstance(statuses, (list, tuple)) or not all(isinstance(status, str) for status in statuses):
+        raise ValueError("statuses must be a status or a list of statuses")
+
+    objective = body.get('objective') or "priority"
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+
+    if not isinstance(body.get('priorities') or {}, dict):
+        raise ValueError("priorities must be a JSON object of payment ID to priority")
+    priorities = {}
+    for payment_id, priority in (body.get('priorities') or {}).items():
+        try:
+            priority = float(priority)
+        except (TypeError, ValueError):
+            raise ValueError(f"priorities[{payment_id}] must be a number") from None
+        if not math.isfinite(priority):
+            raise ValueError(f"priorities[{payment_id}] must be finite")
+        priorities[payment_id] = priority
+
+    return {'statuses': tuple(statuses), 'objective': objective, 'priorities': priorities}
+
+
+def schedule_releases(
+    ledger: list[dict],
+    balances: list[dict],
+    buffers: list[dict],
+    statuses: tuple = RELEASABLE_STATUSES,
+    objective: str = "priority",
+    priorities: dict = None,
+    entity_filter: str = None,
+    currency_filter: str = None,
+    audit_context: dict = None,
+    ledger_index: LedgerIndex = None,
+) -> dict:
+    """
+    Propose release times for every outgoing payment in ``statuses``.
+
+    Args:
+        ledger, balances, buffers: As for compute_liquidity_impact
+        statuses: Ledger statuses treated as the releasable backlog
+        objective: "priority" (explicit priorities, then FIFO), "value"
+            (most amount released, with the subset-sum fallback) or "count"
+        priorities: Optional {payment_id: priority}; higher goes first
+        entity_filter, currency_filter: Restrict the backlog scheduled
+        audit_context: Extra fields merged into the audit block (the caller's data_source, load_mode)
+        ledger_index: Prebuilt LedgerIndex whose timelines are reused
+
+    Returns:
+        Per-payment release decisions, per-account summaries and totals
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+    run_id = str(uuid.uuid4())[:8]
+    timestamp_utc = datetime.utcnow().isoformat() + "Z"
+    priorities = priorities or {}
+
+    backlog = {}
+    for txn in ledger:
+        if txn.get('status') not in statuses or txn.get('direction', 'OUT') != 'OUT':
+            continue
+        if (entity_filter and txn['entity'] != entity_filter) or (currency_filter and txn['currency'] != currency_filter):
+            continue
+        backlog.setdefault((txn['entity'], txn['account_id'], txn['currency']), []).append({
+            'payment_id': txn['txn_id'],
+            'amount': float(txn['amount']),
+            'cents': txn_cents(txn),
+            'beneficiary_name': txn.get('beneficiary_name', ''),
+            'status': txn['status'],
+            'timestamp_utc': txn['timestamp_utc'],
+            'timestamp_epoch': txn_epoch(txn),
+            'priority': float(priorities.get(txn['txn_id'], 0)),
+        })
+
+    slice_keys = {(account_id, currency) for _, account_id, currency in backlog}
+    if ledger_index is not None:
+        timelines = {key: ledger_index.timeline(*key) for key in slice_keys}
+    else:
+        timelines = build_account_timelines(ledger, slice_keys)
+
+    schedule = []
+    accounts = []
+    for key in sorted(backlog):
+        entity, account_id, currency = key
+        candidates = backlog[key]
+        backlog_ids = {c['payment_id'] for c in candidates}
+        base_txns = [txn for txn in timelines[(account_id, currency)].txns if txn['txn_id'] not in backlog_ids]
+        buffer_cents, cutoff_time = find_buffer_cents(buffers, entity, currency)
+        decisions, summary = schedule_account(
+            base_txns, candidates, find_starting_cents(balances, account_id, currency),
+            buffer_cents, cutoff_time, objective,
+        )
+        for decision in decisions:
+            decision.update(entity=entity, account_id=account_id, currency=currency)
+        schedule += decisions
+        accounts.append({"entity": entity, "account_id": account_id, "currency": currency,
+                         "buffer_threshold": from_cents(buffer_cents), **summary})
+
+    released = [d for d in schedule if d['action'] != "HOLD"]
+    return {
+        "schedule": schedule,
+        "accounts": accounts,
+        "summary": {
+            "candidates": len(schedule),
+            "release": sum(1 for d in released if d['action'] == "RELEASE"),
+            "release_delayed": sum(1 for d in released if d['action'] == "RELEASE_DELAYED"),
+            "hold": len(schedule) - len(released),
+            "released_amount_by_currency": {
+                currency: from_cents(sum(to_cents(d['amount']) for d in released if d['currency'] == currency))
+                for currency in sorted({d['currency'] for d in released})
+            },
+            "account_slices": len(accounts),
+        },
+        "audit": {
+            "run_id": run_id,
+            "timestamp_utc": timestamp_utc,
+            "data_snapshot": {
+                "ledger_rows": len(ledger),
+                "balance_rows": len(balances),
+                "buffer_rules": len(buffers),
+            },
+            "objective": objective,
+            "statuses": list(statuses),
+            "version": ENGINE_VERSION,
+            **(audit_context or {}),
+        },
+    }
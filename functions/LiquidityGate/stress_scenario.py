@@ -0,0 +1,386 @@
+"""
+Stress Scenario
+===============
+Shock-day stress test across every account/currency in the starting balances.
+
+A scenario applies shocks to the whole ledger at once (an inflow haircut,
+inflows delayed by channel, FX moves on outflows, additional outflows) and
+replays each account's day against its entity/currency buffer, then every
+(entity, currency) buffer rule against the merged day of the entity's
+accounts (as aggregation="entity" does), returning ranked tables of breaches. Shocked amounts are rounded half-up to the cent
+and replayed as int cents, like the engines. Pure like liquidity_engine, so accounts can be
+fanned out over a thread pool (or a process pool, at the cost of starting one per call).
+"""
+
+import math
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from liquidity_engine import (
+    _EPOCH,
+    ENGINE_VERSION,
+    LedgerIndex,
+    bal_cents,
+    build_account_timelines,
+    epoch_seconds,
+    find_buffer_cents,
+    from_cents,
+    merge_account_timelines,
+    to_cents,
+)
+
+
+# Ranking rows returned when a request sets no limit
+DEFAULT_LIMIT = 20
+# Longest inflow delay accepted: a week already pushes any inflow past the day
+MAX_DELAY_MINUTES = 7 * 24 * 60
+
+
+def _finite(value, name: str) -> float:
+    """``value`` as a finite float, or ValueError naming the field."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be finite")
+    return number
+
+
+def parse_limit(body: dict) -> int:
+    """
+    Number of ranking rows to return from a request body's ``limit``.
+
+    A positive integer (a numeric string is accepted); DEFAULT_LIMIT when
+    absent. Raises ValueError otherwise.
+    """
+    limit = body.get('limit')
+    if limit is None or limit == '':
+        return DEFAULT_LIMIT
+    if isinstance(limit, bool):
+        raise ValueError("limit must be a positive integer")
+    try:
+        number = int(limit)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("limit must be a positive integer") from None
+    if number < 1 or (isinstance(limit, float) and number != limit):
+        raise ValueError("limit must be a positive integer")
+    return number
+
+
+def parse_shocks(body: dict) -> dict:
+    """
+    Validate shock parameters from a request body.
+
+    Returns a normalized dict with inflow_haircut_pct, delayed_inflows
+    ({channel: minutes}), fx_shocks ({currency: pct}) and additional_outflows.
+    Raises ValueError on malformed input.
+    """
+    haircut = _finite(body.get('inflow_haircut_pct') or 0, 'inflow_haircut_pct')
+    if not 0 <= haircut <= 100:
+        raise ValueError("inflow_haircut_pct must be between 0 and 100")
+
+    for name in ('delayed_inflows', 'fx_shocks'):
+        if not isinstance(body.get(name) or {}, dict):
+            raise ValueError(f"{name} must be a JSON object")
+    if not isinstance(body.get('additional_outflows') or [], list):
+        raise ValueError("additional_outflows must be a list of payments")
+
+    delayed_inflows = {}
+    for channel, minutes in (body.get('delayed_inflows') or {}).items():
+        minutes = _finite(minutes, f"delayed_inflows[{channel}]")
+        if not 0 <= minutes <= MAX_DELAY_MINUTES:
+            raise ValueError(f"delayed_inflows[{channel}] must be between 0 and {MAX_DELAY_MINUTES} minutes")
+        delayed_inflows[str(channel).upper()] = minutes
+
+    fx_shocks = {}
+    for currency, pct in (body.get('fx_shocks') or {}).items():
+        pct = _finite(pct, f"fx_shocks[{currency}]")
+        if pct <= -100:
+            raise ValueError(f"fx_shocks[{currency}] must be above -100")
+        fx_shocks[str(currency).upper()] = pct
+
+    additional_outflows = []
+    for i, payment in enumerate(body.get('additional_outflows') or []):
+        try:
+            additional_outflows.append({
+                'payment_id': payment.get('payment_id', f'STRESS-{i + 1:03d}'),
+                'amount': _finite(payment['amount'], f"additional_outflows[{i}].amount"),
+                'currency': payment['currency'],
+                'account_id': payment['account_id'],
+                'entity': payment.get('entity'),
+                'timestamp_utc': payment['timestamp_utc'],
+                'timestamp_epoch': epoch_seconds(payment['timestamp_utc']),
+            })
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"additional_outflows[{i}] needs amount, currency, account_id and timestamp_utc ({e})") from None
+
+    return {
+        'inflow_haircut_pct': haircut,
+        'delayed_inflows': delayed_inflows,
+        'fx_shocks': fx_shocks,
+        'additional_outflows': additional_outflows,
+    }
+
+
+def _format_epoch(epoch: int) -> str:
+    return (_EPOCH + timedelta(seconds=epoch)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _shocked(cents: int, factor: float) -> int:
+    """An amount in cents scaled by a shock factor, rounded half-up to the cent."""
+    return math.floor(cents * factor + 0.5)
+
+
+def _replay(events: list[tuple], start_cents: int, buffer_cents: int) -> dict:
+    """Replay (epoch, signed_cents, timestamp_str) events in order and track the buffer."""
+    balance = start_cents
+    min_balance = start_cents
+    min_balance_time = None
+    first_breach_time = None
+    breach_gap = 0
+    total_inflow = 0
+    total_outflow = 0
+    for _, amount, timestamp_str in events:
+        balance += amount
+        if amount < 0:
+            total_outflow -= amount
+        else:
+            total_inflow += amount
+        if balance < min_balance:
+            min_balance = balance
+            min_balance_time = timestamp_str
+        if balance < buffer_cents and first_breach_time is None:
+            first_breach_time = timestamp_str
+            breach_gap = buffer_cents - balance
+    return {
+        'min_balance': min_balance,
+        'min_balance_time': min_balance_time,
+        'first_breach_time': first_breach_time,
+        'breach_gap': breach_gap,
+        'total_inflow': total_inflow,
+        'total_outflow': total_outflow,
+        'end_of_day_balance': balance,
+    }
+
+
+def _events(timeline) -> list[tuple]:
+    """(epoch, cents, direction, channel, timestamp_str) per timeline transaction, for a stress task."""
+    return [
+        (txn['timestamp'], txn['cents'], txn['direction'], (txn.get('channel') or '').upper(), txn['timestamp_str'])
+        for txn in timeline.txns
+    ]
+
+
+def _rank(rows: list[dict]) -> list[dict]:
+    rows.sort(key=lambda row: (not row['breach'], -row['gap'], row['headroom']))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+    return rows
+
+
+def _stress_account(task: tuple) -> dict:
+    """Baseline and shocked replay of one account/currency day (or one entity/currency merged day)."""
+    key, txns, extra_outflows, shocks, start_cents, buffer_cents, cutoff_time = task
+    entity, account_id, currency = key
+    haircut = shocks['inflow_haircut_pct'] / 100
+    delays = shocks['delayed_inflows']
+    fx_factor = 1 + shocks['fx_shocks'].get(currency, 0) / 100
+
+    baseline = []
+    stressed = []
+    inflows_delayed = 0
+    for epoch, amount, direction, channel, timestamp_str in txns:
+        if direction == 'OUT':
+            baseline.append((epoch, -amount, timestamp_str))
+            stressed.append((epoch, -_shocked(amount, fx_factor), timestamp_str))
+            continue
+        baseline.append((epoch, amount, timestamp_str))
+        delay = delays.get(channel)
+        if delay:
+            epoch = epoch + int(delay * 60)
+            timestamp_str = _format_epoch(epoch)
+            inflows_delayed += 1
+        stressed.append((epoch, _shocked(amount, 1 - haircut), timestamp_str))
+    # Additional outflows land after anything already booked at the same time
+    stressed += [(p['timestamp_epoch'], -_shocked(to_cents(p['amount']), fx_factor), p['timestamp_utc'])
+                 for p in extra_outflows]
+    stressed.sort(key=lambda event: event[0])
+
+    base = _replay(baseline, start_cents, buffer_cents)
+    shock = _replay(stressed, start_cents, buffer_cents)
+    breach = shock['min_balance'] < buffer_cents
+    return {
+        "entity": entity,
+        "account_id": account_id,
+        "currency": currency,
+        "breach": breach,
+        "first_breach_time": shock['first_breach_time'],
+        "gap": from_cents(shock['breach_gap']) if breach else 0,
+        "headroom": from_cents(shock['min_balance'] - buffer_cents),
+        "projected_balance_min": from_cents(shock['min_balance']),
+        "min_balance_time": shock['min_balance_time'],
+        "buffer_threshold": from_cents(buffer_cents),
+        "cutoff_time": cutoff_time,
+        "start_of_day_balance": from_cents(start_cents),
+        "end_of_day_balance": from_cents(shock['end_of_day_balance']),
+        "total_inflow": from_cents(shock['total_inflow']),
+        "total_outflow": from_cents(shock['total_outflow']),
+        "baseline_breach": base['min_balance'] < buffer_cents,
+        "baseline_balance_min": from_cents(base['min_balance']),
+        "shock_impact": from_cents(base['min_balance'] - shock['min_balance']),
+        "inflows_delayed": inflows_delayed,
+        "additional_outflows": len(extra_outflows),
+    }
+
+
+def run_stress_scenario(
+    ledger: list[dict],
+    balances: list[dict],
+    buffers: list[dict],
+    shocks: dict,
+    entity_filter: str = None,
+    currency_filter: str = None,
+    limit: int = None,
+    max_workers: int = None,
+    executor: str = "thread",
+    audit_context: dict = None,
+    ledger_index: LedgerIndex = None,
+) -> dict:
+    """
+    Run a shock scenario over every account/currency in the starting balances,
+    then over every (entity, currency) buffer rule.
+
+    The entity pass checks each buffer against the summed starting balances
+    and the merged timeline of the entity's accounts in that currency (the
+    same merge as compute_liquidity_impact with aggregation="entity"), so a
+    breach that only shows across accounts is reported too.
+
+    Args:
+        ledger, balances, buffers: As for compute_liquidity_impact
+        shocks: Normalized shock parameters from parse_shocks
+        entity_filter, currency_filter: Restrict the accounts stressed
+        limit: Return only the top ``limit`` rows of the ranking
+        max_workers: Pool size; None uses every core, 1 evaluates inline
+        executor: "thread" or "process" (a fresh pool per call: process startup on every request)
+        audit_context: Extra fields merged into the audit block (the caller's data_source, load_mode)
+        ledger_index: Prebuilt LedgerIndex whose timelines are reused
+
+    Returns:
+        Accounts and entities ranked by breach, gap and headroom, plus a summary
+    """
+    run_id = str(uuid.uuid4())[:8]
+    timestamp_utc = datetime.utcnow().isoformat() + "Z"
+
+    accounts = {}
+    for bal in balances:
+        accounts[(bal['entity'], bal['account_id'], bal['currency'])] = bal_cents(bal)
+    extra_by_account = {}
+    for payment in shocks['additional_outflows']:
+        entity = payment['entity'] or next(
+            (e for e, a, c in accounts if a == payment['account_id'] and c == payment['currency']), None)
+        key = (entity, payment['account_id'], payment['currency'])
+        accounts.setdefault(key, 0)
+        extra_by_account.setdefault(key, []).append(payment)
+    accounts = {
+        key: balance for key, balance in accounts.items()
+        if (not entity_filter or key[0] == entity_filter) and (not currency_filter or key[2] == currency_filter)
+    }
+
+    slice_keys = {(account_id, currency) for _, account_id, currency in accounts}
+    if ledger_index is not None:
+        timelines = {key: ledger_index.timeline(*key) for key in slice_keys}
+    else:
+        timelines = build_account_timelines(ledger, slice_keys)
+
+    tasks = []
+    for key, start_cents in sorted(accounts.items(), key=lambda item: str(item[0])):
+        entity, account_id, currency = key
+        buffer_cents, cutoff_time = find_buffer_cents(buffers, entity, currency)
+        tasks.append((key, _events(timelines[(account_id, currency)]), extra_by_account.get(key, []), shocks,
+                      start_cents, buffer_cents, cutoff_time))
+
+    # Entity pass: each (entity, currency) buffer rule against its accounts' merged day
+    entity_accounts = {}
+    for buf in buffers:
+        pair = (buf['entity'], buf['currency'])
+        if (entity_filter and pair[0] != entity_filter) or (currency_filter and pair[1] != currency_filter):
+            continue
+        entity_accounts.setdefault(pair, {})
+    for (entity, account_id, currency), start_cents in accounts.items():
+        if (entity, currency) in entity_accounts:
+            entity_accounts[(entity, currency)][account_id] = start_cents
+    for (entity, currency), members in sorted(entity_accounts.items()):
+        account_ids = sorted(members)
+        if ledger_index is not None:
+            timeline = ledger_index.entity_timeline(entity, currency, account_ids)
+        else:
+            timeline = merge_account_timelines(
+                [timelines[(account_id, currency)] for account_id in account_ids], entity, currency)
+        extra = [payment for account_id in account_ids
+                 for payment in extra_by_account.get((entity, account_id, currency), [])]
+        buffer_cents, cutoff_time = find_buffer_cents(buffers, entity, currency)
+        tasks.append(((entity, None, currency), _events(timeline), extra, shocks, sum(members.values()),
+                      buffer_cents, cutoff_time))
+
+    workers = max_workers if max_workers is not None else os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with pool_class(max_workers=workers) as pool:
+            rows = list(pool.map(_stress_account, tasks, chunksize=chunksize))
+    else:
+        rows = [_stress_account(task) for task in tasks]
+
+    account_rows = _rank([row for row in rows if row['account_id'] is not None])
+    entity_rows = []
+    for row in rows:
+        if row['account_id'] is None:
+            del row['account_id']
+            row['account_count'] = len(entity_accounts[(row['entity'], row['currency'])])
+            entity_rows.append(row)
+    _rank(entity_rows)
+
+    breaches = [row for row in account_rows if row['breach']]
+    entity_breaches = [row for row in entity_rows if row['breach']]
+    return {
+        "accounts": account_rows[:limit] if limit else account_rows,
+        "entities": entity_rows[:limit] if limit else entity_rows,
+        "summary": {
+            "accounts_stressed": len(account_rows),
+            "breaches": len(breaches),
+            "new_breaches": sum(1 for row in breaches if not row['baseline_breach']),
+            "entities_stressed": len(entity_rows),
+            "entity_breaches": len(entity_breaches),
+            "new_entity_breaches": sum(1 for row in entity_breaches if not row['baseline_breach']),
+            "total_gap": from_cents(sum(to_cents(row['gap']) for row in breaches)),
+            "gap_by_currency": {
+                currency: from_cents(sum(to_cents(row['gap']) for row in breaches if row['currency'] == currency))
+                for currency in sorted({row['currency'] for row in breaches})
+            },
+            "earliest_breach_time": min((row['first_breach_time'] for row in breaches), default=None),
+            "buffer_rules": len(buffers),
+        },
+        "scenario": {
+            **{k: v for k, v in shocks.items() if k != 'additional_outflows'},
+            "additional_outflows": [
+                {k: v for k, v in payment.items() if k != 'timestamp_epoch'}
+                for payment in shocks['additional_outflows']
+            ],
+        },
+        "audit": {
+            "run_id": run_id,
+            "timestamp_utc": timestamp_utc,
+            "data_snapshot": {
+                "ledger_rows": len(ledger),
+                "balance_rows": len(balances),
+                "buffer_rules": len(buffers),
+            },
+            "executor": executor if workers > 1 and len(tasks) > 1 else "inline",
+            "max_workers": workers,
+            "version": ENGINE_VERSION,
+            **(audit_context or {}),
+        },
+    }
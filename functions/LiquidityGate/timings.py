@@ -0,0 +1,207 @@
+"""
+Request Timings
+===============
+Per-stage latency for the LiquidityGate handlers.
+
+``timed(route)`` wraps an HTTP or MCP handler and opens a request scope in a
+context variable; ``stage(name)`` blocks inside it (pool checkout, each SQL
+loader, row conversion, the simulation, serialization) add their elapsed
+milliseconds to that scope. The context variable follows the request into
+``asyncio.to_thread`` workers, so stages timed off the event loop are
+counted too. Concurrent loads overlap, so stages can sum to more than total.
+
+At the end of a request the stages are:
+
+- returned as a ``Server-Timing`` header on HTTP responses
+- available to the handler for ``audit.timings`` (with_timings)
+- logged as one structured record (``custom_dimensions``)
+- added to a sliding window per route and stage, summarized as
+  p50/p95/p99 by ``metrics()`` for the ``/metrics`` route
+
+When ``opentelemetry`` is installed every request and stage is also a span,
+so the breakdown shows up in whichever exporter the worker configures.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    from opentelemetry import trace
+except ImportError:  # spans are optional; timings work without them
+    trace = None
+
+# Samples kept per route/stage for the percentile summaries
+TIMING_WINDOW = int(os.environ.get('TIMING_WINDOW', '1024'))
+
+_tracer = trace.get_tracer("LiquidityGate") if trace is not None else None
+_current = contextvars.ContextVar("liquiditygate_request_timings", default=None)
+
+
+class RequestTimings:
+    """Stage durations (ms) of one request; stages repeated within it are summed."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.total_ms = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def snapshot(self) -> dict:
+        """Stages so far plus the running total, rounded for responses."""
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.started) * 1000
+        with self._lock:
+            stages = dict(self.stages)
+        return {**{name: round(ms, 2) for name, ms in stages.items()}, "total": round(total, 2)}
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value (one metric per stage, then total)."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.snapshot().items())
+
+
+class LatencyWindows:
+    """Sliding window of recent durations per (route, stage), with lifetime counts."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, stages: dict):
+        with self._lock:
+            for name, ms in stages.items():
+                key = (route, name)
+                if key not in self._samples:
+                    self._samples[key] = deque(maxlen=self.window)
+                    self._counts[key] = 0
+                self._samples[key].append(ms)
+                self._counts[key] += 1
+
+    def summary(self) -> dict:
+        """{route: {stage: count, p50, p95, p99, max}} over the current window."""
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+            counts = dict(self._counts)
+        routes = {}
+        for (route, name), values in sorted(samples.items()):
+            routes.setdefault(route, {})[name] = {
+                "count": counts[(route, name)],
+                "window": len(values),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+                "max": round(values[-1], 2),
+            }
+        return routes
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return round(ordered[int(rank) - 1], 2)
+
+
+_windows = LatencyWindows(TIMING_WINDOW)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage ``name`` of the current request (a no-op outside one)."""
+    timings = _current.get()
+    if timings is None and _tracer is None:
+        yield
+        return
+    span = _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+    started = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            if timings is not None:
+                timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def current() -> RequestTimings | None:
+    """The timings of the request being handled, if any."""
+    return _current.get()
+
+
+def with_timings(result: dict) -> dict:
+    """``result`` with its audit block extended by the request's stage timings so far."""
+    timings = _current.get()
+    if timings is None or not isinstance(result, dict) or not isinstance(result.get("audit"), dict):
+        return result
+    return {**result, "audit": {**result["audit"], "timings": timings.snapshot()}}
+
+
+def _finish(timings: RequestTimings, response):
+    timings.total_ms = (time.perf_counter() - timings.started) * 1000
+    stages = {**timings.stages, "total": timings.total_ms}
+    _windows.record(timings.route, stages)
+    logging.info(
+        f"{timings.route} timings: " + ", ".join(f"{name}={ms:.1f}ms" for name, ms in stages.items()),
+        extra={"custom_dimensions": {"route": timings.route,
+                                     **{f"{name}_ms": round(ms, 2) for name, ms in stages.items()}}},
+    )
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        headers["Server-Timing"] = timings.server_timing()
+    return response
+
+
+def timed(route: str):
+    """Decorator: per-stage timings for a sync or async handler, recorded under ``route``."""
+
+    def decorate(handler):
+        if asyncio.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def async_wrapper(*args, **kwargs):
+                timings = RequestTimings(route)
+                token = _current.set(timings)
+                try:
+                    with _tracer.start_as_current_span(route) if _tracer is not None else nullcontext():
+                        response = await handler(*args, **kwargs)
+                finally:
+                    _current.reset(token)
+                return _finish(timings, response)
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            timings = RequestTimings(route)
+            token = _current.set(timings)
+            try:
+                with _tracer.start_as_current_span(route) if _tracer is not None else nullcontext():
+                    response = handler(*args, **kwargs)
+            finally:
+                _current.reset(token)
+            return _finish(timings, response)
+        return wrapper
+
+    return decorate
+
+
+def propagate(fn):
+    """Bind ``fn`` to a copy of the caller's context, for thread pools that don't carry it."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def metrics() -> dict:
+    """Latency percentiles per route and stage for the /metrics route."""
+    return {
+        "window": TIMING_WINDOW,
+        "tracing": "opentelemetry" if _tracer is not None else None,
+        "routes": _windows.summary(),
+    }
@@ -0,0 +1,153 @@
+"""
+Engine parity: the index and numpy engines must return exactly what the
+reference replay engine returns, on the curated demo data and on small
+hand-built ledgers with timestamp ties, hypothetical payments and empty
+account slices.
+
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+from engine_parity import comparable, hypothetical_payments, load_curated  # noqa: E402
+from liquidity_engine import ENGINES, LedgerIndex, compute_liquidity_impact, np  # noqa: E402
+
+FAST_ENGINES = [
+    pytest.param(engine, marks=pytest.mark.skipif(engine == 'numpy' and np is None, reason='numpy not installed'))
+    for engine in ENGINES if engine != 'replay'
+]
+
+
+def mismatches(ledger, balances, buffers, cases, engine, ledger_index=None):
+    """Cases where ``engine`` disagrees with replay, with the differing result fields."""
+    ledger_index = ledger_index or LedgerIndex(ledger)
+    found = []
+    for case in cases:
+        reference = comparable(compute_liquidity_impact(ledger, balances, buffers, engine='replay', **case))
+        result = comparable(compute_liquidity_impact(
+            ledger, balances, buffers, engine=engine, ledger_index=ledger_index, **case))
+        if result != reference:
+            found.append((case, [k for k in reference if reference[k] != result.get(k)]))
+    return found
+
+
+@pytest.fixture(scope='module')
+def curated():
+    ledger, balances, buffers = load_curated()
+    return ledger, balances, buffers, LedgerIndex(ledger)
+
+
+@pytest.mark.parametrize('engine', FAST_ENGINES)
+def test_curated_ledger_payments(curated, engine):
+    ledger, balances, buffers, ledger_index = curated
+    cases = [{'payment_id': row['txn_id']} for row in ledger]
+    assert mismatches(ledger, balances, buffers, cases, engine, ledger_index) == []
+
+
+@pytest.mark.parametrize('engine', FAST_ENGINES)
+def test_curated_hypotheticals(curated, engine):
+    ledger, balances, buffers, ledger_index = curated
+    cases = [{'hypothetical_payment': hp} for hp in hypothetical_payments(ledger, balances, 300, seed=7)]
+    cases += [{**case, 'trajectory': 'full'} for case in cases[:50]]
+    assert mismatches(ledger, balances, buffers, cases, engine, ledger_index) == []
+
+
+@pytest.mark.parametrize('engine', FAST_ENGINES)
+def test_curated_entity_aggregation(curated, engine):
+    ledger, balances, buffers, ledger_index = curated
+    cases = [{'payment_id': row['txn_id'], 'aggregation': 'entity'} for row in ledger[::25]]
+    cases += [{'hypothetical_payment': hp, 'aggregation': 'entity', 'trajectory': 'breach_window'}
+              for hp in hypothetical_payments(ledger, balances, 50, seed=11)]
+    assert mismatches(ledger, balances, buffers, cases, engine, ledger_index) == []
+
+
+# ---------------------------------------------------------------------------
+# Edge cases on a hand-built ledger
+# ---------------------------------------------------------------------------
+
+ENTITY = 'BankSubsidiary_TR'
+
+
+def txn(txn_id, timestamp, account_id, amount, direction='OUT', currency='USD'):
+    return {
+        'txn_id': txn_id, 'timestamp_utc': f'2026-01-19 {timestamp}', 'entity': ENTITY, 'account_id': account_id,
+        'beneficiary_name': f'Beneficiary {txn_id}', 'payment_type': 'SUPPLIER', 'amount': float(amount),
+        'direction': direction, 'currency': currency, 'status': 'QUEUED', 'alert_flag': '', 'channel': 'SWIFT',
+    }
+
+
+def hypothetical(timestamp, account_id, amount, direction='OUT', currency='USD'):
+    return {'payment_id': 'HYP-EDGE', 'amount': amount, 'currency': currency, 'account_id': account_id,
+            'entity': ENTITY, 'beneficiary_name': 'New Beneficiary Ltd', 'direction': direction,
+            'timestamp_utc': f'2026-01-19 {timestamp}'}
+
+
+# ACC-1 has four rows on one timestamp (both directions) and ACC-2 ties with
+# it across accounts; ACC-3 has a balance but no ledger rows; ACC-4 has
+# neither a balance nor any rows
+EDGE_LEDGER = [
+    txn('T-01', '09:00:00', 'ACC-1', 400_000),
+    txn('T-02', '10:00:00', 'ACC-1', 700_000),
+    txn('T-03', '10:00:00', 'ACC-1', 250_000, direction='IN'),
+    txn('T-04', '10:00:00', 'ACC-1', 900_000),
+    txn('T-05', '10:00:00', 'ACC-2', 300_000),
+    txn('T-06', '10:00:00', 'ACC-1', 100_000),
+    txn('T-07', '12:30:00', 'ACC-2', 500_000, direction='IN'),
+    txn('T-08', '12:30:00', 'ACC-2', 650_000),
+    txn('T-09', '15:00:00', 'ACC-1', 50_000, currency='EUR'),
+]
+EDGE_BALANCES = [
+    {'entity': ENTITY, 'account_id': 'ACC-1', 'currency': 'USD', 'start_of_day_balance': 2_500_000.0},
+    {'entity': ENTITY, 'account_id': 'ACC-2', 'currency': 'USD', 'start_of_day_balance': 800_000.0},
+    {'entity': ENTITY, 'account_id': 'ACC-3', 'currency': 'USD', 'start_of_day_balance': 1_000_000.0},
+    {'entity': ENTITY, 'account_id': 'ACC-1', 'currency': 'EUR', 'start_of_day_balance': 75_000.0},
+]
+EDGE_BUFFERS = [
+    {'entity': ENTITY, 'currency': 'USD', 'min_buffer': 1_000_000, 'cutoff_time_utc': '11:30', 'description': 'USD'},
+    {'entity': ENTITY, 'currency': 'EUR', 'min_buffer': 60_000, 'cutoff_time_utc': '11:30', 'description': 'EUR'},
+]
+
+EDGE_CASES = {
+    'tie_first': {'payment_id': 'T-02'},
+    'tie_middle_inflow': {'payment_id': 'T-03'},
+    'tie_last': {'payment_id': 'T-06'},
+    'tie_across_accounts': {'payment_id': 'T-05'},
+    'tie_in_and_out': {'payment_id': 'T-08'},
+    'unknown_payment': {'payment_id': 'T-404'},
+    'currency_filter_away': {'payment_id': 'T-09', 'currency_filter': 'USD'},
+    'hypothetical_on_tie': {'hypothetical_payment': hypothetical('10:00:00', 'ACC-1', 600_000)},
+    'hypothetical_inflow_on_tie': {'hypothetical_payment': hypothetical('12:30:00', 'ACC-2', 90_000, 'IN')},
+    'hypothetical_before_day': {'hypothetical_payment': hypothetical('00:00:00', 'ACC-1', 1_600_000)},
+    'hypothetical_after_day': {'hypothetical_payment': hypothetical('23:59:59', 'ACC-2', 10_000)},
+    'empty_slice': {'hypothetical_payment': hypothetical('11:00:00', 'ACC-3', 200_000)},
+    'empty_slice_breach': {'hypothetical_payment': hypothetical('11:00:00', 'ACC-3', 200_000.01)},
+    'no_balance_row': {'hypothetical_payment': hypothetical('11:00:00', 'ACC-4', 5_000)},
+    'no_buffer_rule': {'hypothetical_payment': hypothetical('11:00:00', 'ACC-1', 5_000, currency='GBP')},
+}
+
+
+@pytest.mark.parametrize('trajectory', [None, 'breach_window', 'downsample=3', 'full'])
+@pytest.mark.parametrize('aggregation', ['account', 'entity'])
+@pytest.mark.parametrize('case', EDGE_CASES.values(), ids=EDGE_CASES.keys())
+@pytest.mark.parametrize('engine', FAST_ENGINES)
+def test_edge_cases(engine, case, aggregation, trajectory):
+    case = {**case, 'aggregation': aggregation, 'trajectory': trajectory}
+    assert mismatches(EDGE_LEDGER, EDGE_BALANCES, EDGE_BUFFERS, [case], engine) == []
+
+
+@pytest.mark.parametrize('aggregation', ['account', 'entity'])
+@pytest.mark.parametrize('engine', FAST_ENGINES)
+def test_empty_ledger(engine, aggregation):
+    cases = [
+        {'payment_id': 'T-01', 'aggregation': aggregation},
+        {'hypothetical_payment': hypothetical('10:00:00', 'ACC-1', 2_000_000), 'aggregation': aggregation},
+        {'hypothetical_payment': hypothetical('10:00:00', 'ACC-4', 1), 'aggregation': aggregation,
+         'trajectory': 'full'},
+    ]
+    assert mismatches([], EDGE_BALANCES, EDGE_BUFFERS, cases, engine) == []